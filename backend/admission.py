@@ -0,0 +1,284 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from fastapi import HTTPException
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take one token if available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets keyed by an identifier, bounded in number by LRU eviction."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def check(self, key: str) -> float:
+        """Return 0 if the request is allowed, otherwise the seconds to wait."""
+        if not self.enabled:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+
+class AdmissionTicket:
+    """Holds a global slot and a session turn; release exactly once when the turn ends."""
+
+    def __init__(self, controller: "AdmissionController", session_id: str):
+        self._controller = controller
+        self._session_id = session_id
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._session_id)
+
+
+class AdmissionController:
+    """
+    Admission control in front of /query.
+
+    Requests are rejected fast with 429 when the session or client IP
+    exceeds its token-bucket rate, and with 503 when the global concurrency
+    limit is reached and the bounded wait queue is full or the wait times
+    out. Turns of the same session are serialized.
+    """
+
+    def __init__(
+            self,
+            max_concurrent: int = 64,
+            max_queue: int = 128,
+            queue_timeout: float = 10.0,
+            session_wait_timeout: float = 30.0,
+            session_rate: float = 1.0,
+            session_burst: float = 5.0,
+            ip_rate: float = 5.0,
+            ip_burst: float = 20.0
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.session_wait_timeout = session_wait_timeout
+        self.session_limiter = RateLimiter(session_rate, session_burst)
+        self.ip_limiter = RateLimiter(ip_rate, ip_burst)
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._active = 0
+        self._session_locks: Dict[str, list] = {}
+        self.counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0, "session_busy": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Read the limits from ADMISSION_* and RATE_LIMIT_* environment variables."""
+        return cls(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "64")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+            session_wait_timeout=float(os.getenv("ADMISSION_SESSION_WAIT_TIMEOUT", "30")),
+            session_rate=float(os.getenv("RATE_LIMIT_SESSION_RPS", "1")),
+            session_burst=float(os.getenv("RATE_LIMIT_SESSION_BURST", "5")),
+            ip_rate=float(os.getenv("RATE_LIMIT_IP_RPS", "5")),
+            ip_burst=float(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+        )
+
+    async def admit(self, session_id: str, client_ip: Optional[str], rate_limit: bool = True) -> AdmissionTicket:
+        """
+        Wait for permission to run a turn.
+
+        Args:
+            session_id: The conversation session
+            client_ip: The caller's address, if known
+            rate_limit: Apply the per-session and per-IP rates; batch turns
+                only compete for the concurrency slots
+
+        Returns:
+            A ticket that must be released when the turn has finished
+
+        Raises:
+            HTTPException: 429 or 503 with a Retry-After header
+        """
+        if rate_limit:
+            self.check_rate(session_id, client_ip)
+
+        # Serialize turns of the same session
+        entry = self._session_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            acquired = await _acquire(entry[0], self.session_wait_timeout)
+        except BaseException:
+            self._unref_session(session_id)
+            raise
+        if not acquired:
+            self._unref_session(session_id)
+            self.counters["session_busy"] += 1
+            raise _reject(429, "A previous message in this session is still being answered", 1)
+
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            entry[0].release()
+            self._unref_session(session_id)
+            raise
+
+        self._active += 1
+        self.counters["admitted"] += 1
+        return AdmissionTicket(self, session_id)
+
+    def check_rate(self, session_id: str, client_ip: Optional[str]) -> None:
+        """
+        Charge a request to the per-IP and per-session token buckets.
+
+        Raises:
+            HTTPException: 429 with a Retry-After header when either is exhausted
+        """
+        for limiter, key in ((self.ip_limiter, client_ip), (self.session_limiter, session_id)):
+            if key is None:
+                continue
+            wait = limiter.check(key)
+            if wait > 0:
+                self.counters["rate_limited"] += 1
+                raise _reject(429, "Too many requests, please slow down", wait)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "sessions": len(self._session_locks),
+            **self.counters
+        }
+
+    async def _acquire_slot(self) -> None:
+        """Take a global slot, waiting in a bounded queue when all are busy."""
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self.counters["queue_full"] += 1
+            raise _reject(503, "Server is busy, please retry shortly", 1)
+
+        self._waiting += 1
+        try:
+            acquired = await _acquire(self._slots, self.queue_timeout)
+        finally:
+            self._waiting -= 1
+        if not acquired:
+            self.counters["queue_timeout"] += 1
+            raise _reject(503, "Server is busy, please retry shortly", 1)
+
+    def _release(self, session_id: str) -> None:
+        self._active -= 1
+        self._slots.release()
+        entry = self._session_locks.get(session_id)
+        if entry is not None:
+            entry[0].release()
+            self._unref_session(session_id)
+
+    def _unref_session(self, session_id: str) -> None:
+        """Drop a session's lock once nobody holds or waits for it."""
+        entry = self._session_locks.get(session_id)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._session_locks[session_id]
+
+
+async def _acquire(primitive: Any, timeout: float) -> bool:
+    """
+    Acquire a lock or semaphore, waiting at most `timeout` seconds.
+
+    The acquire runs in its own task rather than under `asyncio.wait_for`,
+    which can take the lock and still raise when the wait ends at the same
+    moment. If the wait times out or is cancelled after the task got the
+    lock, it is released again.
+
+    Returns:
+        True if acquired, False on timeout
+    """
+    acquiring = asyncio.ensure_future(primitive.acquire())
+    try:
+        done, _ = await asyncio.wait((acquiring,), timeout=timeout)
+    except BaseException:
+        _abandon(acquiring, primitive)
+        raise
+    if not done:
+        _abandon(acquiring, primitive)
+        return False
+    return acquiring.result()
+
+
+def _abandon(acquiring: asyncio.Future, primitive: Any) -> None:
+    """Stop waiting for an acquire, releasing what it took if it got there anyway."""
+    def release_if_acquired(task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is None:
+            primitive.release()
+
+    acquiring.add_done_callback(release_if_acquired)
+    acquiring.cancel()
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def client_address(headers: Any, client: Any, trust_forwarded: bool = False) -> Optional[str]:
+    """
+    Determine the caller's IP address.
+
+    Args:
+        headers: Request headers
+        client: The ASGI client tuple/object, may be None
+        trust_forwarded: Use the first X-Forwarded-For entry when behind a proxy
+
+    Returns:
+        The IP address, or None if unknown
+    """
+    if trust_forwarded:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return client.host if client is not None else None
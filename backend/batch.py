@@ -0,0 +1,388 @@
+"""
+Run many scripted conversations through the LLM client, for offline evaluation.
+
+Sessions run concurrently and the turns of a session run in order. Results
+are streamed as NDJSON records as soon as they are known:
+
+- {"type": "turn", ...}: one per turn, with the reply, tool calls and latency
+- {"type": "session", ...}: when a session has finished
+- {"type": "summary", ...}: once, at the end
+
+The same runner serves POST /query/batch and this CLI, which reads one
+session per line ({"session_id": "...", "turns": ["...", ...]}):
+
+    python batch.py conversations.jsonl > results.ndjson
+    python batch.py conversations.jsonl --url http://localhost:8000
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from contextlib import aclosing
+from typing import Dict, List, Any, AsyncIterator, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+
+from admission import AdmissionController
+from context_window import ContextWindow, estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from metrics import RequestTrace, set_current_trace
+from utils import get_logger, with_tool_arguments
+
+_logger = get_logger("batch")
+
+# Upstream statuses that mean "slow down" rather than "this request is wrong"
+THROTTLE_STATUSES = {429, 503}
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that backs off when the upstream throttles.
+
+    Additive increase, multiplicative decrease: every throttled call halves
+    the limit (once per pause) and pauses new calls for the upstream's
+    Retry-After; after `limit` successful calls in a row the limit grows by
+    one again, up to `max_limit`.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(max_limit, 1)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self._successes = 0
+        self._changed = asyncio.Event()
+
+    async def acquire(self) -> None:
+        while True:
+            pause = self.resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return
+            changed = self._changed
+            await changed.wait()
+
+    def release(self, throttle_delay: Optional[float] = None) -> None:
+        """
+        Give back a slot.
+
+        Args:
+            throttle_delay: Seconds to pause new calls if this call was throttled
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if throttle_delay is not None:
+            if now >= self.resume_at:
+                self.limit = max(self.limit // 2, 1)
+            self.resume_at = max(self.resume_at, now + throttle_delay)
+            self._successes = 0
+        else:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+        # Wake the current waiters and give later ones a fresh event to wait on
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+def throttle_delay(error: Optional[BaseException], attempt: int, base_delay: float, max_delay: float) -> Optional[float]:
+    """
+    Seconds to wait before retrying a throttled call.
+
+    Args:
+        error: The error the call failed with, if any
+        attempt: The number of the failed attempt, from 1
+        base_delay: Backoff of the first retry without a Retry-After header
+        max_delay: Upper bound of the exponential backoff
+
+    Returns:
+        The delay, honouring Retry-After, or None if the error is not throttling
+    """
+    if error is None or getattr(error, "status_code", None) not in THROTTLE_STATUSES:
+        return None
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+    # Upstream errors carry the response; admission rejections carry the headers
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else getattr(error, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+class BatchRunner:
+    """
+    Runs conversations through an LLMClient with bounded parallelism.
+
+    Each session keeps its own history, built like a /query turn (system
+    prompt, then the history trimmed to the context window); the live
+    session store is not touched, and with `dry_run` tools with side effects
+    (bookings) only check what they would do. Turns bypass the intent router
+    and the response cache, so every reply comes from the model. With an `admission`
+    controller every turn takes one of its concurrency slots, so a batch
+    cannot crowd out interactive traffic. Turns that fail because the
+    upstream is throttling, or that admission rejects, are retried after the
+    Retry-After, with the concurrency lowered meanwhile. A session stops at
+    its first failed turn, since later turns would build on an error message.
+    """
+
+    def __init__(
+            self,
+            llm_client: Any,
+            system_prompt: str,
+            context_window: ContextWindow,
+            max_concurrency: int = 8,
+            max_attempts: int = 3,
+            retry_base_delay: float = 1.0,
+            retry_max_delay: float = 30.0,
+            dry_run: bool = True,
+            admission: Optional[AdmissionController] = None
+    ):
+        self.llm_client = llm_client
+        self.system_prompt = system_prompt
+        self.context_window = context_window
+        self.dry_run = dry_run
+        self.admission = admission
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.limiter = AdaptiveLimiter(self.max_concurrency)
+        self.counters = {"sessions": 0, "turns": 0, "failed_turns": 0, "throttled": 0}
+
+    async def run(self, sessions: Iterable[Tuple[str, List[str]]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the sessions and yield result records as they complete.
+
+        Closing the iterator cancels the turns still running.
+
+        Args:
+            sessions: (session_id, turns) pairs
+
+        Yields:
+            Turn and session records, then a summary record
+        """
+        started = time.perf_counter()
+        pending = iter(sessions)
+        # Bounded, so a slow reader holds the workers back instead of piling up records
+        records: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 16)
+
+        async def worker() -> None:
+            cancelled = False
+            try:
+                for session_id, turns in pending:
+                    await self._run_session(session_id, turns, records)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # A worker is only cancelled once the reader has gone away, and
+                # the queue may be full then, so waiting to put would never end
+                if not cancelled:
+                    await records.put(None)
+
+        workers = asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        try:
+            finished = 0
+            while finished < self.max_concurrency:
+                record = await records.get()
+                if record is None:
+                    finished += 1
+                    continue
+                yield record
+            await workers
+        finally:
+            workers.cancel()
+            await asyncio.gather(workers, return_exceptions=True)
+
+        yield {
+            "type": "summary",
+            **self.counters,
+            "final_concurrency": self.limiter.limit,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    async def _run_session(self, session_id: str, turns: List[str], records: asyncio.Queue) -> None:
+        started = time.perf_counter()
+        history: List[Dict[str, Any]] = []
+        completed = 0
+        for index, query in enumerate(turns):
+            record, reply = await self._run_turn(session_id, index, query, history)
+            await records.put(record)
+            if record["outcome"] != "ok":
+                break
+            history.append({"role": "user", "content": query})
+            history.append({"role": "assistant", "content": reply})
+            completed += 1
+        self.counters["sessions"] += 1
+        await records.put({
+            "type": "session",
+            "session_id": session_id,
+            "turns": len(turns),
+            "completed_turns": completed,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    async def _run_turn(
+            self,
+            session_id: str,
+            index: int,
+            query: str,
+            history: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """Run one turn, retrying while the upstream throttles; return its record and reply."""
+        conversation_history = self.context_window.build(
+            self.system_prompt,
+            history,
+            reserve_tokens=estimate_tokens(query) + MESSAGE_OVERHEAD_TOKENS
+        )
+        attempt = 0
+        while True:
+            attempt += 1
+            trace = RequestTrace(session_id)
+            set_current_trace(trace)
+            outcome: Dict[str, Any] = {}
+            reply_parts: List[str] = []
+            tool_outputs: List[Dict[str, Any]] = []
+            first_event_ms = None
+            delay = None
+            ticket = None
+            await self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                if self.admission is not None:
+                    ticket = await self.admission.admit(f"batch:{session_id}", None, rate_limit=False)
+                async with aclosing(self.llm_client.process_query(
+                        query, conversation_history, outcome, dry_run=self.dry_run, use_shortcuts=False
+                )) as events:
+                    async for event in events:
+                        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                        if first_event_ms is None:
+                            first_event_ms = elapsed_ms
+                        if event["event"] == "chunk":
+                            reply_parts.append(event["data"])
+                        elif event["event"] == "tool_output":
+                            output = json.loads(event["data"])
+                            tool_outputs.append({"name": output["name"], "output": output["output"], "at_ms": elapsed_ms})
+            except HTTPException as e:
+                # Rejected by admission control: the server is busy
+                outcome.update(failed=True, error=e)
+            finally:
+                if ticket is not None:
+                    ticket.release()
+                if outcome.get("failed"):
+                    delay = throttle_delay(outcome.get("error"), attempt, self.retry_base_delay, self.retry_max_delay)
+                self.limiter.release(delay)
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+
+            if delay is not None and attempt < self.max_attempts:
+                self.counters["throttled"] += 1
+                trace.finish("throttled", batch=True)
+                _logger.log("batch_turn_throttled", session_id=session_id, turn=index, retry_in=round(delay, 2))
+                continue
+            break
+
+        failed = bool(outcome.get("failed"))
+        trace.finish("error" if failed else "ok", batch=True)
+        self.counters["turns"] += 1
+        self.counters["failed_turns"] += failed
+        reply = "".join(reply_parts)
+        record = {
+            "type": "turn",
+            "session_id": session_id,
+            "turn": index,
+            "query": query,
+            "outcome": "error" if failed else "ok",
+            "reply": reply,
+            "tool_calls": with_tool_arguments(tool_outputs, outcome.get("tool_calls", [])),
+            "latency_ms": latency_ms,
+            "first_event_ms": first_event_ms,
+            "attempts": attempt
+        }
+        if failed:
+            error = outcome.get("error")
+            record["error"] = f"{type(error).__name__}: {error}" if error is not None else "unknown"
+        return record, reply
+
+
+def read_sessions(lines: Iterable[str]) -> List[Tuple[str, List[str]]]:
+    """Parse JSONL sessions; a session without an ID gets `batch-<line>`."""
+    sessions = []
+    for number, line in enumerate(lines):
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        sessions.append((entry.get("session_id") or f"batch-{number}", [str(turn) for turn in entry["turns"]]))
+    return sessions
+
+
+async def _run_local(sessions: List[Tuple[str, List[str]]], concurrency: int, output: Any) -> None:
+    from main import BATCH_DRY_RUN, SYSTEM_PROMPT, context_window
+    from llm import LLMClient
+
+    llm_client = LLMClient()
+    try:
+        runner = BatchRunner(
+            llm_client, SYSTEM_PROMPT, context_window, max_concurrency=concurrency, dry_run=BATCH_DRY_RUN
+        )
+        async with aclosing(runner.run(sessions)) as records:
+            async for record in records:
+                output.write(json.dumps(record, default=str) + "\n")
+                output.flush()
+    finally:
+        await llm_client.close()
+
+
+def _run_remote(sessions: List[Tuple[str, List[str]]], concurrency: int, url: str, output: Any) -> None:
+    import httpx
+
+    body = {
+        "sessions": [{"session_id": session_id, "turns": turns} for session_id, turns in sessions],
+        "max_concurrency": concurrency
+    }
+    with httpx.stream("POST", url.rstrip("/") + "/query/batch", json=body, timeout=None) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                output.write(line + "\n")
+                output.flush()
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Run scripted conversations and write NDJSON results")
+    parser.add_argument("sessions", help="JSONL file with one session per line, or - for stdin")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions run in parallel")
+    parser.add_argument("--url", help="Send the batch to a running server instead of running it in-process")
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if args.sessions == "-":
+        sessions = read_sessions(sys.stdin)
+    else:
+        with open(args.sessions, encoding="utf-8") as f:
+            sessions = read_sessions(f)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.url:
+            _run_remote(sessions, args.concurrency, args.url, output)
+        else:
+            asyncio.run(_run_local(sessions, args.concurrency, output))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,275 @@
+"""
+End-to-end SSE load test for /query.
+
+Starts the FastAPI app on a local port with the mock LLM backend, then
+streams many concurrent /query requests across many sessions and reports
+throughput, time to first event and time to `end`, session store growth and
+event-loop lag of the server.
+
+    python -m bench.load --requests 2000 --sessions 500 --concurrency 200
+
+The server runs on its own event loop in a background thread, so the lag
+monitor only measures the application, not the load generator.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional
+
+# The stubbed LLM and relaxed admission limits must be set before main is imported
+BENCH_ENV = {
+    "LLM_BACKEND": "mock",
+    "MOCK_LLM_FIRST_TOKEN_MS": "50",
+    "MOCK_LLM_TOKEN_MS": "2",
+    "SESSION_STORE": "memory",
+    "RESPONSE_CACHE_ENABLED": "false",
+    "ADMISSION_MAX_CONCURRENT": "100000",
+    "ADMISSION_MAX_QUEUE": "100000",
+    "RATE_LIMIT_SESSION_RPS": "0",
+    "RATE_LIMIT_IP_RPS": "0",
+    "APPOINTMENT_JOURNAL_PATH": "",
+    "LOG_SAMPLE_RATE": "0"
+}
+
+# Appointment dates must fall within the inventory's booking horizon
+_SOON = date.today() + timedelta(days=14)
+QUERIES = [
+    "Hello, what can you do?",
+    "What's the weather in Miami?",
+    "Where is the dealership NYC001?",
+    f"Any available slots at LA002 on {_SOON.isoformat()}?",
+    f"Please book CHI003 on {(_SOON + timedelta(days=1)).isoformat()} at 10:00 for the new model"
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (Linux), or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ServerThread:
+    """Runs the app under uvicorn on a private event loop in a daemon thread."""
+
+    def __init__(self, app: Any, port: int):
+        import uvicorn
+
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="bench-server", daemon=True)
+
+    def start(self, timeout: float = 10.0) -> None:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+    def submit(self, coroutine: Any) -> Any:
+        """Schedule a coroutine on the server loop."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+
+async def monitor_loop_lag(histogram: Any, stop: threading.Event, interval: float = 0.01) -> None:
+    """Record how late the loop wakes up from short sleeps."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        histogram.record(max(loop.time() - started - interval, 0.0))
+
+
+async def stream_query(client: Any, query: str, session_id: str) -> Dict[str, Any]:
+    """POST one query and time the SSE stream until its end event."""
+    started = time.perf_counter()
+    first_event = None
+    events = 0
+    async with client.stream("POST", "/query", json={"query": query, "session_id": session_id}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {"status": response.status_code}
+        async for line in response.aiter_lines():
+            if not line.startswith("event:"):
+                continue
+            events += 1
+            now = time.perf_counter()
+            if first_event is None:
+                first_event = now - started
+            if line[len("event:"):].strip() == "end":
+                return {"status": 200, "first_event": first_event, "end": now - started, "events": events}
+    return {"status": 200, "first_event": first_event, "events": events, "incomplete": True}
+
+
+async def generate_load(base_url: str, requests: int, sessions: int, concurrency: int) -> List[Dict[str, Any]]:
+    """
+    Send `requests` queries spread round-robin over `sessions` sessions.
+
+    Each worker owns a set of sessions, so turns of one session never
+    overlap (the server would serialize them anyway).
+    """
+    import httpx
+
+    workers = min(concurrency, sessions, requests)
+    results: List[Dict[str, Any]] = []
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    timeout = httpx.Timeout(120.0)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker(worker_index: int) -> None:
+            for request_index in range(worker_index, requests, workers):
+                session = request_index % sessions
+                query = QUERIES[request_index % len(QUERIES)]
+                try:
+                    results.append(await stream_query(client, query, f"bench-{session}"))
+                except Exception as e:
+                    results.append({"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+        await asyncio.gather(*(worker(index) for index in range(workers)))
+    return results
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    from metrics import LatencyHistogram
+
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return _percentiles(histogram)
+
+
+def _percentiles(histogram: Any) -> Dict[str, float]:
+    return {
+        "count": histogram.count,
+        "p50_ms": round(histogram.percentile(0.5) * 1000, 3),
+        "p95_ms": round(histogram.percentile(0.95) * 1000, 3),
+        "p99_ms": round(histogram.percentile(0.99) * 1000, 3),
+        "max_ms": round(histogram.max * 1000, 3)
+    }
+
+
+def run_load(
+        requests: int = 2000,
+        sessions: int = 500,
+        concurrency: int = 200,
+        first_token_ms: Optional[float] = None,
+        token_ms: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run the end-to-end load test and return its results.
+
+    Args:
+        requests: Total /query requests
+        sessions: Distinct session IDs the requests are spread over
+        concurrency: Streams open at the same time
+        first_token_ms: Mock LLM first-token latency
+        token_ms: Mock LLM inter-token latency
+
+    Returns:
+        Throughput, latency percentiles, session store growth and loop lag
+    """
+    for name, value in BENCH_ENV.items():
+        os.environ.setdefault(name, value)
+    if first_token_ms is not None:
+        os.environ["MOCK_LLM_FIRST_TOKEN_MS"] = str(first_token_ms)
+    if token_ms is not None:
+        os.environ["MOCK_LLM_TOKEN_MS"] = str(token_ms)
+
+    import main
+    from metrics import LatencyHistogram
+
+    server = ServerThread(main.app, _free_port())
+    server.start()
+    lag = LatencyHistogram()
+    stop = threading.Event()
+    lag_future = server.submit(monitor_loop_lag(lag, stop))
+
+    store_before = main.app.state.session_store.stats()
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+    try:
+        results = asyncio.run(generate_load(f"http://127.0.0.1:{server.port}", requests, sessions, concurrency))
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        try:
+            lag_future.result(timeout=5)
+        except Exception:
+            pass
+        store_after = main.app.state.session_store.stats()
+        rss_after = _rss_bytes()
+        server.stop()
+
+    completed = [result for result in results if result.get("status") == 200 and "end" in result]
+    failures: Dict[str, int] = {}
+    for result in results:
+        if result not in completed:
+            key = str(result.get("status"))
+            failures[key] = failures.get(key, 0) + 1
+
+    sessions_added = store_after.get("sessions", 0) - store_before.get("sessions", 0)
+    bytes_added = store_after.get("bytes", 0) - store_before.get("bytes", 0)
+    return {
+        "params": {
+            "requests": requests,
+            "sessions": sessions,
+            "concurrency": concurrency,
+            "mock_first_token_ms": float(os.environ["MOCK_LLM_FIRST_TOKEN_MS"]),
+            "mock_token_ms": float(os.environ["MOCK_LLM_TOKEN_MS"])
+        },
+        "elapsed_s": round(elapsed, 3),
+        "completed": len(completed),
+        "failures": failures,
+        "throughput_rps": round(len(completed) / elapsed, 2) if elapsed else 0.0,
+        "events_per_s": round(sum(result["events"] for result in completed) / elapsed, 1) if elapsed else 0.0,
+        "time_to_first_event": _summarize([result["first_event"] for result in completed]),
+        "time_to_end": _summarize([result["end"] for result in completed]),
+        "session_store": {
+            "sessions_added": sessions_added,
+            "bytes_added": bytes_added,
+            "bytes_per_session": round(bytes_added / sessions_added, 1) if sessions_added else 0.0,
+            "process_rss_growth_bytes": rss_after - rss_before
+        },
+        "event_loop_lag": _percentiles(lag)
+    }
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="End-to-end SSE load test for /query")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--first-token-ms", type=float)
+    parser.add_argument("--token-ms", type=float)
+    args = parser.parse_args(argv)
+    results = run_load(args.requests, args.sessions, args.concurrency, args.first_token_ms, args.token_ms)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,135 @@
+"""
+Microbenchmarks for SSE event formatting and the tool functions.
+
+    python -m bench.micro
+
+Each benchmark reports the mean time per call over the best of several
+timing repeats, which is stable enough to compare runs on the same machine.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import date, timedelta
+from typing import Dict, List, Any, Callable, Optional
+
+
+def measure(function: Callable[[], Any], number: int, repeat: int = 5) -> Dict[str, float]:
+    """Time `number` calls of `function`, `repeat` times, and keep the fastest round."""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        rounds.append((time.perf_counter() - started) / number)
+    best = min(rounds)
+    return {"us_per_call": round(best * 1e6, 3), "calls_per_s": round(1 / best, 1) if best else 0.0}
+
+
+def bench_stream(number: int) -> Dict[str, Dict[str, float]]:
+    """Event formatting helpers and SSE frame batching from utils/stream.py."""
+    from sse_starlette.sse import ServerSentEvent
+    from utils import (
+        format_chunk_event, format_tool_use_event, format_tool_output_event, format_end_event, batch_sse_events
+    )
+
+    slots = ["09:00", "09:30", "11:00", "14:30", "16:00"]
+    results = {
+        "format_chunk_event": measure(lambda: format_chunk_event("Hello there "), number),
+        "format_tool_use_event": measure(lambda: format_tool_use_event("check_appointment_availability"), number),
+        "format_tool_output_event": measure(
+            lambda: format_tool_output_event("check_appointment_availability", slots), number
+        ),
+        "format_end_event": measure(format_end_event, number),
+        "encode_chunk_event": measure(lambda: ServerSentEvent(**format_chunk_event("Hello there ")).encode(), number)
+    }
+
+    events = [format_chunk_event("token ") for _ in range(999)] + [format_end_event()]
+
+    async def produce():
+        for event in events:
+            yield event
+
+    async def drain():
+        async for _ in batch_sse_events(produce(), max_bytes=4096, max_delay=0.02):
+            pass
+
+    loop = asyncio.new_event_loop()
+    try:
+        per_stream = measure(lambda: loop.run_until_complete(drain()), max(number // 2000, 3))
+    finally:
+        loop.close()
+    results["batch_sse_events_per_event"] = {
+        "us_per_call": round(per_stream["us_per_call"] / len(events), 3),
+        "calls_per_s": round(per_stream["calls_per_s"] * len(events), 1)
+    }
+    return results
+
+
+def bench_tools(number: int) -> Dict[str, Dict[str, float]]:
+    """Every registered tool, called directly, plus argument validation."""
+    from tools import TOOL_FUNCTIONS, TOOL_REGISTRY
+
+    days = [(date.today() + timedelta(days=offset)).isoformat() for offset in range(3650)]
+    counter = {"n": 0}
+
+    def next_day() -> str:
+        counter["n"] += 1
+        return days[counter["n"] % len(days)]
+
+    # Booking takes a slot, so every call books the first open slot of a new day
+    def schedule():
+        day = next_day()
+        slots = TOOL_FUNCTIONS["check_appointment_availability"]("MIA005", day)
+        TOOL_FUNCTIONS["schedule_appointment"]("bench-user", "MIA005", day, slots[0], "Model S")
+
+    calls = {
+        "get_weather": lambda: TOOL_FUNCTIONS["get_weather"]("Miami"),
+        "get_dealership_address": lambda: TOOL_FUNCTIONS["get_dealership_address"]("NYC001"),
+        "get_dealership_address_nearest": lambda: TOOL_FUNCTIONS["get_dealership_address"]("Boston"),
+        "check_appointment_availability": lambda: TOOL_FUNCTIONS["check_appointment_availability"](
+            "LA002", next_day()
+        ),
+        "find_next_available_slots": lambda: TOOL_FUNCTIONS["find_next_available_slots"]("CHI003", next_day()),
+        "schedule_appointment": schedule
+    }
+    missing = sorted(set(TOOL_FUNCTIONS) - set(calls))
+    if missing:
+        raise RuntimeError(f"No microbenchmark for tools: {', '.join(missing)}")
+
+    results = {name: measure(call, number // 10 if name == "schedule_appointment" else number)
+               for name, call in calls.items()}
+    arguments = json.dumps({
+        "user_id": "bench-user", "dealership_id": "MIA005", "date": "2030-01-01", "time": "09:30", "car_model": "S"
+    })
+    results["validate_schedule_appointment"] = measure(
+        lambda: TOOL_REGISTRY.validate("schedule_appointment", arguments), number
+    )
+    return results
+
+
+def run_micro(number: int = 20000) -> Dict[str, Any]:
+    """Run all microbenchmarks with `number` calls per timing round."""
+    # Keep bookings in memory instead of appending to a real journal, and let
+    # bookings spread over ten years of days
+    os.environ["APPOINTMENT_JOURNAL_PATH"] = ""
+    os.environ["APPOINTMENT_HORIZON_DAYS"] = "3650"
+    return {
+        "params": {"number": number},
+        "stream": bench_stream(number),
+        "tools": bench_tools(number)
+    }
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for event formatting and tools")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing round")
+    args = parser.parse_args(argv)
+    json.dump(run_micro(args.number), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,127 @@
+"""
+Replay captured upstream traffic through LLMClient, with no network.
+
+Record streams on a server with LLM_CAPTURE_PATH=captures.jsonl, then:
+
+    python -m bench.replay captures.jsonl                      # recorded timing
+    python -m bench.replay captures.jsonl --speed 0 --rounds 20 --profile cprofile
+
+Every captured turn (a completion whose last message is the user's) is run
+through `LLMClient.process_query` with its recorded history. The model's
+chunks, including their timing and tool call fragmentation, come from the
+capture; follow-up rounds find their own recordings by fingerprint, and the
+tools run for real. With --speed 0 chunks are released immediately, so the
+timings and profile show the client's own hot path.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from contextlib import aclosing
+from typing import Dict, List, Any, Optional, Tuple
+
+from bench.load import BENCH_ENV
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def captured_turns(backend: Any) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Return (query, history) for every captured first round of a turn."""
+    turns = []
+    for capture in backend.captures:
+        messages = capture["request"].get("messages", [])
+        if messages and messages[-1].get("role") == "user":
+            turns.append((messages[-1].get("content") or "", messages[:-1]))
+    return turns
+
+
+async def run_replay(
+        path: str,
+        speed: float = 1.0,
+        rounds: int = 1,
+        profile: Optional[str] = None,
+        profile_dir: str = "profiles"
+) -> Dict[str, Any]:
+    """
+    Replay every captured turn `rounds` times, one at a time.
+
+    Args:
+        path: A capture file written with LLM_CAPTURE_PATH
+        speed: Playback speed relative to the recording; 0 for no delays
+        rounds: Passes over the captured turns
+        profile: "cprofile" or "sample" to profile the whole replay
+        profile_dir: Where the profile is written
+
+    Returns:
+        Per-turn timing percentiles in milliseconds, match counts and the profile path
+    """
+    for name, value in BENCH_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("ROUTER_ENABLED", "false")
+
+    from llm import LLMClient
+    from llm_backends import RecordedBackend
+    from profiling import start_profile
+
+    backend = RecordedBackend(path, speed=speed)
+    client = LLMClient(backend=backend)
+    turns = captured_turns(backend)
+    first_event: List[float] = []
+    total: List[float] = []
+    running = start_profile(profile, profile_dir, "replay")
+    started = time.perf_counter()
+    try:
+        for _ in range(rounds):
+            for query, history in turns:
+                turn_started = time.perf_counter()
+                first = None
+                async with aclosing(client.process_query(query, history)) as events:
+                    async for _event in events:
+                        if first is None:
+                            first = time.perf_counter() - turn_started
+                finished = time.perf_counter() - turn_started
+                first_event.append((first if first is not None else finished) * 1000)
+                total.append(finished * 1000)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile_path = running.stop() if running is not None else None
+        await client.close()
+
+    results: Dict[str, Any] = {
+        "params": {"captures": len(backend.captures), "turns": len(turns), "speed": speed, "rounds": rounds},
+        "elapsed_s": round(elapsed, 3),
+        "backend": backend.stats()
+    }
+    for name, values in (("time_to_first_event", first_event), ("time_to_end", total)):
+        if values:
+            results[name] = {
+                "p50_ms": round(statistics.median(values), 3),
+                "p95_ms": round(_percentile(values, 0.95), 3),
+                "max_ms": round(max(values), 3)
+            }
+    if profile_path:
+        results["profile"] = profile_path
+    return results
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay captured LLM streams through LLMClient")
+    parser.add_argument("captures", help="File written with LLM_CAPTURE_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed; 0 releases chunks immediately")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--profile", choices=["cprofile", "sample"])
+    parser.add_argument("--profile-dir", default="profiles")
+    args = parser.parse_args(argv)
+    results = asyncio.run(run_replay(args.captures, args.speed, args.rounds, args.profile, args.profile_dir))
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,145 @@
+"""
+Run the benchmark suite and write the results to a JSON file.
+
+    python -m bench.run --output bench-results.json
+    python -m bench.run --quick --baseline bench-results.json
+
+With --baseline, every tracked number is compared with the earlier results
+and the run exits with status 1 if any of them got worse by more than
+--tolerance, so it can gate a deploy. Everything runs offline against the
+mock LLM backend.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from typing import Dict, List, Any, Optional, Tuple
+
+from bench.load import run_load
+from bench.micro import run_micro
+from bench.startup import run_startup
+
+# (path in the results, True if higher is better)
+TRACKED_METRICS = [
+    (("load", "throughput_rps"), True),
+    (("load", "time_to_first_event", "p50_ms"), False),
+    (("load", "time_to_first_event", "p95_ms"), False),
+    (("load", "time_to_first_event", "p99_ms"), False),
+    (("load", "time_to_end", "p50_ms"), False),
+    (("load", "time_to_end", "p95_ms"), False),
+    (("load", "time_to_end", "p99_ms"), False),
+    (("load", "event_loop_lag", "p99_ms"), False),
+    (("load", "session_store", "bytes_per_session"), False),
+    (("startup", "import_main_ms"), False),
+    (("startup", "health_ms"), False),
+    (("startup", "ready_ms"), False),
+    (("startup", "first_event_ms"), False)
+]
+
+
+def _metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def tracked_metrics(results: Dict[str, Any]) -> List[Tuple[str, float, bool]]:
+    """Flatten the numbers compared between runs into (name, value, higher_is_better)."""
+    tracked = []
+    for path, higher_is_better in TRACKED_METRICS:
+        value: Any = results
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, (int, float)):
+            tracked.append(("/".join(path), float(value), higher_is_better))
+    for group in ("stream", "tools"):
+        for name, timing in results.get("micro", {}).get(group, {}).items():
+            tracked.append((f"micro/{group}/{name}/us_per_call", float(timing["us_per_call"]), False))
+    return tracked
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Find numbers that got worse than the baseline by more than `tolerance`.
+
+    Args:
+        results: The current run
+        baseline: An earlier run
+        tolerance: Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        One entry per regression
+    """
+    previous = {name: value for name, value, _ in tracked_metrics(baseline)}
+    regressions = []
+    for name, value, higher_is_better in tracked_metrics(results):
+        before = previous.get(name)
+        if not before:
+            continue
+        change = (value - before) / before
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({"metric": name, "baseline": before, "current": value, "change": round(change, 3)})
+    return regressions
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the SuperCar backend benchmark suite")
+    parser.add_argument("--output", default="bench-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--quick", action="store_true", help="Smaller run for local iteration")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-startup", action="store_true")
+    parser.add_argument("--requests", type=int)
+    parser.add_argument("--sessions", type=int)
+    parser.add_argument("--concurrency", type=int)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Any] = {"metadata": _metadata()}
+    if not args.skip_micro:
+        results["micro"] = run_micro(2000 if args.quick else 20000)
+    if not args.skip_startup:
+        results["startup"] = run_startup(2 if args.quick else 5)
+    if not args.skip_load:
+        results["load"] = run_load(
+            requests=args.requests or (300 if args.quick else 3000),
+            sessions=args.sessions or (100 if args.quick else 1000),
+            concurrency=args.concurrency or (50 if args.quick else 500)
+        )
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        results["regressions"] = regressions
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                f"({regression['change']:+.1%})",
+                file=sys.stderr
+            )
+        exit_code = 1 if regressions else 0
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
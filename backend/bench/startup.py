@@ -0,0 +1,119 @@
+"""
+Cold start benchmark: import time and time to the first answered request.
+
+Each round starts a fresh interpreter, so nothing is cached in-process:
+
+- import_main_ms: `import main`
+- import_groq_backend_ms: the Groq backend and SDK, which are only loaded when used
+- health_ms / ready_ms: from spawning a uvicorn worker until /health and /ready answer 200
+- first_event_ms / first_response_ms: the first /query after ready, to its first event and its end
+
+    python -m bench.startup --rounds 5
+
+Reported values are medians over the rounds.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Any, Optional
+
+from bench.load import BENCH_ENV, _free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_SNIPPET = "import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    for name, value in BENCH_ENV.items():
+        env.setdefault(name, value)
+    return env
+
+
+def time_import(module: str) -> float:
+    """Seconds to import `module` in a new interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+        cwd=BACKEND_DIR, env=_environment(), capture_output=True, text=True, check=True, timeout=120
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _wait_for(client: Any, path: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} did not become ready within {timeout}s")
+
+
+def time_server_start(timeout: float = 60.0) -> Dict[str, float]:
+    """Start a uvicorn worker and time its probes and first query, in seconds."""
+    import httpx
+
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            health = _wait_for(client, "/health", started, timeout)
+            ready = _wait_for(client, "/ready", started, timeout)
+
+            query_started = time.perf_counter()
+            first_event = None
+            body = {"query": "Hello, what can you do?", "session_id": "startup-bench"}
+            with client.stream("POST", "/query", json=body) as response:
+                for line in response.iter_lines():
+                    if line.startswith("event:") and first_event is None:
+                        first_event = time.perf_counter() - query_started
+            finished = time.perf_counter() - query_started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"health": health, "ready": ready, "first_event": first_event or finished, "first_response": finished}
+
+
+def run_startup(rounds: int = 5) -> Dict[str, Any]:
+    """
+    Run the cold start measurements `rounds` times.
+
+    Returns:
+        Median timings in milliseconds, plus the round count
+    """
+    samples: Dict[str, List[float]] = {}
+    for _ in range(rounds):
+        timings = {"import_main": time_import("main"), "import_groq_backend": time_import("llm_backends.groq_backend")}
+        timings.update(time_server_start())
+        for name, seconds in timings.items():
+            samples.setdefault(name, []).append(seconds)
+    results: Dict[str, Any] = {"params": {"rounds": rounds}}
+    for name, values in samples.items():
+        results[f"{name}_ms"] = round(statistics.median(values) * 1000, 1)
+    return results
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cold start benchmark for the backend")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run_startup(args.rounds), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,184 @@
+import re
+import json
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Tokens the chat format spends on every message besides its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without a model tokenizer.
+
+    Words are charged one token per four characters (at least one) and every
+    punctuation mark one token, which tracks BPE tokenizers closely enough
+    for budgeting.
+    """
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        tokens += (len(piece) + 3) // 4
+    return tokens
+
+
+class ContextWindow:
+    """
+    Builds the message list sent to the model from a session's history.
+
+    The system prompt is always kept first. The remaining history is trimmed
+    from the oldest end to fit `max_tokens`, never separating an assistant
+    message with tool calls from its tool results. Optionally, trimmed turns
+    are compacted into a short summary message instead of being dropped.
+    """
+
+    def __init__(
+            self,
+            max_tokens: int = 3000,
+            summary_enabled: bool = False,
+            summary_max_tokens: int = 300,
+            summary_line_chars: int = 160,
+            cache_size: int = 4096
+    ):
+        self.max_tokens = max_tokens
+        self.summary_enabled = summary_enabled
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_line_chars = summary_line_chars
+        self.cache_size = cache_size
+        self._token_counts: "OrderedDict[str, int]" = OrderedDict()
+
+    def count(self, message: Dict[str, Any]) -> int:
+        """
+        Return the estimated token count of a message.
+
+        Counts of plain messages are cached by their content string, which
+        costs one string hash per call; messages with tool calls only occur
+        within a turn and are counted directly.
+
+        Args:
+            message: A chat message
+
+        Returns:
+            Estimated tokens including per-message overhead
+        """
+        content = message.get("content") or ""
+        if message.get("tool_calls"):
+            return (MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+                    + estimate_tokens(json.dumps(message["tool_calls"])))
+
+        tokens = self._token_counts.get(content)
+        if tokens is not None:
+            self._token_counts.move_to_end(content)
+            return tokens
+
+        tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+        self._token_counts[content] = tokens
+        if len(self._token_counts) > self.cache_size:
+            self._token_counts.popitem(last=False)
+        return tokens
+
+    def build(
+            self,
+            system_prompt: str,
+            history: List[Dict[str, Any]],
+            reserve_tokens: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Assemble the messages for the next model call.
+
+        Args:
+            system_prompt: The pinned system prompt
+            history: Stored conversation messages, oldest first, without the system prompt
+            reserve_tokens: Budget to leave free, e.g. for the upcoming user query
+
+        Returns:
+            The system prompt followed by the most recent history that fits
+        """
+        system_message = {"role": "system", "content": system_prompt}
+        budget = self.max_tokens - reserve_tokens - self.count(system_message)
+        if self.summary_enabled:
+            budget -= self.summary_max_tokens
+
+        groups = self._group(history)
+        kept: List[List[Dict[str, Any]]] = []
+        used = 0
+        for group in reversed(groups):
+            tokens = sum(self.count(message) for message in group)
+            if used + tokens > budget:
+                break
+            kept.append(group)
+            used += tokens
+        kept.reverse()
+
+        messages = [system_message]
+        dropped = groups[:len(groups) - len(kept)]
+        if self.summary_enabled and dropped:
+            summary = self._summarize(dropped)
+            if summary:
+                messages.append({"role": "system", "content": summary})
+        for group in kept:
+            messages.extend(group)
+        return messages
+
+    def _group(self, history: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Split history into units that must be kept or dropped together.
+
+        Tool results are attached to the assistant message that requested them;
+        tool results whose request is no longer in the history are discarded.
+        """
+        groups: List[List[Dict[str, Any]]] = []
+        pending_ids: set = set()
+        for message in history:
+            role = message.get("role")
+            if role == "system":
+                continue
+            if role == "tool":
+                if message.get("tool_call_id") in pending_ids:
+                    groups[-1].append(message)
+                continue
+
+            groups.append([message])
+            pending_ids = {
+                tool_call.get("id") for tool_call in message.get("tool_calls") or []
+            }
+        return groups
+
+    def _summarize(self, groups: List[List[Dict[str, Any]]]) -> Optional[str]:
+        """
+        Compact trimmed turns into a rolling, extractive summary.
+
+        Each turn contributes one truncated line; the newest lines are kept
+        until the summary budget is used up.
+        """
+        header = "Summary of earlier conversation:"
+        used = estimate_tokens(header)
+        lines: List[str] = []
+        for group in reversed(groups):
+            line = self._summary_line(group)
+            if not line:
+                continue
+            tokens = estimate_tokens(line)
+            if used + tokens > self.summary_max_tokens:
+                break
+            lines.append(line)
+            used += tokens
+        if not lines:
+            return None
+        lines.reverse()
+        return "\n".join([header] + lines)
+
+    def _summary_line(self, group: List[Dict[str, Any]]) -> Optional[str]:
+        message = group[0]
+        if message.get("tool_calls"):
+            names = ", ".join(tool_call["function"]["name"] for tool_call in message["tool_calls"])
+            return f"- assistant used tools: {names}"
+
+        content = _WHITESPACE.sub(" ", message.get("content") or "").strip()
+        if not content:
+            return None
+        if len(content) > self.summary_line_chars:
+            content = content[:self.summary_line_chars].rstrip() + "..."
+        return f"- {message.get('role')}: {content}"
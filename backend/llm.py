@@ -1,65 +1,324 @@
 import os
 import json
-import groq
-from typing import Dict, List, Any, AsyncGenerator
-from tools import TOOLS, TOOL_FUNCTIONS, ARGUMENTS_NAMES
-from utils import *
+import time
+from contextlib import aclosing
+from typing import Dict, List, Any, AsyncGenerator, Optional
+from tools import (
+    TOOLS, TOOL_FUNCTIONS, TOOL_REGISTRY, TOOL_TIMEOUTS, TOOL_CONCURRENCY, TOOL_CACHE_TTLS,
+    TOOL_CACHE_INVALIDATIONS, TOOL_PREFETCHABLE, TOOL_SCHEMA_VERSION, ToolExecutor, ToolPrefetcher,
+    ToolResultCache, ToolValidationError
+)
+from response_cache import ResponseCache, response_ttl
+from router import IntentRouter
+from llm_backends import LLMBackend, create_backend
+from metrics import LLM_DELTAS, LLM_TOKENS, TOOL_PREFETCHES, fail_current_trace, observe_phase, observe_tool
+from utils import format_chunk_event, format_end_event, format_tool_output_event, format_tool_use_event, get_logger
+
+_logger = get_logger("llm")
 
 
 class LLMClient:
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        self.client = groq.AsyncGroq(api_key=api_key)
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        # Groq by default; LLM_BACKEND=mock serves a local scripted model
+        self.backend = backend or create_backend()
         self.model = os.getenv("MODEL_NAME")
+        tool_cache = None
+        if os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true":
+            tool_cache = ToolResultCache(
+                TOOL_CACHE_TTLS,
+                invalidations=TOOL_CACHE_INVALIDATIONS,
+                max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+            )
+        self.tool_executor = ToolExecutor(
+            TOOL_FUNCTIONS,
+            timeouts=TOOL_TIMEOUTS,
+            concurrency=TOOL_CONCURRENCY,
+            max_workers=int(os.getenv("TOOL_THREAD_POOL_SIZE", "8")),
+            default_timeout=float(os.getenv("TOOL_DEFAULT_TIMEOUT", "10")),
+            cache=tool_cache,
+            observer=observe_tool
+        )
+        # Runs tools with side effects as dry runs, for batch evaluation; its
+        # results are not cached, so they never mix with live ones
+        self.dry_run_tool_executor = ToolExecutor(
+            TOOL_REGISTRY.dry_run_functions,
+            timeouts=TOOL_TIMEOUTS,
+            concurrency=TOOL_CONCURRENCY,
+            max_workers=int(os.getenv("TOOL_THREAD_POOL_SIZE", "8")),
+            default_timeout=float(os.getenv("TOOL_DEFAULT_TIMEOUT", "10")),
+            observer=observe_tool
+        )
+        # Maximum number of tool-calling rounds before the model must answer in text
+        self.max_tool_rounds = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
+        # Start side-effect-free tool calls while their arguments are still streaming
+        self.prefetch_enabled = os.getenv("TOOL_PREFETCH_ENABLED", "false").lower() == "true"
+
+        # Opt-in cache replaying whole responses to repeated questions
+        self.response_cache = None
+        if os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true":
+            self.response_cache = ResponseCache(
+                TOOL_SCHEMA_VERSION,
+                ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600")),
+                max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+                history_window=int(os.getenv("RESPONSE_CACHE_HISTORY_WINDOW", "0")),
+                similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0")),
+                invalidations=TOOL_CACHE_INVALIDATIONS
+            )
+
+        # Opt-in router answering simple queries without the model
+        self.router = IntentRouter.from_env() if os.getenv("ROUTER_ENABLED", "false").lower() == "true" else None
 
     async def process_query(
             self,
             query: str,
-            conversation_history: List[Dict[str, Any]]
+            conversation_history: List[Dict[str, Any]],
+            outcome: Optional[Dict[str, Any]] = None,
+            dry_run: bool = False,
+            use_shortcuts: bool = True
     ) -> AsyncGenerator[Dict[str, str], None]:
         """
-        Process a query using the Groq API with tool calling capabilities.
+        Process a query using the LLM backend with tool calling capabilities.
 
         Args:
             query: The user's query
             conversation_history: Previous conversation messages
+            outcome: Receives "failed": True and the "error" if the response
+                ended in an error, and the (name, arguments) of the tool calls
+                that ran under "tool_calls"
+            dry_run: Run tools with side effects (bookings) as dry runs
+            use_shortcuts: Answer from the intent router or the response cache
+                when they can; with False the model always answers, and the
+                response is not cached either
+
+        Yields:
+            SSE events for streaming to the client
+        """
+        outcome = {} if outcome is None else outcome
+        tool_executor = self.dry_run_tool_executor if dry_run else self.tool_executor
+        if self.router is not None and use_shortcuts:
+            routed_events = await self.router.route(query, tool_executor, outcome)
+            if routed_events is not None:
+                for event in routed_events:
+                    yield event
+                return
+
+        # Closing this generator (e.g. on client disconnect) closes the
+        # nested generators right away, down to the upstream stream
+        if self.response_cache is None or not use_shortcuts:
+            async with aclosing(self._generate(query, conversation_history, outcome, tool_executor)) as events:
+                async for event in events:
+                    yield event
+            return
+
+        # Replay a cached response through the same event sequence
+        context = self.response_cache.context_key(conversation_history)
+        cached_events = self.response_cache.lookup(context, query, outcome)
+        if cached_events is not None:
+            for event in cached_events:
+                yield event
+            return
+
+        events = []
+        generation = self.response_cache.generation
+        async with aclosing(self._generate(query, conversation_history, outcome, tool_executor)) as generated:
+            async for event in generated:
+                events.append(event)
+                yield event
+
+        if not outcome.get("failed"):
+            tool_names = [event["data"] for event in events if event["event"] == "tool_use"]
+            self.response_cache.store(
+                context, query, events, response_ttl(tool_names, TOOL_CACHE_TTLS),
+                tool_calls=outcome.get("tool_calls"),
+                generation=generation
+            )
+
+    async def close(self) -> None:
+        """Release the backend's connections and the tool worker threads."""
+        await self.backend.close()
+        self.tool_executor.shutdown()
+        self.dry_run_tool_executor.shutdown()
+
+    async def _generate(
+            self,
+            query: str,
+            conversation_history: List[Dict[str, Any]],
+            outcome: Dict[str, Any],
+            tool_executor: ToolExecutor
+    ) -> AsyncGenerator[Dict[str, str], None]:
+        """
+        Run the tool-calling loop against the LLM backend.
+
+        Args:
+            query: The user's query
+            conversation_history: Previous conversation messages
+            outcome: Receives "failed": True and the "error" if the response ended in an error,
+                and the (name, arguments) of the tool calls that ran under "tool_calls"
+            tool_executor: Runs the tool calls
 
         Yields:
             SSE events for streaming to the client
         """
         # Add the user's message to the conversation
         messages = conversation_history + [{"role": "user", "content": query}]
-        print("messages", messages)
+        _logger.debug("llm_request", messages=len(messages), query_chars=len(query))
+        prefetcher = None
         try:
-            # Stream the response from Groq API
-            stream = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=TOOLS,
-                tool_choice="auto",
-                stream=True,
-                max_tokens=4096,
-                temperature=0.7
-            )
+            use_tools = True
+            for round_index in range(self.max_tool_rounds + 1):
+                # Once the tool round budget is spent the model has to answer in text
+                use_tools = use_tools and round_index < self.max_tool_rounds
+                current_tool_calls = []
+                if self.prefetch_enabled and use_tools:
+                    prefetcher = ToolPrefetcher(tool_executor, TOOL_REGISTRY, TOOL_PREFETCHABLE)
+
+                # Stream the response from the LLM backend
+                async with aclosing(self._stream_completion(
+                        messages,
+                        current_tool_calls,
+                        use_tools=use_tools,
+                        max_tokens=4096 if round_index == 0 else 1024,
+                        followup=round_index > 0,
+                        prefetcher=prefetcher
+                )) as completion:
+                    async for event in completion:
+                        yield event
+
+                if not current_tool_calls:
+                    break
+
+                # Validate the completed tool calls; invalid ones are answered
+                # with a structured error instead of being run
+                tool_results = {}
+                runnable_calls = []
+                prefetched = {}
+                needs_user = True
+                for position, tool_call in enumerate(current_tool_calls):
+                    function_name = tool_call["function"]["name"]
+                    try:
+                        arguments = TOOL_REGISTRY.validate(function_name, tool_call["function"]["arguments"])
+                    except ToolValidationError as e:
+                        tool_results[position] = e.result
+                        needs_user = needs_user and e.missing_only
+                        continue
+
+                    # Let the frontend know we're using a tool
+                    yield format_tool_use_event(function_name)
+                    early_call = prefetcher.take(position, function_name, arguments) if prefetcher else None
+                    if early_call is not None:
+                        TOOL_PREFETCHES.inc(outcome="used")
+                        prefetched[len(runnable_calls)] = early_call
+                    runnable_calls.append((position, function_name, arguments))
+                _discard_prefetches(prefetcher)
+
+                # Execute the tool functions concurrently, yielding outputs as they complete
+                # (closing the stream cancels the calls still running)
+                async with aclosing(tool_executor.run_many(
+                        [(function_name, arguments) for _, function_name, arguments in runnable_calls],
+                        started=prefetched
+                )) as outputs:
+                    async for index, tool_result in outputs:
+                        position, function_name, arguments = runnable_calls[index]
+                        tool_results[position] = tool_result
+                        outcome.setdefault("tool_calls", []).append((function_name, arguments))
+                        # A live booking makes cached availability answers stale
+                        if self.response_cache is not None and tool_executor is self.tool_executor:
+                            self.response_cache.apply_invalidations(function_name, arguments, tool_result)
+                        yield format_tool_output_event(function_name, tool_result)
+
+                # Add the tool results to conversation history for context, in call order
+                for position, tool_call in enumerate(current_tool_calls):
+                    messages.append({
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [tool_call]
+                    })
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call["id"],
+                        "name": tool_call["function"]["name"],
+                        "content": json.dumps(tool_results[position])
+                    })
+
+                # When no tool ran because only arguments the user has to provide
+                # are missing, the follow-up only asks the model for a text answer
+                if not runnable_calls and needs_user:
+                    use_tools = False
 
-            collected_content = ""
-            current_tool_calls = []
+            # Signal the end of the response
+            yield format_end_event()
+
+        except Exception as e:
+            # In case of an error, send an error message and end the stream
+            outcome["failed"] = True
+            outcome["error"] = e
+            fail_current_trace(e)
+            error_message = f"An error occurred: {str(e)}"
+            yield format_chunk_event(error_message)
+            yield format_end_event()
+        finally:
+            _discard_prefetches(prefetcher)
+
+    async def _stream_completion(
+            self,
+            messages: List[Dict[str, Any]],
+            tool_calls: List[Dict[str, Any]],
+            use_tools: bool,
+            max_tokens: int,
+            followup: bool = False,
+            prefetcher: Optional[ToolPrefetcher] = None
+    ) -> AsyncGenerator[Dict[str, str], None]:
+        """
+        Stream one chat completion, forwarding text deltas as chunk events.
+
+        Args:
+            messages: The conversation to send
+            tool_calls: Filled in with the tool calls assembled from the stream
+            use_tools: Whether the model may call tools in this completion
+            max_tokens: Maximum number of tokens to generate
+            followup: Whether this completion answers tool results; timed as a
+                follow-up call instead of first token and stream
+            prefetcher: Receives the tool call argument deltas as they arrive
 
-            async for chunk in stream:
+        Yields:
+            Chunk events for the streamed text
+        """
+        request = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "max_tokens": max_tokens,
+            "temperature": 0.7
+        }
+        if use_tools:
+            request["tools"] = TOOLS
+            request["tool_choice"] = "auto"
+
+        started = time.perf_counter()
+        first_token_at = None
+        async with aclosing(self.backend.stream_chat(request)) as chunks:
+            async for chunk in chunks:
+                _count_usage(chunk)
+                if not chunk.choices:
+                    continue
                 delta = chunk.choices[0].delta
+                if first_token_at is None and (delta.content or delta.tool_calls):
+                    first_token_at = time.perf_counter()
+                    if not followup:
+                        observe_phase("first_token", first_token_at - started)
+
                 # If there's text content, emit a chunk event
                 if delta.content:
-                    collected_content += delta.content
+                    LLM_DELTAS.inc(kind="text")
                     yield format_chunk_event(delta.content)
 
                 # Handle tool calls
                 if delta.tool_calls:
+                    LLM_DELTAS.inc(kind="tool_call")
                     for tool_call in delta.tool_calls:
                         # Initialize a new tool call
-                        if tool_call.index >= len(current_tool_calls):
-                            current_tool_calls.append({
+                        if tool_call.index >= len(tool_calls):
+                            tool_calls.append({
                                 "id": tool_call.id or "",
                                 "type": tool_call.type or "",
                                 "function": {
@@ -70,64 +329,38 @@ class LLMClient:
                         else:
                             # Append to existing tool call's arguments
                             if tool_call.function and tool_call.function.arguments:
-                                current_tool_calls[tool_call.index]["function"][
+                                tool_calls[tool_call.index]["function"][
                                     "arguments"] += tool_call.function.arguments
 
-            # Process completed tool calls
-            if current_tool_calls:
-                for tool_call in current_tool_calls:
-                    function_name = tool_call["function"]["name"]
-                    try:
-                        arguments = json.loads(tool_call["function"]["arguments"])
-                    except json.JSONDecodeError:
-                        # If arguments can't be parsed, continue
-                        continue
-
-                    empty_values = [ARGUMENTS_NAMES.get(key, key) for key, value in arguments.items() if
-                                    value == '' or value == 'required']
+                        if prefetcher is not None and tool_call.function and tool_call.function.arguments:
+                            prefetcher.feed(
+                                tool_call.index,
+                                tool_calls[tool_call.index]["function"]["name"],
+                                tool_call.function.arguments
+                            )
 
-                    if not empty_values:
-                        # Let the frontend know we're using a tool
-                        yield format_tool_use_event(function_name)
+        finished = time.perf_counter()
+        if followup:
+            observe_phase("followup_call", finished - started)
+        else:
+            observe_phase("stream", finished - (first_token_at or started))
 
-                        # Execute the tool function
-                        tool_result = TOOL_FUNCTIONS[function_name](**arguments)
 
-                        # Yield the tool output event
-                        yield format_tool_output_event(function_name, tool_result)
-
-                        # Add the tool result to conversation history for context
-                        messages.append({
-                            "role": "assistant",
-                            "content": None,
-                            "tool_calls": [tool_call]
-                        })
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call["id"],
-                            "name": function_name,
-                            "content": json.dumps(tool_result)
-                        })
-
-                # Get a final response that incorporates the tool results
-                final_response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    stream=False,
-                    max_tokens=1024,
-                    temperature=0.7
-                )
-
-                # Send the final response content
-                final_content = final_response.choices[0].message.content
-                if final_content:
-                    yield format_chunk_event(final_content)
+def _discard_prefetches(prefetcher: Optional[ToolPrefetcher]) -> None:
+    """Cancel the prefetched tool calls whose final arguments turned out different."""
+    if prefetcher is not None:
+        discarded = prefetcher.discard()
+        if discarded:
+            TOOL_PREFETCHES.inc(discarded, outcome="discarded")
 
-            # Signal the end of the response
-            yield format_end_event()
 
-        except Exception as e:
-            # In case of an error, send an error message and end the stream
-            error_message = f"An error occurred: {str(e)}"
-            yield format_chunk_event(error_message)
-            yield format_end_event()
\ No newline at end of file
+def _count_usage(chunk: Any) -> None:
+    """Count token usage, which Groq reports in the x_groq field of the last chunk."""
+    x_groq = getattr(chunk, "x_groq", None)
+    usage = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+    if not usage:
+        return
+    for kind, field in (("prompt", "prompt_tokens"), ("completion", "completion_tokens")):
+        value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+        if value:
+            LLM_TOKENS.inc(value, kind=kind)
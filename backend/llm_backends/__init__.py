@@ -0,0 +1,60 @@
+import os
+
+from .base import LLMBackend
+from .mock import MockBackend
+from .capture import CapturingBackend, RecordedBackend
+
+__all__ = [
+    "LLMBackend",
+    "GroqBackend",
+    "MockBackend",
+    "CapturingBackend",
+    "RecordedBackend",
+    "create_backend"
+]
+
+
+def __getattr__(name: str):
+    # The Groq SDK is slow to import, so it is only loaded when a Groq backend is used
+    if name == "GroqBackend":
+        from .groq_backend import GroqBackend
+        return GroqBackend
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_backend() -> LLMBackend:
+    """
+    Build the backend selected by the LLM_BACKEND environment variable.
+
+    With LLM_CAPTURE_PATH set, the completion streams of that backend are
+    also recorded to the file.
+
+    Returns:
+        LLMBackend: "groq" (default), "mock" or "recorded" (replays LLM_RECORDED_PATH)
+    """
+    backend = _create_backend(os.getenv("LLM_BACKEND", "groq").lower())
+    capture_path = os.getenv("LLM_CAPTURE_PATH")
+    if capture_path:
+        backend = CapturingBackend(backend, capture_path)
+    return backend
+
+
+def _create_backend(backend: str) -> LLMBackend:
+    if backend == "groq":
+        from .groq_backend import GroqBackend
+        return GroqBackend()
+    if backend == "recorded":
+        path = os.getenv("LLM_RECORDED_PATH")
+        if not path:
+            raise ValueError("LLM_RECORDED_PATH environment variable is not set")
+        return RecordedBackend(path, speed=float(os.getenv("LLM_RECORDED_SPEED", "1")))
+    if backend == "mock":
+        return MockBackend(
+            first_token_delay=float(os.getenv("MOCK_LLM_FIRST_TOKEN_MS", "200")) / 1000,
+            token_delay=float(os.getenv("MOCK_LLM_TOKEN_MS", "20")) / 1000,
+            jitter=float(os.getenv("MOCK_LLM_JITTER_MS", "0")) / 1000,
+            argument_fragment_size=int(os.getenv("MOCK_LLM_ARGUMENT_FRAGMENT", "8")),
+            script_path=os.getenv("MOCK_LLM_SCRIPT") or None,
+            seed=int(os.getenv("MOCK_LLM_SEED", "0"))
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
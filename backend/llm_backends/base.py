@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, AsyncIterator
+
+
+class LLMBackend(ABC):
+    """
+    Source of streamed chat completions for LLMClient.
+
+    Backends yield chunks shaped like OpenAI/Groq ChatCompletionChunk objects:
+    `chunk.choices[0].delta` with `content` and `tool_calls`, where each tool
+    call delta has `index`, `id`, `type` and `function.name`/`function.arguments`.
+    `stream_chat` returns an async generator; closing it must release the
+    upstream connection, which is how abandoned streams are cancelled.
+    """
+
+    @abstractmethod
+    def stream_chat(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        """
+        Stream a chat completion.
+
+        Args:
+            request: Keyword arguments of a `chat.completions.create` call
+
+        Yields:
+            Completion chunks
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """Return backend-specific counters."""
+        return {}
+
+    async def close(self) -> None:
+        """Release connections held by the backend."""
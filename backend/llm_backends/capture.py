@@ -0,0 +1,192 @@
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from contextlib import aclosing
+from typing import Dict, List, Any, AsyncIterator, Deque, Optional
+
+from .base import LLMBackend
+from .mock import MockChunk, _Delta, _Function, _ToolCallDelta
+
+
+def request_fingerprint(request: Dict[str, Any]) -> str:
+    """Identify a completion request by its messages and whether tools were offered."""
+    key = json.dumps({"messages": request.get("messages", []), "tools": bool(request.get("tools"))},
+                     sort_keys=True, default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _usage(chunk: Any) -> Optional[Dict[str, int]]:
+    x_groq = getattr(chunk, "x_groq", None)
+    usage = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+    if not usage:
+        return None
+    if isinstance(usage, dict):
+        return dict(usage)
+    return {field: getattr(usage, field, None) for field in ("prompt_tokens", "completion_tokens")}
+
+
+def chunk_to_dict(chunk: Any) -> Dict[str, Any]:
+    """Keep the fields of a completion chunk that LLMClient reads."""
+    record: Dict[str, Any] = {}
+    if chunk.choices:
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if delta.content:
+            record["content"] = delta.content
+        if delta.tool_calls:
+            record["tool_calls"] = [
+                {
+                    "index": call.index,
+                    "id": call.id,
+                    "type": call.type,
+                    "name": call.function.name if call.function else None,
+                    "arguments": call.function.arguments if call.function else None
+                }
+                for call in delta.tool_calls
+            ]
+        if choice.finish_reason:
+            record["finish_reason"] = choice.finish_reason
+    else:
+        record["no_choices"] = True
+    usage = _usage(chunk)
+    if usage:
+        record["usage"] = usage
+    return record
+
+
+def chunk_from_dict(record: Dict[str, Any], model: str) -> MockChunk:
+    """Rebuild a completion chunk recorded by `chunk_to_dict`."""
+    tool_calls = None
+    if record.get("tool_calls"):
+        tool_calls = [
+            _ToolCallDelta(
+                call["index"], call.get("id"), call.get("type"), _Function(call.get("name"), call.get("arguments"))
+            )
+            for call in record["tool_calls"]
+        ]
+    delta = _Delta(record.get("content"), tool_calls)
+    chunk = MockChunk(model, delta, record.get("finish_reason"), record.get("usage"))
+    if record.get("no_choices"):
+        chunk.choices = []
+    return chunk
+
+
+class CapturingBackend(LLMBackend):
+    """
+    Records the completion streams of another backend to a JSONL file.
+
+    Each line is one stream: the request payload, its fingerprint, and every
+    chunk with its offset in seconds from the start of the request, so the
+    exact timing and tool call fragmentation can be replayed later by
+    RecordedBackend. Captures contain the full conversation, user messages
+    included.
+    """
+
+    def __init__(self, inner: LLMBackend, path: str):
+        self.inner = inner
+        self.path = path
+        self.captured = 0
+        self._lock = threading.Lock()
+
+    async def stream_chat(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        chunks: List[Dict[str, Any]] = []
+        completed = False
+        error = None
+        try:
+            async with aclosing(self.inner.stream_chat(request)) as stream:
+                async for chunk in stream:
+                    chunks.append({"t": round(time.perf_counter() - started, 6), **chunk_to_dict(chunk)})
+                    yield chunk
+            completed = True
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = {
+                "ts": round(time.time(), 3),
+                "fingerprint": request_fingerprint(request),
+                "request": request,
+                "chunks": chunks,
+                "duration": round(time.perf_counter() - started, 6),
+                # False if the consumer closed the stream early, e.g. on disconnect
+                "completed": completed,
+                "error": error
+            }
+            await asyncio.to_thread(self._write, json.dumps(record, default=str) + "\n")
+
+    def _write(self, line: str) -> None:
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.captured += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.inner.stats(), "captured": self.captured}
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+class RecordedStreamError(Exception):
+    """Raised where a recorded stream originally failed."""
+
+
+class RecordedBackend(LLMBackend):
+    """
+    Replays captured completion streams, with no network.
+
+    A request gets the capture with the same fingerprint (messages and tool
+    use), so the follow-up rounds of a replayed turn find their own
+    recordings; requests without one get the captures in file order. Chunks
+    are released at their recorded offsets divided by `speed`; a speed of 0
+    releases them without waiting.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.speed = speed
+        self.captures: List[Dict[str, Any]] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self.captures.append(json.loads(line))
+        if not self.captures:
+            raise ValueError(f"No captured streams in {path}")
+        self._by_fingerprint: Dict[str, Deque[Dict[str, Any]]] = {}
+        for capture in self.captures:
+            self._by_fingerprint.setdefault(capture["fingerprint"], deque()).append(capture)
+        self._next = 0
+        self.counters = {"requests": 0, "matched": 0, "unmatched": 0}
+
+    def pick(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Choose the capture to replay for a request; repeated requests cycle through their captures."""
+        self.counters["requests"] += 1
+        matches = self._by_fingerprint.get(request_fingerprint(request))
+        if matches:
+            self.counters["matched"] += 1
+            matches.rotate(-1)
+            return matches[-1]
+        self.counters["unmatched"] += 1
+        capture = self.captures[self._next % len(self.captures)]
+        self._next += 1
+        return capture
+
+    async def stream_chat(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        capture = self.pick(request)
+        model = capture["request"].get("model") or "recorded"
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for record in capture["chunks"]:
+            if self.speed > 0:
+                delay = started + record["t"] / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield chunk_from_dict(record, model)
+        if capture.get("error"):
+            raise RecordedStreamError(capture["error"])
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
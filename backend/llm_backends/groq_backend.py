@@ -0,0 +1,26 @@
+import os
+from typing import Dict, Any, AsyncIterator, Optional
+
+from upstream import UpstreamConfig, UpstreamTransport, create_groq_client
+from .base import LLMBackend
+
+
+class GroqBackend(LLMBackend):
+    """Groq API behind the pooled, retrying UpstreamTransport."""
+
+    def __init__(self, api_key: Optional[str] = None, config: Optional[UpstreamConfig] = None):
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY environment variable is not set")
+        config = config or UpstreamConfig.from_env()
+        self.client = create_groq_client(api_key, config)
+        self.transport = UpstreamTransport(self.client, config)
+
+    def stream_chat(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        return self.transport.stream_chat(request)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.transport.stats()
+
+    async def close(self) -> None:
+        await self.client.close()
@@ -0,0 +1,233 @@
+import re
+import json
+import random
+import asyncio
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
+
+from .base import LLMBackend
+
+_DEALERSHIP_ID = re.compile(r"\b([A-Z]{2,3}\d{3})\b")
+_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_TIME = re.compile(r"\b(\d{1,2}:\d{2})\b")
+_TOKEN = re.compile(r"\S+\s*|\s+")
+_CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Miami"]
+
+DEFAULT_REPLY = (
+    "Thanks for reaching out to SuperCar! I can check the weather, share dealership "
+    "details, look up test drive availability and book appointments for you."
+)
+
+
+class _Function:
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name: Optional[str], arguments: Optional[str]):
+        self.name = name
+        self.arguments = arguments
+
+
+class _ToolCallDelta:
+    __slots__ = ("index", "id", "type", "function")
+
+    def __init__(self, index: int, id: Optional[str], type: Optional[str], function: _Function):
+        self.index = index
+        self.id = id
+        self.type = type
+        self.function = function
+
+
+class _Delta:
+    __slots__ = ("role", "content", "tool_calls")
+
+    def __init__(self, content: Optional[str] = None, tool_calls: Optional[List[_ToolCallDelta]] = None):
+        self.role = "assistant"
+        self.content = content
+        self.tool_calls = tool_calls
+
+
+class _Choice:
+    __slots__ = ("index", "delta", "finish_reason")
+
+    def __init__(self, delta: _Delta, finish_reason: Optional[str] = None):
+        self.index = 0
+        self.delta = delta
+        self.finish_reason = finish_reason
+
+
+class MockChunk:
+    """Minimal stand-in for ChatCompletionChunk with the fields LLMClient reads."""
+
+    __slots__ = ("id", "model", "choices", "x_groq")
+
+    def __init__(self, model: str, delta: _Delta, finish_reason: Optional[str] = None,
+                 usage: Optional[Dict[str, int]] = None):
+        self.id = "chatcmpl-mock"
+        self.model = model
+        self.choices = [_Choice(delta, finish_reason)]
+        # Groq reports token usage on the last chunk
+        self.x_groq = {"usage": usage} if usage else None
+
+
+class MockBackend(LLMBackend):
+    """
+    Local, deterministic LLM stand-in for load tests and benchmarks.
+
+    Replies are chosen by simple rules over the last user message (or by a
+    JSON script of regex rules) and streamed token by token with configurable
+    first-token latency, inter-token latency and jitter. Tool calls are
+    streamed as fragmented argument deltas, like the real API does.
+
+    A script file is a JSON list of rules, tried in order against the last
+    user message:
+
+        [{"match": "miami", "content": "...", "tool_calls": [{"name": "...", "arguments": {...}}]}]
+    """
+
+    def __init__(
+            self,
+            first_token_delay: float = 0.2,
+            token_delay: float = 0.02,
+            jitter: float = 0.0,
+            argument_fragment_size: int = 8,
+            script_path: Optional[str] = None,
+            seed: int = 0
+    ):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.jitter = jitter
+        self.argument_fragment_size = max(argument_fragment_size, 1)
+        self.rules = self._load_script(script_path) if script_path else []
+        self._random = random.Random(seed)
+        self._call_ids = 0
+        self.counters = {"requests": 0, "chunks": 0, "tool_calls": 0}
+
+    async def stream_chat(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        self.counters["requests"] += 1
+        model = request.get("model") or "mock"
+        content, tool_calls = self._plan(request.get("messages", []), bool(request.get("tools")))
+
+        await self._sleep(self.first_token_delay)
+        first = True
+        completion_tokens = 0
+        for token in _TOKEN.findall(content):
+            completion_tokens += 1
+            if not first:
+                await self._sleep(self.token_delay)
+            first = False
+            self.counters["chunks"] += 1
+            yield MockChunk(model, _Delta(content=token))
+
+        for index, (name, arguments) in enumerate(tool_calls):
+            self._call_ids += 1
+            self.counters["tool_calls"] += 1
+            encoded = json.dumps(arguments)
+            size = self.argument_fragment_size
+            fragments = [encoded[i:i + size] for i in range(0, len(encoded), size)] or [""]
+            completion_tokens += len(fragments)
+            for position, fragment in enumerate(fragments):
+                if not first:
+                    await self._sleep(self.token_delay)
+                first = False
+                if position == 0:
+                    delta = _ToolCallDelta(index, f"call_mock_{self._call_ids}", "function", _Function(name, fragment))
+                else:
+                    delta = _ToolCallDelta(index, None, None, _Function(None, fragment))
+                self.counters["chunks"] += 1
+                yield MockChunk(model, _Delta(tool_calls=[delta]))
+
+        # Roughly 4 characters per prompt token, like context_window.estimate_tokens
+        prompt_chars = sum(len(message.get("content") or "") for message in request.get("messages", []))
+        usage = {"prompt_tokens": prompt_chars // 4 + 1, "completion_tokens": completion_tokens}
+        yield MockChunk(model, _Delta(), finish_reason="tool_calls" if tool_calls else "stop", usage=usage)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
+
+    def _plan(
+            self,
+            messages: List[Dict[str, Any]],
+            tools_allowed: bool
+    ) -> Tuple[str, List[Tuple[str, Dict[str, Any]]]]:
+        """Decide the reply text and tool calls for a conversation."""
+        last = messages[-1] if messages else {}
+        if last.get("role") == "tool":
+            # Phrase an answer from the tool results of the previous round
+            results = []
+            for message in reversed(messages):
+                if message.get("role") != "tool":
+                    break
+                results.append(_tool_result_text(message.get("content") or ""))
+            return "Here is what I found: " + " ".join(reversed(results)), []
+
+        query = last.get("content") or ""
+        for rule in self.rules:
+            if rule["pattern"].search(query):
+                tool_calls = rule["tool_calls"] if tools_allowed else []
+                return rule["content"], tool_calls
+
+        if tools_allowed:
+            tool_call = _infer_tool_call(query)
+            if tool_call is not None:
+                return "", [tool_call]
+        return DEFAULT_REPLY, []
+
+    async def _sleep(self, delay: float) -> None:
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _load_script(path: str) -> List[Dict[str, Any]]:
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+        return [
+            {
+                "pattern": re.compile(rule.get("match", ""), re.IGNORECASE),
+                "content": rule.get("content", ""),
+                "tool_calls": [(call["name"], call.get("arguments", {})) for call in rule.get("tool_calls", [])]
+            }
+            for rule in rules
+        ]
+
+
+def _infer_tool_call(query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Pick a tool call for common phrasings, mimicking what the model would do."""
+    lowered = query.lower()
+    dealership = _DEALERSHIP_ID.search(query)
+    date = _DATE.search(query)
+
+    if "weather" in lowered:
+        city = next((city for city in _CITIES if city.lower() in lowered), "")
+        return "get_weather", {"city": city}
+    if any(word in lowered for word in ("book", "schedule", "reserve")):
+        time = _TIME.search(query)
+        return "schedule_appointment", {
+            "user_id": "mock-user",
+            "dealership_id": dealership.group(1) if dealership else "",
+            "date": date.group(1) if date else "",
+            "time": time.group(1) if time else "",
+            "car_model": ""
+        }
+    if any(word in lowered for word in ("slot", "available", "availability", "appointment")):
+        return "check_appointment_availability", {
+            "dealership_id": dealership.group(1) if dealership else "",
+            "date": date.group(1) if date else ""
+        }
+    if dealership or "dealership" in lowered or "address" in lowered:
+        return "get_dealership_address", {"dealership_id": dealership.group(1) if dealership else ""}
+    return None
+
+
+def _tool_result_text(content: str) -> str:
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        return content
+    if isinstance(result, str):
+        return result
+    if isinstance(result, dict) and "error" in result:
+        return result["error"]
+    if isinstance(result, list):
+        return "Available times: " + ", ".join(str(item) for item in result) + "."
+    return json.dumps(result)
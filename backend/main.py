@@ -1,17 +1,102 @@
-from fastapi import FastAPI
+import os
+import json
+import time
+import asyncio
+from contextlib import aclosing, asynccontextmanager
+from dotenv import load_dotenv
+
+# Load environment variables before the modules below read their settings
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
-from typing import Dict, List, Any
-from dotenv import load_dotenv
+from starlette.background import BackgroundTask
 
-from models import QueryRequest
+from models import BatchRequest, QueryRequest
 from llm import LLMClient
+from utils import batch_sse_events, cancellable_stream, dropped_log_records, with_tool_arguments
+from sessions import create_session_store
+from context_window import ContextWindow, estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from admission import AdmissionController, client_address
+from metrics import REGISTRY, REQUESTS, SSE_EVENTS, RequestTrace, set_current_trace
+from replay import ReplayStore
+from batch import BatchRunner
+from transcripts import TranscriptJournal
+from profiling import start_profile
+from tools.inventory import close_inventory, get_inventory
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Own the per-process state of a worker: create it on startup, close it on shutdown.
+
+    Every worker process gets its own LLM client, admission controller and
+    replay buffers. Conversation history and appointment bookings are shared
+    between workers on one host through SESSION_STORE=sqlite and the
+    APPOINTMENT_JOURNAL_PATH journal.
+
+    The LLM client is built in the background, so the worker serves /health
+    right away; /ready reports when it can answer queries.
+    """
+    # Initialize LLM client (imports the upstream SDK and needs its API key)
+    app.state.llm_client_task = asyncio.ensure_future(asyncio.to_thread(_build_llm_client))
+
+    # Store conversation history by session ID (bounded, with LRU and idle-TTL eviction);
+    # opening the SQLite store may wait for another worker's lock
+    app.state.session_store = await asyncio.to_thread(create_session_store)
+
+    # Concurrency limits, rate limits and per-session serialization for /query
+    app.state.admission = AdmissionController.from_env()
+
+    # Answers are generated detached from the connection and buffered, so a client
+    # that reconnects with Last-Event-ID resumes instead of generating again
+    app.state.replay_store = ReplayStore.from_env()
+
+    # Opt-in journal of finished turns, written in the background
+    app.state.transcripts = None
+    if os.getenv("TRANSCRIPTS_ENABLED", "false").lower() == "true":
+        app.state.transcripts = TranscriptJournal.from_env()
+        app.state.transcripts.start()
+    try:
+        yield
+    finally:
+        task = app.state.llm_client_task
+        if not task.done():
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if not task.cancelled() and task.exception() is None:
+            await task.result().close()
+        if app.state.transcripts is not None:
+            await app.state.transcripts.close()
+        await asyncio.to_thread(app.state.session_store.close)
+        close_inventory()
+
+
+def _build_llm_client() -> LLMClient:
+    """Create the LLM client and load the appointment inventory, off the event loop."""
+    client = LLMClient()
+    get_inventory()
+    return client
+
+
+async def get_llm_client(state) -> LLMClient:
+    """
+    Wait for the LLM client being built by the lifespan hook.
+
+    Raises:
+        HTTPException: 503 if the client could not be built, e.g. without an API key
+    """
+    try:
+        return await asyncio.shield(state.llm_client_task)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"LLM backend unavailable: {e}")
 
-# Load environment variables
-load_dotenv()
 
 # Initialize FastAPI app
-app = FastAPI(title="SuperCar Virtual Sales Assistant API")
+app = FastAPI(title="SuperCar Virtual Sales Assistant API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -31,11 +116,45 @@ def healthcheck():
         "message": "SuperCar Virtual Sales Assistant API is running! Replace this with your implementation."
     }
 
-# Initialize LLM client
-llm_client = LLMClient()
+# Trim history sent to the model to a token budget, keeping the system prompt pinned
+context_window = ContextWindow(
+    max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "3000")),
+    summary_enabled=os.getenv("CONTEXT_SUMMARY_ENABLED", "false").lower() == "true",
+    summary_max_tokens=int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "300"))
+)
+
+TRUST_FORWARDED_FOR = os.getenv("ADMISSION_TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+# Point-in-time values exposed on /metrics next to the request metrics (per worker)
+REGISTRY.gauge("supercar_admission_active", "Streams being served", lambda: app.state.admission.stats()["active"])
+REGISTRY.gauge("supercar_admission_waiting", "Requests waiting for a free slot",
+               lambda: app.state.admission.stats()["waiting"])
+REGISTRY.gauge("supercar_sessions", "Sessions in the session store", lambda: len(app.state.session_store))
+REGISTRY.gauge("supercar_replay_streams_running", "Generations writing to a replay buffer",
+               lambda: app.state.replay_store.stats()["running"])
+REGISTRY.gauge("supercar_log_records_dropped", "Log records dropped because the writer fell behind", dropped_log_records)
+
+# SSE frame batching: flush after this many bytes or once an event has waited this long
+SSE_BATCH_ENABLED = os.getenv("SSE_BATCH_ENABLED", "false").lower() == "true"
+SSE_BATCH_MAX_BYTES = int(os.getenv("SSE_BATCH_MAX_BYTES", "4096"))
+SSE_BATCH_MAX_DELAY = float(os.getenv("SSE_BATCH_MAX_DELAY_MS", "20")) / 1000
+
+# Heartbeat comments keep idle connections alive through proxies and reveal
+# dead peers; streams are cut off after the maximum duration
+SSE_PING_SECONDS = float(os.getenv("SSE_PING_SECONDS", "15"))
+SSE_MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_STREAM_SECONDS", "300"))
 
-# Store conversation history by session ID
-conversation_histories: Dict[str, List[Dict[str, Any]]] = {}
+# Batch runs for offline evaluation: off unless enabled, bounded in size and parallelism
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "false").lower() == "true"
+BATCH_MAX_TURNS = int(os.getenv("BATCH_MAX_TURNS", "10000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+# Bookings in batch turns are dry runs unless explicitly allowed
+BATCH_DRY_RUN = os.getenv("BATCH_DRY_RUN", "true").lower() == "true"
+
+# Per-request profiling with an X-Profile: cprofile|sample header; never enable on a public server
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
 
 # Define system prompt with context about SuperCar dealerships
 SYSTEM_PROMPT = """
@@ -46,51 +165,197 @@ IMPORTANT: If a user initiates a tool-based request without specifying required
 
 
 @app.post("/query")
-async def query(request: QueryRequest):
+async def query(request: QueryRequest, http_request: Request):
     """
     Process a user query and stream the response using Server-Sent Events.
 
     Args:
         request: The query request containing query text and session_id
+        http_request: The underlying HTTP request, used for the client address
 
     Returns:
         EventSourceResponse: A streaming response with AI assistant's message
     """
-    # Initialize conversation history for new sessions
+    state = http_request.app.state
+    session_store, replay_store, transcripts = state.session_store, state.replay_store, state.transcripts
+    client_ip = client_address(http_request.headers, http_request.client, TRUST_FORWARDED_FOR)
+    # A reconnect with Last-Event-ID for the same query continues the buffered
+    # stream; unknown or expired streams fall through to a new generation
+    resumed = replay_store.resume(request.session_id, request.query, http_request.headers.get("last-event-id"))
+    if resumed is not None:
+        # A resume starts no generation: the one it follows already holds a
+        # concurrency slot and the session's turn (waiting for that turn would
+        # wait for the stream itself), so it is only charged to the rate limits
+        try:
+            state.admission.check_rate(request.session_id, client_ip)
+        except HTTPException:
+            REQUESTS.inc(outcome="rejected")
+            raise
+        REQUESTS.inc(outcome="resumed")
+        return _sse_response(resumed)
+
+    # Wait for a free slot and for any previous turn of this session to finish;
+    # rejects with 429/503 and Retry-After when over the limits
     session_id = request.session_id
-    if session_id not in conversation_histories:
-        conversation_histories[session_id] = [
-            {"role": "system", "content": SYSTEM_PROMPT}
-        ]
+    profile_kind = http_request.headers.get("x-profile") if PROFILING_ENABLED else None
+    trace = RequestTrace(session_id)
+    try:
+        with trace.span("queue_wait"):
+            ticket = await state.admission.admit(session_id, client_ip)
+    except HTTPException as e:
+        trace.finish("rejected", status=e.status_code)
+        raise
+
+    try:
+        llm_client = await get_llm_client(state)
+    except HTTPException as e:
+        ticket.release()
+        trace.finish("error", status=e.status_code)
+        raise
+
+    try:
+        # Load conversation history. The store keeps only the last
+        # SESSION_HISTORY_WINDOW messages of each session.
+        stored_history = await session_store.aget(session_id) or []
 
-    # Limit conversation history to prevent context window issues
-    conversation_history = conversation_histories[session_id][-10:]
+        # Limit conversation history to prevent context window issues
+        conversation_history = context_window.build(
+            SYSTEM_PROMPT,
+            stored_history,
+            reserve_tokens=estimate_tokens(request.query) + MESSAGE_OVERHEAD_TOKENS
+        )
+
+        # Add user query to conversation history
+        await session_store.aappend(session_id, {
+            "role": "user",
+            "content": request.query
+        })
+    except BaseException:
+        ticket.release()
+        trace.finish("error")
+        raise
 
     # Create an async generator for the streamed response
     async def event_generator():
-        async for event in llm_client.process_query(
-                request.query, conversation_history
-        ):
-            yield event
-            print("event", event)
-
-            # If this is a chunk event, save it for conversation history
-            if event["event"] == "chunk":
-                # After streaming completes, add the assistant's response to history
-                if session_id in conversation_histories:
-                    conversation_histories[session_id].append({
-                        "role": "assistant",
-                        "content": event["data"]
-                    })
-
-    # Add user query to conversation history
-    conversation_histories[session_id].append({
-        "role": "user",
-        "content": request.query
-    })
-
-    # Return SSE response
-    return EventSourceResponse(event_generator())
+        # Spans recorded by the LLM client and tool executor land on this trace
+        set_current_trace(trace)
+        reply_parts = []
+        tool_outputs = []
+        # Receives the (name, arguments) of each tool call the answer used
+        generation = {}
+        outcome = "disconnected"
+        timed_out = []
+        profile = start_profile(profile_kind, PROFILE_DIR, session_id)
+        try:
+            # The answer is generated in a task that is cancelled as soon as this
+            # stream is closed, i.e. when the generation is abandoned
+            async with aclosing(cancellable_stream(
+                    llm_client.process_query(request.query, conversation_history, generation),
+                    max_duration=SSE_MAX_STREAM_SECONDS,
+                    on_timeout=lambda: timed_out.append(True)
+            )) as generated:
+                async for event in generated:
+                    yield event
+                    SSE_EVENTS.inc(event=event["event"])
+
+                    # If this is a chunk event, save it for conversation history
+                    if event["event"] == "chunk":
+                        reply_parts.append(event["data"])
+                    elif event["event"] == "tool_output" and transcripts is not None:
+                        tool_outputs.append(json.loads(event["data"]))
+            outcome = "timeout" if timed_out else "ok"
+        finally:
+            # After streaming completes, add the assistant's response to history
+            # as a single message (if this wait is cancelled too, the write still
+            # finishes and the done callback below releases the ticket)
+            if reply_parts:
+                await session_store.aappend(session_id, {
+                    "role": "assistant",
+                    "content": "".join(reply_parts)
+                })
+            ticket.release()
+            fields = {"reply_chars": sum(len(part) for part in reply_parts)}
+            if profile is not None:
+                fields["profile"] = profile.stop()
+            trace.finish(outcome, **fields)
+            if transcripts is not None:
+                transcripts.record({
+                    "ts": round(time.time(), 3),
+                    "session_id": session_id,
+                    "query": request.query,
+                    "reply": "".join(reply_parts),
+                    "tool_calls": with_tool_arguments(tool_outputs, generation.get("tool_calls", [])),
+                    "outcome": outcome,
+                    "total_ms": round((time.perf_counter() - trace.started) * 1000, 2),
+                    "spans": trace.spans
+                })
+
+    # Generate into a replay buffer and stream it; the ticket is also released
+    # if the generation is cancelled before it started
+    buffer = replay_store.start(session_id, event_generator(), request.query)
+    buffer.task.add_done_callback(lambda _: (ticket.release(), trace.finish("disconnected")))
+    return _sse_response(replay_store.follow(buffer))
+
+
+def _sse_response(events):
+    """Stream events as SSE, optionally coalescing them into fewer, larger frames."""
+    if SSE_BATCH_ENABLED:
+        events = batch_sse_events(events, max_bytes=SSE_BATCH_MAX_BYTES, max_delay=SSE_BATCH_MAX_DELAY)
+    # After a disconnect the stream may be parked at a yield; closing it detaches
+    # this client, which cancels the generation once nobody resumes it
+    return EventSourceResponse(events, ping=SSE_PING_SECONDS, background=BackgroundTask(events.aclose))
+
+
+@app.post("/query/batch")
+async def query_batch(request: BatchRequest, http_request: Request):
+    """
+    Run many scripted conversations and stream the results as NDJSON.
+
+    Sessions run concurrently, their turns in order, each with its own
+    history; the session store is not used and bookings are dry runs
+    (BATCH_DRY_RUN). See batch.py for the records.
+
+    Args:
+        request: The sessions with their turns, and an optional lower concurrency
+        http_request: The underlying HTTP request
+
+    Returns:
+        StreamingResponse: One JSON record per line
+    """
+    if not BATCH_ENABLED:
+        raise HTTPException(status_code=404, detail="Batch queries are disabled")
+    turns = sum(len(session.turns) for session in request.sessions)
+    if turns > BATCH_MAX_TURNS:
+        raise HTTPException(status_code=413, detail=f"A batch may have at most {BATCH_MAX_TURNS} turns")
+
+    state = http_request.app.state
+    llm_client = await get_llm_client(state)
+    # Every turn takes an admission slot, like a /query turn, but without the rate limits
+    runner = BatchRunner(
+        llm_client,
+        SYSTEM_PROMPT,
+        context_window,
+        max_concurrency=min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY),
+        max_attempts=BATCH_MAX_ATTEMPTS,
+        dry_run=BATCH_DRY_RUN,
+        admission=state.admission
+    )
+    records = runner.run(
+        (session.session_id or f"batch-{number}", session.turns) for number, session in enumerate(request.sessions)
+    )
+
+    async def lines():
+        async for record in records:
+            yield json.dumps(record, default=str) + "\n"
+
+    # Closing the records on disconnect cancels the turns still running
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(records.aclose))
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request phase latencies, tool times, token and event counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
@@ -101,6 +366,20 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check(http_request: Request):
+    """
+    Readiness probe: 200 once this worker can answer queries, 503 before that or if startup failed.
+    """
+    task = http_request.app.state.llm_client_task
+    if not task.done():
+        return JSONResponse({"status": "starting"}, status_code=503)
+    if task.cancelled() or task.exception() is not None:
+        error = "cancelled" if task.cancelled() else str(task.exception())
+        return JSONResponse({"status": "unavailable", "error": error}, status_code=503)
+    return {"status": "ready"}
+
+
 if __name__ == "__main__":
     import uvicorn
 
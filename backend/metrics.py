@@ -0,0 +1,343 @@
+import math
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+
+from utils import get_logger
+
+# Upper bounds in seconds of the exported Prometheus buckets; the recorded
+# data is much finer, so these can change without losing precision
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0
+)
+
+_logger = get_logger("request")
+
+
+class LatencyHistogram:
+    """
+    HdrHistogram-style log-linear histogram of durations.
+
+    Durations are recorded in whole microseconds. Each power-of-two range is
+    split into 2^(sub_bucket_bits - 1) equal buckets, so any recorded value
+    is known to within 1 / 2^(sub_bucket_bits - 1) of itself (1.6% with the
+    default 7 bits) at a fixed, small memory cost and O(1) per record.
+    """
+
+    __slots__ = ("sub_bucket_bits", "counts", "count", "sum", "max")
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        seconds = max(seconds, 0.0)
+        index = self._index(int(seconds * 1e6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """Return the duration below which `fraction` of the samples fall, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(fraction * self.count), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index) / 1e6, self.max)
+        return self.max
+
+    def cumulative(self, bounds: Tuple[float, ...]) -> List[int]:
+        """Return the number of samples at or below each bound, in seconds."""
+        result = [0] * len(bounds)
+        for index, count in self.counts.items():
+            value = self._lower(index) / 1e6
+            for position, bound in enumerate(bounds):
+                if value <= bound:
+                    result[position] += count
+        return result
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max
+        }
+
+    def _index(self, value: int) -> int:
+        if value < 1 << self.sub_bucket_bits:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return (shift << (self.sub_bucket_bits - 1)) + (value >> shift)
+
+    def _lower(self, index: int) -> int:
+        if index < 1 << self.sub_bucket_bits:
+            return index
+        shift = (index >> (self.sub_bucket_bits - 1)) - 1
+        return (index - (shift << (self.sub_bucket_bits - 1))) << shift
+
+    def _upper(self, index: int) -> int:
+        if index < 1 << self.sub_bucket_bits:
+            return index
+        shift = (index >> (self.sub_bucket_bits - 1)) - 1
+        return self._lower(index) + (1 << shift) - 1
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{self._label_text(key)} {_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read from a callback at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, function: Callable[[], float]):
+        super().__init__(name, help)
+        self.function = function
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.function())
+        except Exception:
+            return []
+        return super().render() + [f"{self.name} {_number(value)}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self.histograms: Dict[Tuple[str, ...], LatencyHistogram] = {}
+
+    def observe(self, seconds: float, **labels: Any) -> None:
+        key = self._key(labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles per label combination, keyed by the joined label values."""
+        return {"/".join(key) or self.name: histogram.summary() for key, histogram in sorted(self.histograms.items())}
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, histogram in sorted(self.histograms.items()):
+            for bound, count in zip(self.buckets, histogram.cumulative(self.buckets)):
+                labels = self._label_text(key, 'le="%s"' % _number(bound))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self._label_text(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {histogram.count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(histogram.sum)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {histogram.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, function: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, help, function))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Any) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+# Process-wide metrics, exposed on /metrics
+REGISTRY = MetricsRegistry()
+REQUESTS = REGISTRY.counter(
+    "supercar_requests_total", "Finished /query requests by outcome", ("outcome",)
+)
+PHASE_SECONDS = REGISTRY.histogram(
+    "supercar_request_phase_seconds",
+    "Time spent in each phase of a /query request: queue_wait, first_token, stream, tool, followup_call, route, total",
+    ("phase",)
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "supercar_tool_duration_seconds", "Tool execution time by tool and outcome", ("tool", "outcome")
+)
+TOOL_PREFETCHES = REGISTRY.counter(
+    "supercar_tool_prefetch_total",
+    "Tool calls started before the model finished their arguments, by outcome (used or discarded)",
+    ("outcome",)
+)
+ROUTER_DECISIONS = REGISTRY.counter(
+    "supercar_router_total",
+    "Queries by fast-path route; route=llm counts the queries passed on to the model",
+    ("route",)
+)
+TRANSCRIPT_RECORDS = REGISTRY.counter(
+    "supercar_transcript_records_total",
+    "Transcript records by outcome (written, sampled_out, dropped or failed)",
+    ("outcome",)
+)
+SSE_EVENTS = REGISTRY.counter(
+    "supercar_sse_events_total", "SSE events sent to clients by event type", ("event",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "supercar_llm_tokens_total", "Tokens reported by the LLM backend by kind", ("kind",)
+)
+LLM_DELTAS = REGISTRY.counter(
+    "supercar_llm_stream_deltas_total", "Streamed completion deltas by kind (text or tool_call)", ("kind",)
+)
+
+
+class RequestTrace:
+    """
+    Spans of a single /query request.
+
+    Every span is recorded in PHASE_SECONDS as it ends. When the request
+    finishes, the whole trace is written as one structured log record.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.finished = False
+
+    def record(self, phase: str, seconds: float, **fields: Any) -> None:
+        PHASE_SECONDS.observe(seconds, phase=phase)
+        self.spans.append({"phase": phase, "ms": round(seconds * 1000, 2), **fields})
+
+    @contextmanager
+    def span(self, phase: str, **fields: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started, **fields)
+
+    def finish(self, outcome: str, **fields: Any) -> None:
+        """Record the total duration and outcome, once."""
+        if self.finished:
+            return
+        self.finished = True
+        if self.error is not None and outcome == "ok":
+            outcome = "error"
+        total = time.perf_counter() - self.started
+        if self.error is not None:
+            fields["error"] = self.error
+        PHASE_SECONDS.observe(total, phase="total")
+        REQUESTS.inc(outcome=outcome)
+        _logger.log(
+            "request",
+            level=logging.WARNING if outcome == "error" else logging.INFO,
+            session_id=self.session_id,
+            outcome=outcome,
+            total_ms=round(total * 1000, 2),
+            spans=self.spans,
+            **fields
+        )
+
+
+_current_trace: "contextvars.ContextVar[Optional[RequestTrace]]" = contextvars.ContextVar("trace", default=None)
+
+
+def set_current_trace(trace: Optional[RequestTrace]) -> None:
+    """Make `trace` the trace of the running task and the tasks it starts."""
+    _current_trace.set(trace)
+
+
+def fail_current_trace(error: BaseException) -> None:
+    """Mark the current request as failed even though its stream ended normally."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.error = f"{type(error).__name__}: {error}"
+
+
+def observe_phase(phase: str, seconds: float, **fields: Any) -> None:
+    """Record a phase duration, on the current request's trace if there is one."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(phase, seconds, **fields)
+    else:
+        PHASE_SECONDS.observe(seconds, phase=phase)
+
+
+def observe_tool(name: str, seconds: float, outcome: str) -> None:
+    """ToolExecutor observer: record one tool execution."""
+    TOOL_SECONDS.observe(seconds, tool=name, outcome=outcome)
+    observe_phase("tool", seconds, tool=name, outcome=outcome)
@@ -7,6 +7,16 @@ class QueryRequest(BaseModel):
     session_id: str
 
 
+class BatchSession(BaseModel):
+    session_id: Optional[str] = None
+    turns: List[str]
+
+
+class BatchRequest(BaseModel):
+    sessions: List[BatchSession]
+    max_concurrency: Optional[int] = None
+
+
 class ToolParameter(BaseModel):
     name: str
     description: str
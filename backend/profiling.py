@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from typing import Dict, Optional
+
+from utils import get_logger
+
+_logger = get_logger("profiling")
+
+PROFILER_KINDS = ("cprofile", "sample")
+
+# Both profilers observe a whole thread, so only one profile runs at a time
+_active_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a helper thread.
+
+    Much lower overhead than cProfile, so timings stay realistic. Samples
+    are written as collapsed stacks ("outer;inner count" per line), the
+    input format of flamegraph tools.
+    """
+
+    def __init__(self, interval: float = 0.001, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                stack = ";".join(reversed(names))
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+
+
+class RequestProfile:
+    """
+    One profiling run over the current thread, written to `directory` when stopped.
+
+    Everything the thread runs while the profile is active is included,
+    so on a busy server other requests show up too; on a replay with one
+    request at a time it is the request's own hot path.
+    """
+
+    def __init__(self, kind: str, directory: str, label: str, sample_interval: float = 0.001):
+        self.kind = kind
+        self.directory = directory
+        self.label = label
+        self.path: Optional[str] = None
+        self._started = time.perf_counter()
+        if kind == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(sample_interval)
+            self._profiler.start()
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the result.
+
+        Returns:
+            The written file: pstats data for cProfile, collapsed stacks for sampling
+        """
+        try:
+            if self.kind == "cprofile":
+                self._profiler.disable()
+            else:
+                self._profiler.stop()
+            os.makedirs(self.directory, exist_ok=True)
+            safe_label = "".join(char if char.isalnum() or char in "-_" else "_" for char in self.label)[:64]
+            name = f"{safe_label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+            if self.kind == "cprofile":
+                self.path = os.path.join(self.directory, name + ".prof")
+                pstats.Stats(self._profiler).dump_stats(self.path)
+            else:
+                self.path = os.path.join(self.directory, name + ".collapsed")
+                self._profiler.write(self.path)
+            _logger.log("profile_written", kind=self.kind, path=self.path,
+                        seconds=round(time.perf_counter() - self._started, 3))
+        finally:
+            _active_lock.release()
+        return self.path
+
+
+def start_profile(kind: Optional[str], directory: str, label: str) -> Optional[RequestProfile]:
+    """
+    Start profiling if `kind` names a profiler and no other profile is running.
+
+    Args:
+        kind: "cprofile" or "sample", e.g. from an X-Profile header
+        directory: Where the profile is written
+        label: Prefix of the file name, e.g. the session ID
+
+    Returns:
+        The running profile, or None if profiling was not started
+    """
+    if kind not in PROFILER_KINDS:
+        return None
+    if not _active_lock.acquire(blocking=False):
+        _logger.warning("profile_skipped", kind=kind, reason="another profile is running")
+        return None
+    try:
+        return RequestProfile(kind, directory, label)
+    except BaseException:
+        _active_lock.release()
+        raise
@@ -0,0 +1,228 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+
+from utils import get_logger
+
+_logger = get_logger("replay")
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Split a `<stream_id>:<sequence>` event ID, or return None if it is malformed."""
+    if not event_id:
+        return None
+    stream_id, _, sequence = event_id.strip().rpartition(":")
+    if not stream_id or not sequence.isdigit():
+        return None
+    return stream_id, int(sequence)
+
+
+def _query_hash(query: str) -> str:
+    return hashlib.blake2b(query.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ReplayBuffer:
+    """
+    Numbered events of one /query stream, kept in a bounded ring.
+
+    Every event gets the ID `<stream_id>:<sequence>`. Followers read from the
+    ring and wait for new events while the generation is still running.
+    `query_hash` identifies the query being answered.
+    """
+
+    def __init__(self, stream_id: str, session_id: str, max_events: int, query_hash: str = ""):
+        self.stream_id = stream_id
+        self.session_id = session_id
+        self.query_hash = query_hash
+        self.events: deque = deque(maxlen=max_events)
+        self.next_sequence = 0
+        self.finished = False
+        self.finished_at = 0.0
+        self.followers = 0
+        self.abandoned = False
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def first_sequence(self) -> int:
+        """Sequence number of the oldest event still in the ring."""
+        return self.next_sequence - len(self.events)
+
+    def append(self, event: Dict[str, str]) -> None:
+        self.events.append({**event, "id": f"{self.stream_id}:{self.next_sequence}"})
+        self.next_sequence += 1
+        self._notify()
+
+    def finish(self) -> None:
+        self.finished = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def can_resume(self, after: int) -> bool:
+        """True if every event after sequence `after` is still buffered."""
+        return self.first_sequence <= after + 1 <= self.next_sequence
+
+    async def follow(self, after: int = -1) -> AsyncIterator[Dict[str, str]]:
+        """
+        Yield the events after sequence `after`, then new ones until the stream finishes.
+
+        Stops early if a slow follower was overtaken by the ring, so the client
+        never receives a stream with a hole in it.
+        """
+        position = after + 1
+        while True:
+            while position < self.next_sequence:
+                offset = position - self.first_sequence
+                if offset < 0:
+                    _logger.warning("replay_overrun", stream_id=self.stream_id, position=position)
+                    return
+                yield self.events[offset]
+                position += 1
+            if self.finished:
+                return
+            changed = self._changed
+            await changed.wait()
+
+    def _notify(self) -> None:
+        # Wake the current waiters and give later ones a fresh event to wait on
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class ReplayStore:
+    """
+    Runs /query generations detached from their connection so clients can resume.
+
+    A generation writes into a ReplayBuffer from its own task; responses only
+    follow the buffer. When the last follower disconnects, the generation is
+    cancelled after a grace period unless a client resumes it with
+    `Last-Event-ID`. Finished buffers are kept for a while so a reconnect can
+    replay the answer instead of generating it again.
+    """
+
+    def __init__(
+            self,
+            max_events: int = 2000,
+            max_streams: int = 1000,
+            ttl: float = 120.0,
+            resume_grace: float = 10.0
+    ):
+        self.max_events = max_events
+        self.max_streams = max_streams
+        self.ttl = ttl
+        self.resume_grace = resume_grace
+        self._running: Dict[str, ReplayBuffer] = {}
+        # Finished buffers in the order they finished, oldest first
+        self._finished: "OrderedDict[str, ReplayBuffer]" = OrderedDict()
+        self._resumed = 0
+
+    @classmethod
+    def from_env(cls) -> "ReplayStore":
+        """Read the limits from REPLAY_* environment variables."""
+        return cls(
+            max_events=int(os.getenv("REPLAY_MAX_EVENTS", "2000")),
+            max_streams=int(os.getenv("REPLAY_MAX_STREAMS", "1000")),
+            ttl=float(os.getenv("REPLAY_TTL_SECONDS", "120")),
+            resume_grace=float(os.getenv("REPLAY_RESUME_GRACE_SECONDS", "10"))
+        )
+
+    def start(self, session_id: str, events: AsyncIterator[Dict[str, str]], query: str = "") -> ReplayBuffer:
+        """
+        Start relaying `events` into a new buffer from a background task.
+
+        Args:
+            session_id: The session the stream belongs to
+            events: The event dicts of the answer
+            query: The query being answered; only a request for the same query resumes the stream
+
+        Returns:
+            The buffer; its `task` finishes when `events` is exhausted or cancelled
+        """
+        self._expire()
+        buffer = ReplayBuffer(uuid.uuid4().hex, session_id, self.max_events, _query_hash(query))
+        self._running[buffer.stream_id] = buffer
+        buffer.task = asyncio.ensure_future(self._produce(buffer, events))
+        return buffer
+
+    def resume(
+            self,
+            session_id: str,
+            query: str,
+            last_event_id: Optional[str]
+    ) -> Optional[AsyncIterator[Dict[str, str]]]:
+        """
+        Continue a stream after the event the client saw last.
+
+        Args:
+            session_id: The session of the resuming request
+            query: The query of the resuming request
+            last_event_id: The `Last-Event-ID` header
+
+        Returns:
+            The remaining events, or None if the stream is unknown, belongs to
+            another session or answers another query (e.g. a new message sent
+            with a stale Last-Event-ID), or no longer has all of the missed events
+        """
+        parsed = parse_event_id(last_event_id)
+        if parsed is None:
+            return None
+        self._expire()
+        stream_id, after = parsed
+        buffer = self._running.get(stream_id) or self._finished.get(stream_id)
+        if (
+                buffer is None or buffer.abandoned or buffer.session_id != session_id
+                or buffer.query_hash != _query_hash(query) or not buffer.can_resume(after)
+        ):
+            return None
+        self._resumed += 1
+        return self.follow(buffer, after)
+
+    async def follow(self, buffer: ReplayBuffer, after: int = -1) -> AsyncIterator[Dict[str, str]]:
+        """Relay a buffer to one client, cancelling an abandoned generation when it leaves."""
+        buffer.followers += 1
+        try:
+            async for event in buffer.follow(after):
+                yield event
+        finally:
+            buffer.followers -= 1
+            if not buffer.followers and not buffer.finished:
+                if self.resume_grace > 0:
+                    asyncio.get_running_loop().call_later(self.resume_grace, self._cancel_if_abandoned, buffer)
+                else:
+                    self._cancel_if_abandoned(buffer)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": len(self._running), "finished": len(self._finished), "resumed": self._resumed}
+
+    async def _produce(self, buffer: ReplayBuffer, events: AsyncIterator[Dict[str, str]]) -> None:
+        try:
+            async with aclosing(events) as source:
+                async for event in source:
+                    buffer.append(event)
+        except Exception as e:
+            _logger.error("replay_stream_failed", stream_id=buffer.stream_id, error=f"{type(e).__name__}: {e}")
+        finally:
+            buffer.finish()
+            self._running.pop(buffer.stream_id, None)
+            # An abandoned stream is incomplete; a reconnect generates a new answer
+            if not buffer.abandoned:
+                self._finished[buffer.stream_id] = buffer
+
+    def _cancel_if_abandoned(self, buffer: ReplayBuffer) -> None:
+        if not buffer.followers and not buffer.finished and buffer.task is not None:
+            buffer.abandoned = True
+            buffer.task.cancel()
+
+    def _expire(self) -> None:
+        """Drop finished buffers past their TTL, then the oldest ones over the stream limit."""
+        deadline = time.monotonic() - self.ttl
+        while self._finished:
+            stream_id, buffer = next(iter(self._finished.items()))
+            if buffer.finished_at > deadline and len(self._running) + len(self._finished) < self.max_streams:
+                break
+            del self._finished[stream_id]
@@ -0,0 +1,378 @@
+import re
+import json
+import math
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+# Entities a similar query has to repeat exactly (see query_entities)
+_DATE = re.compile(r"\b(?:\d{4}-\d{2}-\d{2}|today|tomorrow)\b")
+_TIME = re.compile(r"\b\d{1,2}:\d{2}\b")
+_DEALERSHIP_ID = re.compile(r"\b[a-z]{2,4}-?\d{3}\b")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query, collapse whitespace and strip trailing punctuation."""
+    query = _WHITESPACE.sub(" ", query.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", query)
+
+
+def char_ngrams(text: str, n: int = 3) -> Dict[str, int]:
+    """Count the character n-grams of a space-padded string."""
+    padded = f" {text} "
+    counts: Dict[str, int] = {}
+    for i in range(max(len(padded) - n + 1, 1)):
+        gram = padded[i:i + n]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class _Entry:
+    __slots__ = ("context", "query", "events", "expires_at", "tool_calls")
+
+    def __init__(
+            self,
+            context: str,
+            query: str,
+            events: List[Dict[str, str]],
+            expires_at: float,
+            tool_calls: List[Tuple[str, Dict[str, Any]]]
+    ):
+        self.context = context
+        self.query = query
+        self.events = events
+        self.expires_at = expires_at
+        self.tool_calls = tool_calls
+
+
+def query_entities(normalized_query: str) -> Tuple[str, ...]:
+    """
+    Return the dates, times and dealership IDs a normalized query names.
+
+    Near-duplicate matches must name exactly the same ones: "slots at LA002 on
+    2030-05-15" is one character away from the 2030-05-14 question but needs
+    a different answer.
+    """
+    entities = set(_DATE.findall(normalized_query)) | set(_TIME.findall(normalized_query))
+    entities.update(match.replace("-", "") for match in _DEALERSHIP_ID.findall(normalized_query))
+    return tuple(sorted(entities))
+
+
+class _SimilarityIndex:
+    """
+    Character n-gram TF-IDF index over the cached queries of one context.
+
+    Queries are kept as sparse n-gram counts with an inverted index from each
+    n-gram to the queries containing it, so adding or removing a query only
+    touches its own n-grams and a lookup only scores the queries sharing one
+    with it. IDF weights and the cached queries' norms are recomputed once the
+    index has changed by a quarter of its size; in between, new n-grams get
+    their weight when first added and existing weights lag slightly behind.
+    """
+
+    def __init__(self, ngram_size: int):
+        self.ngram_size = ngram_size
+        self.queries: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._weights: Dict[str, float] = {}
+        self._norms: Dict[str, float] = {}
+        self._changes = 0
+
+    def add(self, query: str) -> None:
+        if query in self.queries:
+            return
+        counts = char_ngrams(query, self.ngram_size)
+        self.queries[query] = counts
+        for gram in counts:
+            posting = self._postings.setdefault(gram, set())
+            posting.add(query)
+            if gram not in self._weights:
+                self._weights[gram] = self._idf(len(posting))
+        self._norms[query] = self._norm(counts)
+        self._changes += 1
+
+    def remove(self, query: str) -> None:
+        counts = self.queries.pop(query, None)
+        if counts is None:
+            return
+        del self._norms[query]
+        for gram in counts:
+            posting = self._postings[gram]
+            posting.discard(query)
+            if not posting:
+                del self._postings[gram]
+                del self._weights[gram]
+        self._changes += 1
+
+    def nearest(self, query: str) -> Tuple[Optional[str], float]:
+        """Return the most similar cached query and its cosine similarity."""
+        if not self.queries:
+            return None, 0.0
+        if self._changes * 4 > len(self.queries):
+            self._reweight()
+
+        # Every n-gram of the query counts towards its norm, including those
+        # no cached query has; they only make it less similar to all of them
+        unknown = self._idf(0)
+        vector = {
+            gram: count * self._weights.get(gram, unknown)
+            for gram, count in char_ngrams(query, self.ngram_size).items()
+        }
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm == 0:
+            return None, 0.0
+
+        dots: Dict[str, float] = {}
+        for gram, value in vector.items():
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            value *= self._weights[gram]
+            for cached in posting:
+                dots[cached] = dots.get(cached, 0.0) + value * self.queries[cached][gram]
+
+        best, best_score = None, 0.0
+        for cached, dot in dots.items():
+            score = dot / (norm * self._norms[cached])
+            if score > best_score:
+                best, best_score = cached, score
+        return best, best_score
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log((1 + len(self.queries)) / (1 + document_frequency)) + 1
+
+    def _norm(self, counts: Dict[str, int]) -> float:
+        return math.sqrt(sum((count * self._weights[gram]) ** 2 for gram, count in counts.items()))
+
+    def _reweight(self) -> None:
+        self._weights = {gram: self._idf(len(posting)) for gram, posting in self._postings.items()}
+        self._norms = {query: self._norm(counts) for query, counts in self.queries.items()}
+        self._changes = 0
+
+
+class ResponseCache:
+    """
+    Cache of complete SSE event sequences for repeated questions.
+
+    Entries are keyed on the normalized system prompt, the tool schema version,
+    the trailing `history_window` messages and the normalized query. Turns
+    with more prior history than the window are not cached. An optional
+    similarity tier matches near-duplicate queries within the same context
+    using character n-gram TF-IDF cosine similarity; a near-duplicate has to
+    name the same dates, times and dealership IDs.
+
+    Each entry remembers the tool calls its response used, so a successful
+    call with side effects drops the responses it made stale, following the
+    same `invalidations` rules as the tool result cache.
+    """
+
+    def __init__(
+            self,
+            schema_version: str,
+            ttl_seconds: float = 600.0,
+            max_entries: int = 1024,
+            history_window: int = 0,
+            similarity_threshold: float = 0.0,
+            ngram_size: int = 3,
+            invalidations: Optional[Dict[str, List[Tuple[str, Tuple[str, ...]]]]] = None
+    ):
+        self.schema_version = schema_version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.history_window = history_window
+        self.similarity_threshold = similarity_threshold
+        self.ngram_size = ngram_size
+        self.invalidations = invalidations or {}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # One index per context and set of named entities
+        self._indexes: Dict[Tuple[str, Tuple[str, ...]], _SimilarityIndex] = {}
+        self._generation = 0
+        self.counters = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "bypassed": 0, "invalidated": 0}
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever entries are invalidated; pass it to `store` to skip responses that raced with one."""
+        return self._generation
+
+    def context_key(self, conversation_history: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Hash everything except the query that determines the response.
+
+        Args:
+            conversation_history: Previous conversation messages
+
+        Returns:
+            The context hash, or None if the history is too long to be cached
+        """
+        system = [normalize_query(m.get("content") or "") for m in conversation_history if m.get("role") == "system"]
+        turns = [m for m in conversation_history if m.get("role") != "system"]
+        if len(turns) > self.history_window:
+            return None
+        payload = json.dumps([system, self.schema_version, turns], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(
+            self,
+            context: Optional[str],
+            query: str,
+            outcome: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Find cached events for a query, trying the exact tier first.
+
+        Args:
+            context: Result of `context_key`
+            query: The user's query
+            outcome: On a hit, receives the (name, arguments) of the cached
+                response's tool calls under "tool_calls"
+
+        Returns:
+            The recorded events, or None on a miss
+        """
+        if context is None:
+            self.counters["bypassed"] += 1
+            return None
+
+        normalized = normalize_query(query)
+        entry = self._get(self._key(context, normalized))
+        if entry is not None:
+            self.counters["exact_hits"] += 1
+            return self._hit(entry, outcome)
+
+        index = self._indexes.get((context, query_entities(normalized))) if self.similarity_threshold > 0 else None
+        if index is not None:
+            match, score = index.nearest(normalized)
+            if match is not None and score >= self.similarity_threshold:
+                entry = self._get(self._key(context, match))
+                if entry is not None:
+                    self.counters["similar_hits"] += 1
+                    return self._hit(entry, outcome)
+
+        self.counters["misses"] += 1
+        return None
+
+    def store(
+            self,
+            context: Optional[str],
+            query: str,
+            events: List[Dict[str, str]],
+            ttl_seconds: Optional[float] = None,
+            tool_calls: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+            generation: Optional[int] = None
+    ) -> None:
+        """
+        Record the events of a completed response.
+
+        Args:
+            context: Result of `context_key`
+            query: The user's query
+            events: Every event yielded for the query, including the end event
+            ttl_seconds: Overrides the default TTL, e.g. to respect tool result TTLs
+            tool_calls: The (name, arguments) of the tool calls the response used
+            generation: `generation` from before the response was generated; the
+                response is not stored if entries were invalidated since
+        """
+        if context is None:
+            return
+        if generation is not None and generation != self._generation:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+
+        normalized = normalize_query(query)
+        key = self._key(context, normalized)
+        previous = self._entries.get(key)
+        if previous is not None:
+            self._unindex(previous)
+        calls = [(name, dict(arguments)) for name, arguments in tool_calls or []]
+        self._entries[key] = _Entry(context, normalized, list(events), time.monotonic() + ttl, calls)
+        self._entries.move_to_end(key)
+        if self.similarity_threshold > 0:
+            index_key = (context, query_entities(normalized))
+            self._indexes.setdefault(index_key, _SimilarityIndex(self.ngram_size)).add(normalized)
+
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._unindex(evicted)
+
+    def invalidate(self, name: str, **arguments: Any) -> int:
+        """
+        Drop cached responses that used a tool with matching arguments.
+
+        Args:
+            name: The tool whose responses to drop
+            arguments: Argument values to match; no arguments drops every response using the tool
+
+        Returns:
+            The number of entries removed
+        """
+        self._generation += 1
+        stale = [
+            key for key, entry in self._entries.items()
+            if any(
+                tool_name == name and all(tool_arguments.get(k) == v for k, v in arguments.items())
+                for tool_name, tool_arguments in entry.tool_calls
+            )
+        ]
+        for key in stale:
+            self._unindex(self._entries.pop(key))
+        self.counters["invalidated"] += len(stale)
+        return len(stale)
+
+    def apply_invalidations(self, name: str, arguments: Dict[str, Any], result: Any) -> None:
+        """Invalidate responses that a successful call to `name` has made stale."""
+        if isinstance(result, dict) and "error" in result:
+            return
+        for cached_tool, shared_arguments in self.invalidations.get(name, []):
+            self.invalidate(cached_tool, **{
+                argument: arguments[argument] for argument in shared_arguments if argument in arguments
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and hit/miss counters."""
+        return {"entries": len(self._entries), **self.counters}
+
+    def _hit(self, entry: _Entry, outcome: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        if outcome is not None:
+            outcome.setdefault("tool_calls", []).extend(entry.tool_calls)
+        return entry.events
+
+    def _key(self, context: str, normalized_query: str) -> str:
+        return f"{context}:{normalized_query}"
+
+    def _get(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            self._unindex(entry)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _unindex(self, entry: _Entry) -> None:
+        index_key = (entry.context, query_entities(entry.query))
+        index = self._indexes.get(index_key)
+        if index is None:
+            return
+        index.remove(entry.query)
+        if not index.queries:
+            del self._indexes[index_key]
+
+
+def response_ttl(tool_names: List[str], tool_ttls: Dict[str, float]) -> float:
+    """
+    Return how long a response built from the given tool calls stays valid.
+
+    Responses that used an uncached (e.g. state-changing) tool get 0 and
+    are not cached at all.
+    """
+    ttl = math.inf
+    for name in tool_names:
+        ttl = min(ttl, tool_ttls.get(name, 0.0))
+    return ttl
@@ -0,0 +1,375 @@
+import os
+import re
+import math
+import time
+from datetime import date as Date, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from tools import ToolExecutor
+from tools.directory import Dealership, DealershipDirectory, get_directory, normalize_name
+from metrics import ROUTER_DECISIONS, observe_phase
+from utils import format_chunk_event, format_end_event, format_tool_output_event, format_tool_use_event, get_logger
+
+_logger = get_logger("router")
+
+# Intent keywords, matched on the lowercased query. A query has to match
+# exactly one intent to be answered locally (next_slots wins over availability)
+_INTENTS = (
+    ("weather", re.compile(r"\b(?:weather|temperature|forecast|rain(?:ing|y)?|sunny|snow(?:ing|y)?)\b")),
+    ("dealership_info", re.compile(
+        r"\b(?:address|located|location|directions|hours|opening times|phone|contact)\b"
+        r"|\bwhere(?:'s| is| are)\b|\bwhen (?:is|does|do) .+\b(?:open|close)\b"
+    )),
+    ("availability", re.compile(r"\b(?:slots?|availab(?:le|ility)|openings|free times?)\b")),
+    ("next_slots", re.compile(
+        r"\b(?:next|earliest|soonest|first)\b.*\b(?:slots?|availab\w*|appointments?|test drive|times?|openings?)\b"
+    ))
+)
+_HOURS = re.compile(r"\b(?:hours|opening times|open|close[ds]?|closing)\b")
+_PHONE = re.compile(r"\b(?:phone|call|contact|number)\b")
+# Requests with side effects, several parts, opinions or negations always go to the model
+_BLOCKERS = re.compile(
+    r"\b(?:book|booking|schedule|reserve|cancel|reschedule|change|price|prices|cost|finance|financing|lease"
+    r"|compare|recommend|best|good|should|which|and|also|not|no)\b|n't\b"
+)
+_DEALERSHIP_ID = re.compile(r"\b[a-z]{2,4}-?\d{3}\b")
+_DATE = re.compile(r"\b(?:\d{4}-\d{2}-\d{2}|today|tomorrow)\b")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Labelled examples for the optional classifier. Places are written as
+# "place" and dates as "date", which is how queries are masked before scoring
+TRAINING_EXAMPLES = {
+    "weather": [
+        "what's the weather in place",
+        "how is the weather in place today",
+        "is it raining in place",
+        "what is the temperature in place right now",
+        "weather forecast for place",
+        "is it sunny in place"
+    ],
+    "dealership_info": [
+        "where is the place dealership",
+        "what is the address of place",
+        "what are the opening hours of place",
+        "when is the place showroom open",
+        "phone number of the place dealership",
+        "what's the phone number for place",
+        "how can I contact place",
+        "how do I get to the place store, directions please"
+    ],
+    "availability": [
+        "are there any test drive slots at place on date",
+        "what times are available at place on date",
+        "check availability at place for date",
+        "any free times at the place dealership date"
+    ],
+    "next_slots": [
+        "when is the next available slot at place",
+        "earliest test drive at the place dealership",
+        "find me the next open appointment at place",
+        "soonest available time at place after date"
+    ],
+    "other": [
+        "book a test drive at place on date at 10:00",
+        "tell me about your newest models",
+        "how fast is the roadster and what does it cost",
+        "which car would you recommend for a family",
+        "can you cancel my appointment",
+        "hello, what can you do",
+        "is the weather good for a test drive in place and which cars can I drive",
+        "thanks, that's all"
+    ]
+}
+
+
+def _features(text: str) -> List[str]:
+    """Unigrams and bigrams of a normalized query."""
+    words = _TOKEN.findall(text)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class IntentClassifier:
+    """
+    Multinomial naive Bayes over word unigrams and bigrams.
+
+    Small enough to train at startup from TRAINING_EXAMPLES; used as a second
+    opinion on the keyword match, so only queries both agree on are routed.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]], smoothing: float = 1.0):
+        counts: Dict[str, Dict[str, int]] = {}
+        vocabulary = set()
+        for label, texts in examples.items():
+            label_counts = counts.setdefault(label, {})
+            for text in texts:
+                for feature in _features(normalize_name(text)):
+                    label_counts[feature] = label_counts.get(feature, 0) + 1
+                    vocabulary.add(feature)
+        total_examples = sum(len(texts) for texts in examples.values())
+        self._priors = {label: math.log(len(texts) / total_examples) for label, texts in examples.items()}
+        self._log_probs: Dict[str, Dict[str, float]] = {}
+        self._unseen: Dict[str, float] = {}
+        for label, label_counts in counts.items():
+            denominator = sum(label_counts.values()) + smoothing * len(vocabulary)
+            self._log_probs[label] = {
+                feature: math.log((count + smoothing) / denominator) for feature, count in label_counts.items()
+            }
+            self._unseen[label] = math.log(smoothing / denominator)
+        self._vocabulary = vocabulary
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Classify a masked, normalized query.
+
+        Returns:
+            The most likely label and its posterior probability
+        """
+        features = [feature for feature in _features(text) if feature in self._vocabulary]
+        scores = {}
+        for label, prior in self._priors.items():
+            log_probs, unseen = self._log_probs[label], self._unseen[label]
+            scores[label] = prior + sum(log_probs.get(feature, unseen) for feature in features)
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+
+class RouteMatch:
+    __slots__ = ("route", "tool", "arguments", "dealership", "day", "aspect")
+
+    def __init__(self, route: str, tool: str, arguments: Dict[str, Any], dealership: Optional[Dealership] = None,
+                 day: Optional[Date] = None, aspect: str = ""):
+        self.route = route
+        self.tool = tool
+        self.arguments = arguments
+        self.dealership = dealership
+        self.day = day
+        self.aspect = aspect
+
+
+class IntentRouter:
+    """
+    Answers simple, unambiguous queries without calling the LLM.
+
+    A query is routed when it matches exactly one intent pattern, names
+    exactly the entities that intent needs (a known city, a known dealership,
+    a date) and nothing that needs judgement, such as a booking. The tool is
+    called directly and its output is rendered into a templated reply, with
+    the same tool_use, tool_output, chunk and end events a model answer has.
+    Everything else, including tool errors, falls through to the model.
+    """
+
+    def __init__(
+            self,
+            directory: DealershipDirectory,
+            max_words: int = 20,
+            classifier: Optional[IntentClassifier] = None,
+            classifier_threshold: float = 0.6
+    ):
+        self.directory = directory
+        self.max_words = max_words
+        self.classifier = classifier
+        self.classifier_threshold = classifier_threshold
+
+        # Normalized place label -> (dealership there, if any; city display name)
+        self._places: Dict[str, Tuple[Optional[Dealership], str]] = {}
+        for dealership in directory.dealerships:
+            for label in [dealership.city, dealership.name] + dealership.aliases:
+                key = normalize_name(label)
+                if key:
+                    self._places.setdefault(key, (dealership, dealership.city))
+        for key, city in directory.city_names.items():
+            self._places.setdefault(key, (None, city))
+        # Longest labels first so "new york city" wins over "new york"
+        labels = sorted(self._places, key=len, reverse=True)
+        self._place_pattern = re.compile(r"\b(?:" + "|".join(re.escape(label) for label in labels) + r")\b")
+
+    @classmethod
+    def from_env(cls) -> "IntentRouter":
+        """Build a router over the dealership directory, configured by ROUTER_* environment variables."""
+        classifier = None
+        if os.getenv("ROUTER_CLASSIFIER_ENABLED", "false").lower() == "true":
+            classifier = IntentClassifier(TRAINING_EXAMPLES)
+        return cls(
+            get_directory(),
+            max_words=int(os.getenv("ROUTER_MAX_WORDS", "20")),
+            classifier=classifier,
+            classifier_threshold=float(os.getenv("ROUTER_CLASSIFIER_THRESHOLD", "0.6"))
+        )
+
+    def match(self, query: str) -> Optional[RouteMatch]:
+        """
+        Decide whether a query can be answered locally.
+
+        Args:
+            query: The user's query
+
+        Returns:
+            The route with its tool call, or None if the model should answer
+        """
+        lowered = query.strip().lower()
+        if not lowered or len(lowered.split()) > self.max_words or _BLOCKERS.search(lowered):
+            return None
+        intents = [name for name, pattern in _INTENTS if pattern.search(lowered)]
+        if "next_slots" in intents and "availability" in intents:
+            intents.remove("availability")
+        if len(intents) != 1:
+            return None
+        intent = intents[0]
+
+        # Entities: dealership IDs, places (cities, dealership names and aliases) and dates
+        dealerships = []
+        for token in _DEALERSHIP_ID.findall(lowered):
+            dealership = self.directory.get(token)
+            if dealership is None:
+                return None
+            dealerships.append(dealership)
+        days = []
+        for token in _DATE.findall(lowered):
+            day = _parse_day(token)
+            if day is None:
+                return None
+            days.append(day)
+        masked = normalize_name(_DATE.sub(" date ", _DEALERSHIP_ID.sub(" place ", lowered)))
+        places = [self._places[found] for found in self._place_pattern.findall(masked)]
+        if self.classifier is not None:
+            label, probability = self.classifier.predict(self._place_pattern.sub("place", masked))
+            if label != intent or probability < self.classifier_threshold:
+                return None
+
+        if intent == "weather":
+            cities = {city for _, city in places} | {dealership.city for dealership in dealerships}
+            # The weather tool only knows the current conditions
+            if len(cities) != 1 or any(day != Date.today() for day in days):
+                return None
+            city = cities.pop()
+            return RouteMatch(intent, "get_weather", {"city": city})
+
+        # The other intents are about exactly one dealership; a city without
+        # one needs the nearest-dealership answer, which is left to the model
+        if any(dealership is None for dealership, _ in places):
+            return None
+        named = {dealership.id: dealership for dealership, _ in places}
+        named.update((dealership.id, dealership) for dealership in dealerships)
+        if len(named) != 1:
+            return None
+        dealership = next(iter(named.values()))
+
+        if intent == "dealership_info":
+            aspect = "hours" if _HOURS.search(lowered) else "phone" if _PHONE.search(lowered) else "address"
+            return RouteMatch(
+                intent, "get_dealership_address", {"dealership_id": dealership.id}, dealership, aspect=aspect
+            )
+        if len(days) > 1:
+            return None
+        if intent == "availability":
+            if not days:
+                return None
+            return RouteMatch(
+                intent, "check_appointment_availability",
+                {"dealership_id": dealership.id, "date": days[0].isoformat()}, dealership, days[0]
+            )
+        day = days[0] if days else Date.today()
+        return RouteMatch(
+            intent, "find_next_available_slots",
+            {"dealership_id": dealership.id, "start_date": day.isoformat()}, dealership, day
+        )
+
+    async def route(
+            self,
+            query: str,
+            executor: ToolExecutor,
+            outcome: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Answer a query locally if it matches a route.
+
+        Args:
+            query: The user's query
+            executor: Runs the tool call, with its timeout and result cache
+            outcome: Receives the (name, arguments) of the tool call under "tool_calls"
+                when the query is answered
+
+        Returns:
+            The complete SSE events of the answer, or None if the model should answer
+        """
+        started = time.perf_counter()
+        match = self.match(query)
+        if match is None:
+            ROUTER_DECISIONS.inc(route="llm")
+            return None
+
+        result = await executor.run(match.tool, match.arguments)
+        reply = _render(match, result)
+        if reply is None:
+            _logger.log("route_fallthrough", route=match.route, tool=match.tool)
+            ROUTER_DECISIONS.inc(route="llm")
+            return None
+
+        ROUTER_DECISIONS.inc(route=match.route)
+        if outcome is not None:
+            outcome.setdefault("tool_calls", []).append((match.tool, match.arguments))
+        observe_phase("route", time.perf_counter() - started, route=match.route)
+        return [
+            format_tool_use_event(match.tool),
+            format_tool_output_event(match.tool, result),
+            format_chunk_event(reply),
+            format_end_event()
+        ]
+
+
+def _parse_day(token: str) -> Optional[Date]:
+    if token == "today":
+        return Date.today()
+    if token == "tomorrow":
+        return Date.today() + timedelta(days=1)
+    try:
+        return Date.fromisoformat(token)
+    except ValueError:
+        return None
+
+
+def _format_day(day: Date) -> str:
+    return f"{day:%A}, {day:%B} {day.day}"
+
+
+def _join(items: List[str]) -> str:
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def _render(match: RouteMatch, result: Any) -> Optional[str]:
+    """Fill in the reply template of a route, or return None if the result does not fit it."""
+    if isinstance(result, dict) and "error" in result:
+        return None
+
+    if match.route == "weather":
+        return result if isinstance(result, str) else None
+
+    dealership = match.dealership
+    if match.route == "dealership_info":
+        if match.aspect == "hours":
+            return f"{dealership.name} is open {dealership.hours}."
+        if match.aspect == "phone":
+            return f"You can reach {dealership.name} at {dealership.phone}."
+        return f"{dealership.name} is at {dealership.address}. It's open {dealership.hours}."
+
+    if not isinstance(result, list):
+        return None
+    if match.route == "availability":
+        if not result:
+            return (
+                f"{dealership.name} has no open test drive slots on {_format_day(match.day)}. "
+                "I can look for the next available ones if you like."
+            )
+        return (
+            f"{dealership.name} has open test drive slots on {_format_day(match.day)} "
+            f"at {_join(result)}. Would you like me to book one?"
+        )
+
+    if not result:
+        return f"{dealership.name} has no open test drive slots in the week from {_format_day(match.day)}."
+    times_by_day: Dict[str, List[str]] = {}
+    for slot in result:
+        times_by_day.setdefault(slot["date"], []).append(slot["time"])
+    slots = [f"{_format_day(Date.fromisoformat(day))} at {_join(times)}" for day, times in times_by_day.items()]
+    return f"The next open test drive slots at {dealership.name} are {'; '.join(slots)}. Would you like me to book one?"
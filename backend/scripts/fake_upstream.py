@@ -0,0 +1,87 @@
+"""
+A fake OpenAI-compatible chat completions server for exercising the upstream
+transport (retries, deadlines, hedging, circuit breaker) without the real API.
+
+Run it next to the backend and point the Groq client at it:
+
+    uvicorn scripts.fake_upstream:app --port 9000
+    GROQ_BASE_URL=http://localhost:9000 uvicorn main:app
+
+Behaviour is controlled with environment variables:
+    FAKE_UPSTREAM_FIRST_BYTE_DELAY   seconds before the first chunk (default 0.05)
+    FAKE_UPSTREAM_CHUNK_DELAY        seconds between chunks (default 0.01)
+    FAKE_UPSTREAM_FAILURE_RATE       fraction of requests answered with an error (default 0)
+    FAKE_UPSTREAM_FAILURE_STATUS     HTTP status of injected failures (default 503)
+    FAKE_UPSTREAM_REPLY              text streamed back
+"""
+import os
+import json
+import time
+import random
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake OpenAI-compatible upstream")
+
+FIRST_BYTE_DELAY = float(os.getenv("FAKE_UPSTREAM_FIRST_BYTE_DELAY", "0.05"))
+CHUNK_DELAY = float(os.getenv("FAKE_UPSTREAM_CHUNK_DELAY", "0.01"))
+FAILURE_RATE = float(os.getenv("FAKE_UPSTREAM_FAILURE_RATE", "0"))
+FAILURE_STATUS = int(os.getenv("FAKE_UPSTREAM_FAILURE_STATUS", "503"))
+REPLY = os.getenv(
+    "FAKE_UPSTREAM_REPLY",
+    "Thanks for reaching out to SuperCar! How can I help you today?"
+)
+
+
+def _chunk(model: str, delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or "fake-model"
+
+    if random.random() < FAILURE_RATE:
+        return JSONResponse(
+            {"error": {"message": "Injected failure", "type": "server_error"}},
+            status_code=FAILURE_STATUS,
+            headers={"retry-after": "0"}
+        )
+
+    words = [word + " " for word in REPLY.split(" ")]
+    words[-1] = words[-1].rstrip()
+
+    async def stream():
+        await asyncio.sleep(FIRST_BYTE_DELAY)
+        yield _chunk(model, {"role": "assistant", "content": ""})
+        for word in words:
+            await asyncio.sleep(CHUNK_DELAY)
+            yield _chunk(model, {"content": word})
+        yield _chunk(model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    if not body.get("stream"):
+        await asyncio.sleep(FIRST_BYTE_DELAY)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": REPLY},
+                "finish_reason": "stop"
+            }]
+        }
+    return StreamingResponse(stream(), media_type="text/event-stream")
@@ -0,0 +1,45 @@
+"""
+Production entry point: several uvicorn worker processes, without reload.
+
+    python serve.py
+
+WEB_CONCURRENCY sets the number of workers (default: one per CPU core). With
+more than one worker, conversation history and appointment bookings must
+live in state shared by the processes, so SESSION_STORE defaults to sqlite
+and APPOINTMENT_JOURNAL_PATH to appointments.jsonl. Everything else
+(admission limits, caches, replay buffers, metrics) is per worker.
+"""
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+from utils import get_logger
+
+_logger = get_logger("serve")
+
+
+def main() -> None:
+    load_dotenv()
+    workers = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    if workers > 1:
+        os.environ.setdefault("SESSION_STORE", "sqlite")
+        os.environ.setdefault("APPOINTMENT_JOURNAL_PATH", "appointments.jsonl")
+        if os.environ["SESSION_STORE"].lower() != "sqlite":
+            _logger.warning("sessions_not_shared", workers=workers, session_store=os.environ["SESSION_STORE"])
+        if not os.environ["APPOINTMENT_JOURNAL_PATH"]:
+            _logger.warning("appointments_not_shared", workers=workers)
+
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("UVICORN_HOST", "0.0.0.0"),
+        port=int(os.getenv("UVICORN_PORT", "8000")),
+        workers=workers,
+        # Let open streams finish on shutdown, but not forever
+        timeout_graceful_shutdown=int(os.getenv("UVICORN_GRACEFUL_SHUTDOWN_SECONDS", "30")),
+        log_level=os.getenv("UVICORN_LOG_LEVEL", "info")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+
+from .base import SessionStore
+from .memory import InMemorySessionStore
+from .sqlite import SQLiteSessionStore
+
+__all__ = [
+    "SessionStore",
+    "InMemorySessionStore",
+    "SQLiteSessionStore",
+    "create_session_store"
+]
+
+
+def create_session_store() -> SessionStore:
+    """
+    Build the session store selected by the SESSION_STORE environment variable.
+
+    Returns:
+        SessionStore: "memory" (default) or "sqlite" backend
+    """
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    options = {
+        "history_window": int(os.getenv("SESSION_HISTORY_WINDOW", "40")),
+        "max_sessions": int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+        "max_bytes": int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+        "ttl_seconds": float(os.getenv("SESSION_TTL_SECONDS", "3600")),
+    }
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            path=os.getenv("SESSION_SQLITE_PATH", "sessions.db"),
+            evict_every=int(os.getenv("SESSION_SQLITE_EVICT_EVERY", "64")),
+            **options
+        )
+    if backend == "memory":
+        return InMemorySessionStore(**options)
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
@@ -0,0 +1,106 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Optional
+
+
+def message_size(message: Dict[str, Any]) -> int:
+    """Approximate the memory footprint of a message by its JSON size in bytes."""
+    return len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+class SessionStore(ABC):
+    """
+    Conversation history storage keyed by session ID.
+
+    Every session keeps at most `history_window` messages (older ones fall off
+    the front like a ring buffer). Sessions idle for longer than `ttl_seconds`
+    expire, and the least recently used sessions are evicted whenever the store
+    exceeds `max_sessions` sessions or `max_bytes` of message payload.
+    """
+
+    def __init__(
+            self,
+            history_window: int = 10,
+            max_sessions: int = 10000,
+            max_bytes: int = 64 * 1024 * 1024,
+            ttl_seconds: float = 3600.0
+    ):
+        if history_window < 1:
+            raise ValueError("history_window must be at least 1")
+        self.history_window = history_window
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return a copy of the session's history and mark it as recently used.
+
+        Args:
+            session_id: The session to look up
+
+        Returns:
+            The stored messages, or None if the session is unknown or expired
+        """
+
+    @abstractmethod
+    def create(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        Create (or reset) a session with the given initial messages.
+
+        Args:
+            session_id: The session to create
+            messages: Initial messages, e.g. the system prompt
+        """
+
+    @abstractmethod
+    def append(self, session_id: str, *messages: Dict[str, Any]) -> None:
+        """
+        Append messages to a session, dropping the oldest beyond the window.
+
+        Args:
+            session_id: The session to append to
+            messages: Messages to append
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session from the store."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of live sessions."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Return counters describing the store's current size and evictions."""
+
+    def get_or_create(self, session_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return the session's history, creating it with `messages` if missing.
+
+        Args:
+            session_id: The session to look up
+            messages: Initial messages used when the session does not exist
+
+        Returns:
+            The stored messages
+        """
+        history = self.get(session_id)
+        if history is None:
+            self.create(session_id, messages)
+            history = list(messages[-self.history_window:])
+        return history
+
+    async def aget(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """`get` for callers on the event loop; stores that block on I/O run it on a thread."""
+        return self.get(session_id)
+
+    async def aappend(self, session_id: str, *messages: Dict[str, Any]) -> None:
+        """`append` for callers on the event loop; stores that block on I/O run it on a thread."""
+        self.append(session_id, *messages)
+
+    def close(self) -> None:
+        """Release any resources held by the store."""
@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Deque
+
+from .base import SessionStore, message_size
+
+
+class _Session:
+    __slots__ = ("messages", "sizes", "size", "last_access")
+
+    def __init__(self, maxlen: int):
+        self.messages: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+        self.sizes: Deque[int] = deque(maxlen=maxlen)
+        self.size = 0
+        self.last_access = time.monotonic()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store backed by an LRU-ordered dict of ring buffers.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            session = self._touch(session_id)
+            return list(session.messages) if session else None
+
+    def create(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._remove(session_id)
+            session = _Session(self.history_window)
+            self._sessions[session_id] = session
+            self._push(session, messages)
+            self._evict()
+
+    def append(self, session_id: str, *messages: Dict[str, Any]) -> None:
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None:
+                session = _Session(self.history_window)
+                self._sessions[session_id] = session
+            self._push(session, messages)
+            self._evict()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._remove(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._total_bytes,
+            "evictions": self.evictions
+        }
+
+    def _touch(self, session_id: str) -> Optional[_Session]:
+        """Return a live session and move it to the most-recently-used end."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.last_access > self.ttl_seconds:
+            self._remove(session_id)
+            self.evictions += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _push(self, session: _Session, messages) -> None:
+        """Append to a session's ring buffer while keeping byte totals accurate."""
+        for message in messages:
+            if len(session.messages) == session.messages.maxlen:
+                dropped = session.sizes[0]
+                session.size -= dropped
+                self._total_bytes -= dropped
+            size = message_size(message)
+            session.messages.append(message)
+            session.sizes.append(size)
+            session.size += size
+            self._total_bytes += size
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size
+
+    def _evict(self) -> None:
+        """Drop expired sessions, then least recently used ones until within budget."""
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            over_budget = (
+                len(self._sessions) > self.max_sessions
+                or self._total_bytes > self.max_bytes
+            )
+            expired = now - oldest.last_access > self.ttl_seconds
+            # Never evict the session that was just written if it is the only one left
+            if not (over_budget or expired) or (len(self._sessions) == 1 and not expired):
+                break
+            self._remove(oldest_id)
+            self.evictions += 1
@@ -0,0 +1,246 @@
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Any, Optional
+
+from .base import SessionStore, message_size
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by a local SQLite file, shareable by several workers.
+
+    Recency is tracked with wall-clock timestamps so that every process
+    sharing the file agrees on which sessions are idle. Reads only take a
+    deferred (read) transaction; the access time they record is written with
+    the next write from this process.
+
+    Calls may wait up to `busy_timeout` seconds for another process's write
+    lock, so `aget`/`aappend` run them on a dedicated thread instead of the
+    event loop. Expired and least recently used sessions are swept every
+    `evict_every` writes or `evict_interval` seconds rather than on every
+    write, so the limits can be exceeded briefly in between.
+    """
+
+    def __init__(
+            self,
+            path: str = "sessions.db",
+            busy_timeout: float = 30.0,
+            evict_every: int = 64,
+            evict_interval: float = 5.0,
+            **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.path = path
+        self.evict_every = max(evict_every, 1)
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions")
+        self._writes = 0
+        self._last_evict = time.monotonic()
+        # Reads recorded by get(), written with the next write transaction
+        self._touched: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    async def aget(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, session_id)
+
+    async def aappend(self, session_id: str, *messages: Dict[str, Any]) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, partial(self.append, session_id, *messages))
+
+    def get(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        # A deferred transaction only reads, so it never waits for the write lock
+        with self._transaction("BEGIN DEFERRED") as cur:
+            row = cur.execute(
+                "SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            expired = now - max(row[0], self._touched.get(session_id, 0.0)) > self.ttl_seconds
+            rows = [] if expired else cur.execute(
+                "SELECT payload FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        if expired:
+            self.delete(session_id)
+            self.evictions += 1
+            return None
+        with self._lock:
+            self._touched[session_id] = now
+        return [json.loads(payload) for (payload,) in rows]
+
+    def create(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        with self._transaction() as cur:
+            self._flush_touches(cur)
+            self._remove(cur, session_id)
+            cur.execute(
+                "INSERT INTO sessions (session_id, last_access, bytes) VALUES (?, ?, 0)",
+                (session_id, time.time())
+            )
+            self._push(cur, session_id, messages)
+            self._maybe_evict(cur, session_id)
+
+    def append(self, session_id: str, *messages: Dict[str, Any]) -> None:
+        with self._transaction() as cur:
+            self._flush_touches(cur)
+            cur.execute(
+                "INSERT INTO sessions (session_id, last_access, bytes) VALUES (?, ?, 0) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, time.time())
+            )
+            self._push(cur, session_id, messages)
+            self._maybe_evict(cur, session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._transaction() as cur:
+            self._flush_touches(cur)
+            self._remove(cur, session_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "bytes": total,
+            "evictions": self.evictions
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self, begin: str = "BEGIN IMMEDIATE"):
+        return _Transaction(self._conn, self._lock, begin)
+
+    def _flush_touches(self, cur: sqlite3.Cursor) -> None:
+        """Write the last access times recorded by get() since the previous write."""
+        if self._touched:
+            cur.executemany(
+                "UPDATE sessions SET last_access = MAX(last_access, ?) WHERE session_id = ?",
+                [(accessed, session_id) for session_id, accessed in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _push(self, cur: sqlite3.Cursor, session_id: str, messages) -> None:
+        """Insert messages and trim the session back to its history window."""
+        added = 0
+        for message in messages:
+            size = message_size(message)
+            cur.execute(
+                "INSERT INTO messages (session_id, payload, size) VALUES (?, ?, ?)",
+                (session_id, json.dumps(message, ensure_ascii=False), size)
+            )
+            added += size
+
+        cur.execute(
+            "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+            "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+            (session_id, session_id, self.history_window)
+        )
+        if added or cur.rowcount:
+            cur.execute(
+                "UPDATE sessions SET bytes = ("
+                "SELECT COALESCE(SUM(size), 0) FROM messages WHERE session_id = ?) "
+                "WHERE session_id = ?",
+                (session_id, session_id)
+            )
+
+    def _remove(self, cur: sqlite3.Cursor, session_id: str) -> None:
+        cur.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        cur.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _maybe_evict(self, cur: sqlite3.Cursor, keep: str) -> None:
+        """Sweep every `evict_every` writes or `evict_interval` seconds."""
+        self._writes += 1
+        if self._writes < self.evict_every and time.monotonic() - self._last_evict < self.evict_interval:
+            return
+        self._writes = 0
+        self._last_evict = time.monotonic()
+        self._evict(cur, keep)
+
+    def _evict(self, cur: sqlite3.Cursor, keep: str) -> None:
+        """Drop expired sessions, then least recently used ones until within budget."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = cur.execute(
+            "SELECT session_id FROM sessions WHERE last_access < ?", (cutoff,)
+        ).fetchall()
+        victims = [session_id for (session_id,) in expired]
+
+        sessions, total = cur.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions WHERE last_access >= ?",
+            (cutoff,)
+        ).fetchone()
+        if sessions > self.max_sessions or total > self.max_bytes:
+            rows = cur.execute(
+                "SELECT session_id, bytes FROM sessions WHERE last_access >= ? "
+                "AND session_id != ? ORDER BY last_access",
+                (cutoff, keep)
+            )
+            for session_id, size in rows.fetchall():
+                if sessions <= self.max_sessions and total <= self.max_bytes:
+                    break
+                victims.append(session_id)
+                sessions -= 1
+                total -= size
+
+        for session_id in victims:
+            self._remove(cur, session_id)
+        self.evictions += len(victims)
+
+
+class _Transaction:
+    """Serialize access to the shared connection and wrap it in a transaction (BEGIN IMMEDIATE by default)."""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock, begin: str = "BEGIN IMMEDIATE"):
+        self._conn = conn
+        self._lock = lock
+        self._begin = begin
+        self._cur: Optional[sqlite3.Cursor] = None
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self._lock.acquire()
+        try:
+            self._cur = self._conn.cursor()
+            self._cur.execute(self._begin)
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._cur
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._cur.close()
+            self._lock.release()
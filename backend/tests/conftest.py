@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend modules are imported flat, as when running from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep bookings made by tests in memory
+os.environ["APPOINTMENT_JOURNAL_PATH"] = ""
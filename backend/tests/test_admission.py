@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import admission
+from admission import AdmissionController, RateLimiter, TokenBucket
+
+
+def _controller(**kwargs) -> AdmissionController:
+    # No rate limits unless a test sets them
+    return AdmissionController(**{"session_rate": 0, "ip_rate": 0, **kwargs})
+
+
+def test_token_buckets_refill_at_their_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2.0, capacity=2)
+
+    assert [bucket.take(), bucket.take()] == [0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+    now[0] += 0.25
+    assert bucket.take() == pytest.approx(0.25)
+    now[0] += 10
+    # Never refills beyond the burst capacity
+    assert [bucket.take(), bucket.take(), bucket.take() > 0] == [0.0, 0.0, True]
+
+
+def test_rate_limits_reject_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission.time, "monotonic", lambda: 100.0)
+    controller = _controller(session_rate=0.5, session_burst=1, ip_rate=5, ip_burst=3)
+
+    controller.check_rate("s1", "10.0.0.1")
+    with pytest.raises(HTTPException) as raised:
+        controller.check_rate("s1", "10.0.0.1")
+    assert raised.value.status_code == 429
+    assert raised.value.headers["Retry-After"] == "2"
+
+    # The IP has one token left after the rejected turn charged it
+    controller.check_rate("s2", "10.0.0.1")
+    with pytest.raises(HTTPException):
+        controller.check_rate("s3", "10.0.0.1")
+    assert controller.counters["rate_limited"] == 2
+
+
+def test_rate_limiter_keeps_a_bounded_number_of_buckets():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        limiter.check(key)
+    assert list(limiter._buckets) == ["a", "c"]
+
+
+def test_a_full_queue_is_rejected_right_away():
+    async def main():
+        controller = _controller(max_concurrent=1, max_queue=0)
+        ticket = await controller.admit("s1", None)
+        with pytest.raises(HTTPException) as raised:
+            await controller.admit("s2", None)
+        ticket.release()
+        return controller, raised.value
+
+    controller, error = asyncio.run(main())
+    assert (error.status_code, error.headers["Retry-After"]) == (503, "1")
+    assert controller.counters["queue_full"] == 1
+    assert controller.stats()["sessions"] == 0
+
+
+def test_waiting_for_a_slot_times_out():
+    async def main():
+        controller = _controller(max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        ticket = await controller.admit("s1", None)
+        with pytest.raises(HTTPException) as raised:
+            await controller.admit("s2", None)
+        stats = controller.stats()
+        ticket.release()
+        # The slot is free again once the first turn is done
+        (await controller.admit("s3", None)).release()
+        return controller, stats, raised.value
+
+    controller, stats, error = asyncio.run(main())
+    assert error.status_code == 503
+    assert (stats["waiting"], stats["active"], stats["sessions"]) == (0, 1, 1)
+    assert controller.counters["queue_timeout"] == 1
+    assert (controller.stats()["active"], controller.stats()["sessions"]) == (0, 0)
+
+
+def test_turns_of_a_session_run_one_at_a_time():
+    async def main():
+        controller = _controller(session_wait_timeout=1)
+        first = await controller.admit("s1", None)
+        second = asyncio.ensure_future(controller.admit("s1", None))
+        other = await controller.admit("s2", None)
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        assert controller.stats()["sessions"] == 2
+
+        first.release()
+        (await second).release()
+        other.release()
+        return controller
+
+    controller = asyncio.run(main())
+    assert controller.counters["admitted"] == 3
+    assert controller.stats()["sessions"] == 0
+
+
+def test_a_busy_session_is_rejected_and_its_lock_dropped():
+    async def main():
+        controller = _controller(session_wait_timeout=0.01)
+        first = await controller.admit("s1", None)
+        with pytest.raises(HTTPException) as raised:
+            await controller.admit("s1", None)
+        assert controller.stats()["sessions"] == 1
+        first.release()
+        # Releasing a ticket twice must not drop the count below zero
+        first.release()
+        return controller, raised.value
+
+    controller, error = asyncio.run(main())
+    assert error.status_code == 429
+    assert controller.counters["session_busy"] == 1
+    assert controller.stats()["sessions"] == 0
+
+
+def test_cancelling_a_waiter_as_the_lock_frees_up_does_not_keep_it():
+    async def main():
+        controller = _controller(session_wait_timeout=1)
+        first = await controller.admit("s1", None)
+        second = asyncio.ensure_future(controller.admit("s1", None))
+        await asyncio.sleep(0)
+
+        # The lock is handed to the waiter in the same step it is cancelled
+        first.release()
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+        third = await asyncio.wait_for(controller.admit("s1", None), 0.5)
+        third.release()
+        return controller
+
+    controller = asyncio.run(main())
+    assert controller.stats()["sessions"] == 0
+    assert controller.stats()["active"] == 0
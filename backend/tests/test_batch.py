@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date, timedelta
+
+from batch import BatchRunner
+from context_window import ContextWindow
+from llm import LLMClient
+from llm_backends.mock import MockBackend
+from tools import TOOL_REGISTRY
+from tools.inventory import get_inventory
+from utils import format_chunk_event, format_end_event
+
+
+class _ChattyClient:
+    """Answers every turn with many chunks, so the record queue fills up."""
+
+    async def process_query(self, query, history, outcome=None, dry_run=False, use_shortcuts=True):
+        for _ in range(50):
+            yield format_chunk_event("word ")
+        yield format_end_event()
+
+
+def test_closing_the_records_early_does_not_hang():
+    async def scenario():
+        runner = BatchRunner(_ChattyClient(), "system", ContextWindow(max_tokens=1000), max_concurrency=2)
+        records = runner.run((f"s{number}", ["hello"] * 50) for number in range(20))
+        first = await records.__anext__()
+        # Let the workers fill the bounded queue before the reader goes away
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(records.aclose(), timeout=2)
+        return first
+
+    assert asyncio.run(scenario())["type"] == "turn"
+
+
+def test_dry_run_bookings_leave_the_inventory_alone():
+    day = (date.today() + timedelta(days=2)).isoformat()
+    slot = get_inventory().available_slots("CHI003", day)[0]
+
+    result = TOOL_REGISTRY.dry_run_functions["schedule_appointment"]("eval", "CHI003", day, slot, "Roadster")
+
+    assert result["confirmation_code"].startswith("DRYRUN-")
+    assert slot in get_inventory().available_slots("CHI003", day)
+
+
+def test_turns_bypass_the_router_and_response_cache(monkeypatch):
+    monkeypatch.setenv("ROUTER_ENABLED", "true")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "true")
+    backend = MockBackend(first_token_delay=0, token_delay=0)
+    client = LLMClient(backend)
+
+    async def scenario():
+        runner = BatchRunner(client, "system", ContextWindow(max_tokens=1000), max_concurrency=1)
+        sessions = [(f"s{number}", ["What is the address of MIA005?"]) for number in range(2)]
+        records = [record async for record in runner.run(sessions) if record["type"] == "turn"]
+        await client.close()
+        return records
+
+    records = asyncio.run(scenario())
+
+    # Both turns went to the model (a tool round and an answer each) and nothing was cached
+    assert backend.counters["requests"] == 4
+    assert client.response_cache.stats()["entries"] == 0
+    for record in records:
+        [call] = record["tool_calls"]
+        assert call["arguments"] == {"dealership_id": "MIA005"}
+        assert set(call) == {"name", "arguments", "output", "at_ms"}
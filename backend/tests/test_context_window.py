@@ -0,0 +1,22 @@
+import json
+
+from context_window import MESSAGE_OVERHEAD_TOKENS, ContextWindow, estimate_tokens
+
+
+def test_counts_are_cached_by_content_across_message_copies():
+    window = ContextWindow()
+    history = [{"role": "user", "content": "Any slots in Miami on Friday?"}]
+
+    first = window.count(history[0])
+    assert window.count(json.loads(json.dumps(history))[0]) == first
+    assert len(window._token_counts) == 1
+    assert first == MESSAGE_OVERHEAD_TOKENS + estimate_tokens(history[0]["content"])
+
+
+def test_tool_calls_are_counted():
+    window = ContextWindow()
+    tool_calls = [{"id": "1", "function": {"name": "get_weather", "arguments": "{\"city\": \"Miami\"}"}}]
+
+    assert window.count({"role": "assistant", "content": None, "tool_calls": tool_calls}) == (
+        MESSAGE_OVERHEAD_TOKENS + estimate_tokens(json.dumps(tool_calls))
+    )
@@ -0,0 +1,70 @@
+import random
+
+from tools.directory import Dealership, DealershipDirectory, haversine_km
+
+
+def _dealership(id, city, lat, lon, aliases=None) -> Dealership:
+    return Dealership(id, f"SuperCar {city}", "", "", "", city, lat, lon, aliases)
+
+
+def test_ids_match_ignoring_case_and_separators():
+    directory = DealershipDirectory.load()
+
+    assert directory.get("mia-005").id == "MIA005"
+    assert directory.resolve("MIA005").id == "MIA005"
+    assert directory.get("MIA006") is None
+
+
+def test_misspelled_names_resolve_to_the_closest_match():
+    directory = DealershipDirectory.load()
+
+    assert directory.resolve("Chicagoo").id == "CHI003"
+    assert directory.resolve("the Houstn dealership").id == "HOU004"
+    assert directory.resolve("Bevrly Hills").id == "LA002"
+    assert directory.resolve("Atlantis") is None
+
+
+def test_overlapping_names_prefer_the_longest_match():
+    directory = DealershipDirectory([
+        _dealership("YRK001", "York", 53.96, -1.08),
+        _dealership("NYC001", "New York", 40.75, -74.0)
+    ])
+
+    # "York" is contained in the text too, but "New York" covers more of it
+    assert directory.resolve("the showroom in new york please").id == "NYC001"
+    assert directory.resolve("York").id == "YRK001"
+
+    # With two dealerships in one city, the first registered keeps the name
+    twins = DealershipDirectory([
+        _dealership("SPR001", "Springfield", 39.8, -89.6),
+        _dealership("SPR002", "Springfield", 37.2, -93.3)
+    ])
+    assert twins.resolve("Springfield").id == "SPR001"
+    assert twins.resolve("spr-002").id == "SPR002"
+
+
+def test_nearest_searches_across_the_antimeridian():
+    directory = DealershipDirectory([
+        _dealership("EAST", "Taveuni", -16.8, 179.9),
+        _dealership("WEST", "Vava'u", -16.8, -179.6),
+        _dealership("FAR", "Suva", -18.1, 170.0)
+    ])
+
+    nearest = directory.nearest(-16.8, -179.95, limit=2)
+    assert [dealership.id for dealership, _ in nearest] == ["EAST", "WEST"]
+    assert nearest[0][1] < 20
+    assert [dealership.id for dealership, _ in directory.nearest(-16.8, 179.2)] == ["EAST"]
+
+
+def test_nearest_matches_a_full_scan():
+    rng = random.Random(7)
+    dealerships = [
+        _dealership(f"D{index:03d}", f"City {index}", rng.uniform(-80, 80), rng.uniform(-180, 180))
+        for index in range(200)
+    ]
+    directory = DealershipDirectory(dealerships)
+
+    for _ in range(200):
+        lat, lon = rng.uniform(-85, 85), rng.choice([rng.uniform(-180, 180), rng.uniform(175, 180), -180.0])
+        expected = sorted(haversine_km(lat, lon, d.lat, d.lon) for d in dealerships)[:3]
+        assert [distance for _, distance in directory.nearest(lat, lon, limit=3)] == expected
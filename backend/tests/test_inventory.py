@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+import pytest
+
+from tools.inventory import InventoryError, SlotInventory
+
+
+def _day(offset: int) -> str:
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+
+def test_id_variants_share_one_calendar(tmp_path):
+    inventory = SlotInventory(str(tmp_path / "appointments.jsonl"))
+    slot = inventory.available_slots("MIA005", _day(3))[0]
+
+    assert inventory.reserve("MIA005", _day(3), slot, "first")
+    assert not inventory.reserve("mia005", _day(3), slot, "second")
+    assert not inventory.reserve("mia-005", _day(3), slot, "third")
+    assert slot not in SlotInventory(str(tmp_path / "appointments.jsonl")).available_slots("mia005", _day(3))
+
+
+@pytest.mark.parametrize("dealership_id, day", [("ZZZ999", _day(3)), ("MIA005", "1990-05-14"), ("MIA005", _day(91))])
+def test_unknown_dealerships_and_days_outside_the_horizon_are_rejected(tmp_path, dealership_id, day):
+    journal = tmp_path / "appointments.jsonl"
+    inventory = SlotInventory(str(journal), horizon_days=90)
+
+    with pytest.raises(InventoryError):
+        inventory.reserve(dealership_id, day, "09:00", "user")
+    assert journal.read_text() == ""
+
+
+def test_evicted_days_keep_their_reservations():
+    inventory = SlotInventory(max_cached_days=2)
+    slot = inventory.available_slots("NYC001", _day(1))[0]
+    assert inventory.reserve("NYC001", _day(1), slot, "user")
+
+    for offset in range(2, 10):
+        inventory.available_slots("NYC001", _day(offset))
+    assert len(inventory._open) == 2
+    assert slot not in inventory.available_slots("NYC001", _day(1))
@@ -0,0 +1,86 @@
+import re
+import random
+
+import pytest
+
+from metrics import DEFAULT_BUCKETS, LatencyHistogram, MetricsRegistry
+
+# Relative error of a recorded value with the default 7 sub-bucket bits
+RESOLUTION = 1 / 64
+
+_SAMPLE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _parse(text):
+    """Parse Prometheus text into {name: [(labels, value)]}, checking every line is well formed."""
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        if line.startswith("#"):
+            continue
+        match = _SAMPLE.match(line)
+        assert match is not None, line
+        labels = {
+            key: value.replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\")
+            for key, value in _LABEL.findall(match.group("labels") or "")
+        }
+        samples.setdefault(match.group("name"), []).append((labels, float(match.group("value"))))
+    return types, samples
+
+
+def test_percentiles_of_a_known_distribution():
+    histogram = LatencyHistogram()
+    durations = [millis / 1000 for millis in range(1, 1001)]
+    random.Random(3).shuffle(durations)
+    for seconds in durations:
+        histogram.record(seconds)
+
+    for fraction in (0.5, 0.9, 0.99):
+        assert histogram.percentile(fraction) == pytest.approx(fraction, rel=RESOLUTION)
+    assert histogram.percentile(1.0) == histogram.max == 1.0
+    assert histogram.summary()["mean"] == pytest.approx(0.5005)
+
+    # Sub-millisecond and multi-minute values keep the same relative precision
+    for seconds in (0.000123, 0.0421, 95.0):
+        single = LatencyHistogram()
+        single.record(seconds)
+        single.record(seconds * 10)
+        assert single.percentile(0.5) == pytest.approx(seconds, rel=RESOLUTION)
+
+
+def test_histograms_render_as_prometheus_text():
+    registry = MetricsRegistry()
+    phases = registry.histogram("test_phase_seconds", "Phase durations", ("phase",))
+    registry.counter("test_requests_total", "Requests", ("outcome",)).inc(outcome='say "hi"\n')
+    durations = [millis / 1000 for millis in range(1, 1001)]
+    for seconds in durations:
+        phases.observe(seconds, phase="stream")
+    phases.observe(150.0, phase="tool")
+
+    types, samples = _parse(registry.render())
+
+    assert types == {"test_phase_seconds": "histogram", "test_requests_total": "counter"}
+    assert samples["test_requests_total"] == [({"outcome": 'say "hi"\n'}, 1.0)]
+
+    buckets = [(labels["le"], value) for labels, value in samples["test_phase_seconds_bucket"]
+               if labels["phase"] == "stream"]
+    assert [float(le) for le, _ in buckets] == list(DEFAULT_BUCKETS) + [float("inf")]
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)
+    for bound, (_, value) in zip(DEFAULT_BUCKETS, buckets):
+        expected = sum(seconds <= bound for seconds in durations)
+        assert abs(value - expected) <= expected * RESOLUTION + 1
+    assert counts[-1] == 1000
+
+    totals = {labels["phase"]: value for labels, value in samples["test_phase_seconds_count"]}
+    sums = {labels["phase"]: value for labels, value in samples["test_phase_seconds_sum"]}
+    assert totals == {"stream": 1000, "tool": 1}
+    assert sums["stream"] == pytest.approx(500.5)
+    tool = [value for labels, value in samples["test_phase_seconds_bucket"] if labels["phase"] == "tool"]
+    # 150 s is above every finite bucket
+    assert tool == [0] * len(DEFAULT_BUCKETS) + [1]
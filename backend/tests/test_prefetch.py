@@ -0,0 +1,90 @@
+import asyncio
+
+from tools.prefetch import IncrementalJSONObject, ToolPrefetcher
+from tools.registry import Param, ToolRegistry
+
+
+def _feed(fragments):
+    parser = IncrementalJSONObject()
+    completed = [parser.feed(fragment) for fragment in fragments]
+    return parser, completed
+
+
+def test_members_complete_as_soon_as_their_value_does():
+    parser, completed = _feed(['{"dealer', 'ship_id": "LA', '002", "da', 'te": "2030-05-14"', ', "count": 1', '2}'])
+
+    assert completed == [False, False, True, True, False, True]
+    assert parser.fields == {"dealership_id": "LA002", "date": "2030-05-14", "count": 12}
+    assert parser.done and not parser.failed
+
+
+def test_escapes_inside_strings():
+    # The escaped quote and backslash must not end the string, even split after the backslash
+    parser, _ = _feed(['{"note": "say \\', '"hi\\" \\u00e9 \\\\', '", "b": "}"}'])
+
+    assert parser.fields == {"note": 'say "hi" é \\', "b": "}"}
+    assert parser.done
+
+
+def test_nested_values_complete_with_the_separator_after_them():
+    parser, completed = _feed(['{"filters": {"city": "Miami", "tags": ["a", "]"', ']}', ', "date": "2030-05-14"}'])
+
+    assert completed == [False, False, True]
+    assert parser.fields == {"filters": {"city": "Miami", "tags": ["a", "]"]}, "date": "2030-05-14"}
+
+
+def test_invalid_input_fails():
+    for text in ['["LA002"]', '{"date" "2030-05-14"}', '{"count": tru}', '{"city": "Miami" "date"}']:
+        parser, _ = _feed([text])
+        assert parser.failed and not parser.done, text
+        assert parser.fields == ({"city": "Miami"} if "city" in text else {}), text
+
+
+class _Executor:
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, name, arguments):
+        self.calls.append((name, arguments))
+        return {"address": "1 Ocean Drive"}
+
+
+def _prefetcher():
+    registry = ToolRegistry()
+
+    @registry.tool("Dealership address", {"dealership_id": Param("Dealership ID")}, read_only=True)
+    def get_dealership_address(dealership_id):
+        return {}
+
+    executor = _Executor()
+    return ToolPrefetcher(executor, registry, {"get_dealership_address"}), executor
+
+
+def test_truncated_or_invalid_arguments_start_nothing():
+    async def main():
+        prefetcher, executor = _prefetcher()
+        for index, fragments in enumerate([
+            ['{"dealership_id": "MIA', '0'],
+            ['{"dealership_id" "MIA005"}'],
+            ['{"dealership_id": MIA005}'],
+            ['{"dealership_id": ""}']
+        ]):
+            for fragment in fragments:
+                prefetcher.feed(index, "get_dealership_address", fragment)
+            assert prefetcher.take(index, "get_dealership_address", {"dealership_id": "MIA005"}) is None
+        await asyncio.sleep(0)
+        return executor.calls
+
+    assert asyncio.run(main()) == []
+
+
+def test_a_complete_member_starts_the_call_early():
+    async def main():
+        prefetcher, executor = _prefetcher()
+        prefetcher.feed(0, "get_dealership_address", '{"dealership_id": "MIA005"')
+        early = prefetcher.take(0, "get_dealership_address", {"dealership_id": "MIA005"})
+        return await early, executor.calls
+
+    result, calls = asyncio.run(main())
+    assert result == {"address": "1 Ocean Drive"}
+    assert calls == [("get_dealership_address", {"dealership_id": "MIA005"})]
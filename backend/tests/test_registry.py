@@ -0,0 +1,70 @@
+import pytest
+
+from tools.registry import Param, ToolRegistry, ToolValidationError
+
+
+def _registry() -> ToolRegistry:
+    registry = ToolRegistry()
+
+    @registry.tool(
+        "Book a test drive",
+        {
+            "dealership_id": Param("Dealership ID"),
+            "date": Param("Date", format="date"),
+            "time": Param("Time", format="time"),
+            "party_size": Param("People coming along", type="integer", required=False)
+        }
+    )
+    def schedule_appointment(dealership_id, date, time, party_size=None, dry_run=False):
+        return {}
+
+    return registry
+
+
+def _error(name, arguments) -> ToolValidationError:
+    with pytest.raises(ToolValidationError) as raised:
+        _registry().validate(name, arguments)
+    return raised.value
+
+
+def test_a_valid_call_is_normalized():
+    arguments = _registry().validate(
+        "schedule_appointment",
+        '{"dealership_id": " LA002 ", "date": "2030-05-14", "time": "9:30", "party_size": 2, "color": "red"}'
+    )
+    # Whitespace is stripped, the hour padded and undeclared arguments dropped
+    assert arguments == {"dealership_id": "LA002", "date": "2030-05-14", "time": "09:30", "party_size": 2}
+
+
+def test_a_wrong_type_is_reported_for_the_model_to_retry():
+    error = _error("schedule_appointment", {
+        "dealership_id": "LA002", "date": "2030-02-30", "time": "10:00", "party_size": "a few"
+    })
+
+    assert not error.missing_only
+    assert {problem["argument"] for problem in error.problems} == {"date", "party_size"}
+    assert error.result["error"].startswith("Invalid arguments: ")
+    assert error.result["tool"] == "schedule_appointment"
+
+
+def test_missing_arguments_ask_the_user():
+    # A placeholder counts as missing too
+    error = _error("schedule_appointment", {"dealership_id": "LA002", "time": "required"})
+
+    assert error.missing_only
+    assert error.problems == [
+        {"argument": "date", "message": "is required"},
+        {"argument": "time", "message": "is required"}
+    ]
+    assert str(error) == "Missing required arguments: date (YYYY-MM-DD), time (HH:MM). Ask the user for them."
+
+
+def test_missing_and_invalid_arguments_are_not_missing_only():
+    error = _error("schedule_appointment", {"dealership_id": "LA002", "date": "tomorrow"})
+    assert not error.missing_only
+
+
+def test_unknown_tools_and_malformed_arguments_are_rejected():
+    assert str(_error("cancel_appointment", {})) == "Unknown tool: cancel_appointment"
+    assert str(_error("schedule_appointment", "{not json")) == "Arguments are not valid JSON"
+    assert str(_error("schedule_appointment", "[]")) == "Arguments must be a JSON object"
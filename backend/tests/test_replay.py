@@ -0,0 +1,23 @@
+import asyncio
+
+from replay import ReplayStore
+
+
+async def _answer():
+    yield {"event": "chunk", "data": "Hello"}
+    yield {"event": "end", "data": ""}
+
+
+def test_resume_requires_the_same_session_and_query():
+    async def main():
+        store = ReplayStore()
+        buffer = store.start("s1", _answer(), "slots in Miami?")
+        await buffer.task
+        first_id = buffer.events[0]["id"]
+
+        assert store.resume("s1", "book 10:00 instead", first_id) is None
+        assert store.resume("s2", "slots in Miami?", first_id) is None
+        resumed = store.resume("s1", "slots in Miami?", first_id)
+        return [event["event"] async for event in resumed]
+
+    assert asyncio.run(main()) == ["end"]
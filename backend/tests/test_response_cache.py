@@ -0,0 +1,47 @@
+from response_cache import ResponseCache, _SimilarityIndex
+
+EVENTS = [{"event": "chunk", "data": "cached"}, {"event": "end", "data": ""}]
+
+
+def _cache() -> ResponseCache:
+    return ResponseCache(
+        "v1",
+        similarity_threshold=0.75,
+        invalidations={"schedule_appointment": [("check_appointment_availability", ("date",))]}
+    )
+
+
+def test_similar_queries_must_name_the_same_date_and_dealership():
+    cache = _cache()
+    context = cache.context_key([])
+    cache.store(context, "Any slots at LA002 on 2030-05-14?", EVENTS)
+
+    assert cache.lookup(context, "any open slots at LA002 on 2030-05-14") == EVENTS
+    assert cache.lookup(context, "any slots at LA002 on 2030-05-15") is None
+    assert cache.lookup(context, "any slots at NYC001 on 2030-05-14") is None
+
+
+def test_query_norm_includes_unknown_ngrams():
+    index = _SimilarityIndex(3)
+    index.add("weather in miami")
+
+    _, score = index.nearest("weather in miami and what about the dealership hours on sunday")
+    assert score < 0.6
+
+
+def test_bookings_invalidate_cached_availability_answers():
+    cache = _cache()
+    context = cache.context_key([])
+    generation = cache.generation
+    cache.store(context, "slots at LA002 on 2030-05-14", EVENTS,
+                tool_calls=[("check_appointment_availability", {"dealership_id": "LA002", "date": "2030-05-14"})])
+    cache.store(context, "slots at LA002 on 2030-05-15", EVENTS,
+                tool_calls=[("check_appointment_availability", {"dealership_id": "LA002", "date": "2030-05-15"})])
+
+    cache.apply_invalidations("schedule_appointment", {"dealership_id": "LA002", "date": "2030-05-14"}, {"ok": 1})
+    assert cache.lookup(context, "slots at LA002 on 2030-05-14") is None
+    assert cache.lookup(context, "slots at LA002 on 2030-05-15") == EVENTS
+
+    # A response generated before the booking is not stored afterwards
+    cache.store(context, "slots at LA002 on 2030-05-14", EVENTS, generation=generation)
+    assert cache.lookup(context, "slots at LA002 on 2030-05-14") is None
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from router import IntentRouter
+from tools.directory import get_directory
+
+ADDRESS_QUERY = "What is the address of MIA005?"
+
+
+class _Executor:
+    """Stands in for ToolExecutor, returning a fixed result and recording the calls."""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def run(self, name, arguments):
+        self.calls.append((name, arguments))
+        return self.result
+
+
+def test_keyword_hit_is_answered_without_the_model():
+    executor = _Executor({"id": "MIA005"})
+    events = asyncio.run(IntentRouter(get_directory()).route(ADDRESS_QUERY, executor))
+
+    assert executor.calls == [("get_dealership_address", {"dealership_id": "MIA005"})]
+    assert [event["event"] for event in events] == ["tool_use", "tool_output", "chunk", "end"]
+    assert get_directory().get("MIA005").address in events[2]["data"]
+
+
+def test_queries_over_the_word_limit_go_to_the_model():
+    query = "could you please tell me what the street address of the MIA005 dealership is"
+    assert IntentRouter(get_directory(), max_words=20).match(query) is not None
+    assert IntentRouter(get_directory(), max_words=10).match(query) is None
+
+
+@pytest.mark.parametrize("threshold, routed", [("0", True), ("1.0", False)])
+def test_classifier_below_the_threshold_vetoes_the_route(monkeypatch, threshold, routed):
+    monkeypatch.setenv("ROUTER_CLASSIFIER_ENABLED", "true")
+    monkeypatch.setenv("ROUTER_CLASSIFIER_THRESHOLD", threshold)
+    router = IntentRouter.from_env()
+
+    assert (router.match(ADDRESS_QUERY) is not None) is routed
+
+
+@pytest.mark.parametrize("query, result", [
+    ("Book a test drive at MIA005 tomorrow at 10:00", {"id": "MIA005"}),
+    (ADDRESS_QUERY, {"error": "Dealership directory unavailable"})
+])
+def test_misses_and_tool_errors_fall_through_to_the_model(query, result):
+    assert asyncio.run(IntentRouter(get_directory()).route(query, _Executor(result))) is None
@@ -0,0 +1,123 @@
+import time
+import asyncio
+import sqlite3
+
+import sessions.memory
+from sessions import InMemorySessionStore, SQLiteSessionStore
+from sessions.base import message_size
+
+HI = {"role": "user", "content": "hi"}
+
+
+def _hold_write_lock(path):
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    return conn
+
+
+def test_reads_do_not_wait_for_another_writer(tmp_path):
+    path = tmp_path / "sessions.db"
+    store = SQLiteSessionStore(str(path), busy_timeout=5)
+    store.append("s1", {"role": "user", "content": "hi"})
+
+    writer = _hold_write_lock(path)
+    started = time.monotonic()
+    assert store.get("s1") == [{"role": "user", "content": "hi"}]
+    assert time.monotonic() - started < 1
+    writer.rollback()
+    store.close()
+
+
+def test_blocked_writes_leave_the_event_loop_running(tmp_path):
+    path = tmp_path / "sessions.db"
+    store = SQLiteSessionStore(str(path), busy_timeout=5)
+    writer = _hold_write_lock(path)
+
+    async def main():
+        ticks = 0
+        append = asyncio.ensure_future(store.aappend("s1", {"role": "user", "content": "hi"}))
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not append.done()
+        writer.rollback()
+        await append
+        return await store.aget("s1")
+
+    assert asyncio.run(main()) == [{"role": "user", "content": "hi"}]
+    store.close()
+
+
+def test_eviction_sweeps_every_few_writes(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2, evict_every=4, evict_interval=3600)
+    for number in range(3):
+        store.append(f"s{number}", {"role": "user", "content": "hi"})
+    assert len(store) == 3
+
+    store.append("s3", {"role": "user", "content": "hi"})
+    assert len(store) == 2
+    assert store.get("s3") is not None
+    store.close()
+
+
+def _clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.memory.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_memory_store_evicts_the_least_recently_used_session(monkeypatch):
+    now = _clock(monkeypatch)
+    store = InMemorySessionStore(max_sessions=2)
+    store.append("s1", HI)
+    now[0] += 1
+    store.append("s2", HI)
+    now[0] += 1
+    assert store.get("s1") == [HI]
+
+    store.append("s3", HI)
+    assert store.get("s2") is None
+    assert store.get("s1") == [HI] and store.get("s3") == [HI]
+    assert store.stats()["evictions"] == 1
+
+
+def test_memory_store_expires_idle_sessions(monkeypatch):
+    now = _clock(monkeypatch)
+    store = InMemorySessionStore(ttl_seconds=10)
+    store.append("s1", HI)
+    store.append("s2", HI)
+    now[0] += 5
+    assert store.get("s1") == [HI]
+
+    # s2 is swept by the next write, s1 expires when it is read
+    now[0] += 6
+    store.append("s3", HI)
+    assert len(store) == 2
+    now[0] += 5
+    assert store.get("s1") is None
+    assert len(store) == 1
+    assert store.stats()["evictions"] == 2
+
+
+def test_memory_store_stays_within_its_byte_budget(monkeypatch):
+    now = _clock(monkeypatch)
+    size = message_size(HI)
+    store = InMemorySessionStore(history_window=2, max_bytes=5 * size)
+    store.append("s1", HI, HI, HI)
+    # Only the history window is kept and counted
+    assert store.stats()["bytes"] == 2 * size
+    now[0] += 1
+    store.append("s2", HI, HI)
+    now[0] += 1
+    store.append("s3", HI)
+    assert store.stats()["bytes"] == 5 * size
+
+    now[0] += 1
+    store.append("s3", HI)
+    assert store.get("s1") is None
+    assert store.stats() == {"backend": "memory", "sessions": 2, "bytes": 4 * size, "evictions": 1}
+
+    # A single session over the budget is kept rather than emptied
+    alone = InMemorySessionStore(max_bytes=size)
+    alone.append("s1", HI, HI)
+    assert alone.get("s1") == [HI, HI]
@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from sse_starlette.sse import AppStatus
+
+import main
+from utils import batch_sse_events, cancellable_stream, format_chunk_event, format_end_event
+
+
+class _Source:
+    """Yields `events`, sleeping `pause` seconds before each; records when it is closed."""
+
+    def __init__(self, events, pause: float = 0.0, then_wait: bool = False):
+        self.events = events
+        self.pause = pause
+        self.then_wait = then_wait
+        self.closed = False
+
+    async def __call__(self):
+        try:
+            for event in self.events:
+                await asyncio.sleep(self.pause)
+                yield event
+            if self.then_wait:
+                await asyncio.Event().wait()
+        finally:
+            self.closed = True
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def test_pings_keep_a_slow_stream_alive(monkeypatch):
+    # Pings go out next to the batched frames, so a long tool call is not a silent connection
+    monkeypatch.setattr(main, "SSE_PING_SECONDS", 0.05)
+    monkeypatch.setattr(main, "SSE_BATCH_ENABLED", True)
+    monkeypatch.setattr(AppStatus, "should_exit_event", None)
+    source = _Source([format_chunk_event("Looking that up"), format_end_event()], pause=0.2)
+    app = FastAPI()
+    app.get("/stream")(lambda: main._sse_response(cancellable_stream(source())))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return (await client.get("/stream")).text
+
+    body = asyncio.run(scenario())
+    chunk = body.index("data: Looking that up")
+    assert ": ping" in body[:chunk]
+    assert ": ping" in body[chunk:body.index("event: end")]
+    assert source.closed
+
+
+def test_streams_are_cut_off_after_the_maximum_duration():
+    source = _Source([format_chunk_event("Hello")], then_wait=True)
+    timeouts = []
+
+    events = asyncio.run(_collect(cancellable_stream(
+        source(), max_duration=0.05, on_timeout=lambda: timeouts.append(True)
+    )))
+
+    assert [event["event"] for event in events] == ["chunk", "chunk", "end"]
+    assert "took too long" in events[1]["data"]
+    assert timeouts == [True]
+    assert source.closed
+
+
+def test_cancelling_the_consumer_closes_the_source():
+    source = _Source([format_chunk_event("Hello")], then_wait=True)
+
+    async def scenario():
+        received = []
+
+        async def consume():
+            async for event in cancellable_stream(source()):
+                received.append(event)
+
+        consumer = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        return received
+
+    assert len(asyncio.run(scenario())) == 1
+    assert source.closed
+
+
+def test_producer_errors_reach_the_consumer():
+    async def failing():
+        yield format_chunk_event("Hello")
+        raise ValueError("upstream went away")
+
+    async def scenario():
+        try:
+            await _collect(cancellable_stream(failing()))
+        except ValueError as e:
+            return str(e)
+
+    assert asyncio.run(scenario()) == "upstream went away"
+
+
+def test_frames_are_flushed_at_the_byte_limit():
+    # Each event encodes to 26 bytes: "event: chunk\r\ndata: ab\r\n\r\n"
+    events = [format_chunk_event("ab") for _ in range(5)] + [format_end_event()]
+    source = _Source(events)
+
+    frames = asyncio.run(_collect(batch_sse_events(source(), max_bytes=48, max_delay=10)))
+
+    assert [frame.count(b"event: chunk") for frame in frames] == [2, 2, 1]
+    assert frames[-1].endswith(b"event: end\r\ndata: \r\n\r\n")
+    assert source.closed
+
+
+def test_frames_are_flushed_after_the_delay():
+    source = _Source([format_chunk_event("ab"), format_chunk_event("cd"), format_end_event()], pause=0.1)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        return [(frame, loop.time() - started) async for frame in batch_sse_events(source(), max_delay=0.02)]
+
+    frames = asyncio.run(scenario())
+
+    # Each event waits at most max_delay for company, never for the next slow one
+    assert [frame.count(b"event: ") for frame, _ in frames] == [1, 1, 1]
+    assert frames[0][1] < 0.19
+    assert source.closed
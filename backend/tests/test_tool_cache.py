@@ -0,0 +1,122 @@
+import asyncio
+
+import tools.cache
+from tools.cache import ToolResultCache
+
+AVAILABILITY = "check_appointment_availability"
+INVALIDATIONS = {"schedule_appointment": [(AVAILABILITY, ("dealership_id", "date"))]}
+
+
+def _cache(**kwargs) -> ToolResultCache:
+    return ToolResultCache({AVAILABILITY: 60.0}, invalidations=INVALIDATIONS, **kwargs)
+
+
+class _Tool:
+    """Counts its runs; each run returns the next result after `delay` seconds."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        async def run():
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            return {"slots": [f"run {self.calls}"]}
+        return run
+
+
+def _slots(date: str):
+    return {"dealership_id": "LA002", "date": date}
+
+
+def test_concurrent_identical_calls_run_once():
+    cache = _cache()
+    tool = _Tool(delay=0.01)
+
+    async def main():
+        return await asyncio.gather(*(
+            cache.get_or_call(AVAILABILITY, {"date": "2030-05-14", "dealership_id": "LA002"}, tool())
+            for _ in range(5)
+        ))
+
+    results = asyncio.run(main())
+    assert tool.calls == 1
+    assert results == [{"slots": ["run 1"]}] * 5
+    assert cache.stats()["tools"][AVAILABILITY] == {"hits": 0, "misses": 1, "coalesced": 4}
+
+
+def test_a_booking_invalidates_cached_availability():
+    cache = _cache()
+    tool = _Tool()
+
+    async def main():
+        await cache.get_or_call(AVAILABILITY, _slots("2030-05-14"), tool())
+        await cache.get_or_call(AVAILABILITY, _slots("2030-05-15"), tool())
+
+        async def book():
+            return {"confirmation_code": "ABC123"}
+        await cache.get_or_call("schedule_appointment", {**_slots("2030-05-14"), "time": "09:00"}, book)
+
+        # Only the booked day is looked up again
+        assert (await cache.get_or_call(AVAILABILITY, _slots("2030-05-14"), tool()))["slots"] == ["run 3"]
+        assert (await cache.get_or_call(AVAILABILITY, _slots("2030-05-15"), tool()))["slots"] == ["run 2"]
+
+    asyncio.run(main())
+
+
+def test_a_result_started_before_a_booking_is_not_stored():
+    cache = _cache()
+    tool = _Tool(delay=0.02)
+
+    async def main():
+        lookup = asyncio.ensure_future(cache.get_or_call(AVAILABILITY, _slots("2030-05-14"), tool()))
+        await asyncio.sleep(0.005)
+        cache.invalidate(AVAILABILITY, **_slots("2030-05-14"))
+        await lookup
+        await cache.get_or_call(AVAILABILITY, _slots("2030-05-14"), tool())
+
+    asyncio.run(main())
+    assert tool.calls == 2
+
+
+def test_failed_bookings_and_error_results_leave_the_cache_alone():
+    cache = _cache()
+    tool = _Tool()
+
+    async def main():
+        await cache.get_or_call(AVAILABILITY, _slots("2030-05-14"), tool())
+
+        async def rejected():
+            return {"error": "The slot is taken"}
+        await cache.get_or_call("schedule_appointment", _slots("2030-05-14"), rejected)
+        await cache.get_or_call(AVAILABILITY, _slots("2030-05-14"), tool())
+        await cache.get_or_call(AVAILABILITY, _slots("2030-05-16"), rejected)
+
+    asyncio.run(main())
+    assert tool.calls == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_entries_expire_and_least_recently_used_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tools.cache.time, "monotonic", lambda: now[0])
+    cache = _cache(max_entries=2)
+    tool = _Tool()
+
+    async def lookup(date):
+        return (await cache.get_or_call(AVAILABILITY, _slots(date), tool()))["slots"][0]
+
+    async def main():
+        assert await lookup("2030-05-14") == "run 1"
+        assert await lookup("2030-05-15") == "run 2"
+        # Reading 05-14 makes 05-15 the least recently used, so 05-16 evicts it
+        assert await lookup("2030-05-14") == "run 1"
+        assert await lookup("2030-05-16") == "run 3"
+        assert cache.stats()["entries"] == 2
+        assert await lookup("2030-05-15") == "run 4"
+
+        now[0] += 61
+        assert await lookup("2030-05-16") == "run 5"
+
+    asyncio.run(main())
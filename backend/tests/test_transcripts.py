@@ -0,0 +1,51 @@
+import gzip
+import json
+import asyncio
+
+from response_cache import ResponseCache
+from transcripts import TranscriptJournal, read_session, session_frames
+from utils import with_tool_arguments
+
+
+def test_sessions_are_read_back_through_the_index(tmp_path):
+    async def write():
+        journal = TranscriptJournal(str(tmp_path), batch_size=2, flush_interval=0.01)
+        journal.start()
+        for turn in range(5):
+            journal.record({"session_id": f"s{turn % 2}", "query": f"q{turn}"})
+            await asyncio.sleep(0.02)
+        await journal.close()
+
+    asyncio.run(write())
+
+    assert [entry["query"] for entry in read_session(str(tmp_path), "s0")] == ["q0", "q2", "q4"]
+    assert [entry["query"] for entry in read_session(str(tmp_path), "s1")] == ["q1", "q3"]
+    assert session_frames(str(tmp_path), "unknown") == []
+
+
+def test_tool_calls_are_recorded_with_their_arguments(tmp_path):
+    arguments = {"dealership_id": "LA002", "date": "2030-05-14"}
+    cache = ResponseCache("v1")
+    context = cache.context_key([])
+    cache.store(context, "slots at LA002 on 2030-05-14", [], tool_calls=[("check_appointment_availability", arguments)])
+
+    # A response served from the cache still reports the calls it was built from
+    outcome = {}
+    assert cache.lookup(context, "slots at LA002 on 2030-05-14", outcome) == []
+    outputs = [{"name": "check_appointment_availability", "output": {"slots": ["09:00"]}}]
+
+    async def write():
+        journal = TranscriptJournal(str(tmp_path), batch_size=1, flush_interval=0.01)
+        journal.start()
+        journal.record({"session_id": "s1", "tool_calls": with_tool_arguments(outputs, outcome["tool_calls"])})
+        await journal.close()
+
+    asyncio.run(write())
+
+    expected = [{"name": "check_appointment_availability", "arguments": arguments, "output": {"slots": ["09:00"]}}]
+    assert [entry["tool_calls"] for entry in read_session(str(tmp_path), "s1")] == [expected]
+    [(segment, offset, length)] = session_frames(str(tmp_path), "s1")
+    with open(tmp_path / segment, "rb") as f:
+        f.seek(offset)
+        [line] = gzip.decompress(f.read(length)).splitlines()
+    assert json.loads(line)["tool_calls"] == expected
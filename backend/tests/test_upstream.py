@@ -0,0 +1,126 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from upstream import CircuitBreaker, UpstreamConfig, UpstreamTransport, UpstreamUnavailableError
+
+
+class _Stream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+
+class _FakeClient:
+    """Completions client whose first call hangs until cancelled; later calls stream one chunk."""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **_request):
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            await asyncio.Event().wait()
+        return _Stream(["chunk"])
+
+
+def _half_open_transport(client):
+    transport = UpstreamTransport(client, UpstreamConfig(failure_threshold=1, reset_timeout=30.0))
+    transport.breaker.failures = 1
+    transport.breaker.opened_at = time.monotonic() - 60
+    return transport
+
+
+async def _collect(transport):
+    return [chunk async for chunk in transport.stream_chat({"stream": True})]
+
+
+def test_cancelled_half_open_trial_releases_the_breaker():
+    async def scenario():
+        client = _FakeClient()
+        transport = _half_open_transport(client)
+        assert transport.breaker.state == "half_open"
+
+        trial = asyncio.ensure_future(_collect(transport))
+        await client.started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        assert transport.breaker.state == "half_open"
+        assert transport.breaker.trial_in_flight is False
+        # The next request becomes the trial and closes the breaker
+        assert await _collect(transport) == ["chunk"]
+        assert transport.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_half_open_breaker_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+
+    assert breaker.acquire() is True
+    with pytest.raises(UpstreamUnavailableError):
+        breaker.acquire()
+    breaker.release_trial()
+    assert breaker.acquire() is True
+
+
+class _SilentStream:
+    """A stream that opened but never sends its first chunk."""
+
+    def __init__(self):
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+def test_cancelling_the_caller_during_the_hedge_delay_closes_the_primary_stream():
+    async def scenario():
+        streams = []
+        opened = asyncio.Event()
+
+        async def create(**_request):
+            streams.append(_SilentStream())
+            opened.set()
+            return streams[-1]
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        transport = UpstreamTransport(client, UpstreamConfig(hedge_percentile=0.9, hedge_min_samples=1))
+        transport.latency.record(5.0)
+
+        caller = asyncio.ensure_future(_collect(transport))
+        await opened.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        assert transport.counters["hedges"] == 0
+        assert [stream.closed for stream in streams] == [True]
+
+    asyncio.run(scenario())
@@ -1,110 +1,35 @@
+import json
+import hashlib
+
 from .weather import get_weather
 from .dealership import get_dealership_address
-from .appointment import check_appointment_availability, schedule_appointment
+from .appointment import check_appointment_availability, find_next_available_slots, schedule_appointment
+from .executor import ToolExecutor
+from .cache import ToolResultCache
+from .prefetch import IncrementalJSONObject, ToolPrefetcher
+from .registry import Param, ToolRegistry, ToolValidationError, registry, tool
+
+# Tool schemas, functions and argument names all come from the @tool
+# definitions registered by the imports above
+TOOL_REGISTRY = registry
+TOOLS = registry.schemas
 
-# Define available tools and their schemas
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_weather",
-            "description": "Get the current weather information for a city",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "The city to get weather information for"
-                    }
-                },
-                "required": ["city"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_dealership_address",
-            "description": "Get the address of a SuperCar dealership",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "dealership_id": {
-                        "type": "string",
-                        "description": "The ID of the dealership"
-                    }
-                },
-                "required": ["dealership_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "check_appointment_availability",
-            "description": "Check available appointment slots for a test drive",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "dealership_id": {
-                        "type": "string",
-                        "description": "The ID of the dealership"
-                    },
-                    "date": {
-                        "type": "string",
-                        "description": "The date to check in YYYY-MM-DD format"
-                    }
-                },
-                "required": ["dealership_id", "date"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "schedule_appointment",
-            "description": "Schedule a test drive appointment",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The ID of the user scheduling the appointment"
-                    },
-                    "dealership_id": {
-                        "type": "string",
-                        "description": "The ID of the dealership"
-                    },
-                    "date": {
-                        "type": "string",
-                        "description": "The date of the appointment in YYYY-MM-DD format"
-                    },
-                    "time": {
-                        "type": "string",
-                        "description": "The time of the appointment in HH:MM format"
-                    },
-                    "car_model": {
-                        "type": "string",
-                        "description": "The car model for the test drive"
-                    }
-                },
-                "required": ["user_id", "dealership_id", "date", "time", "car_model"]
-            }
-        }
-    }
-]
+# Changes whenever a tool schema changes, so cached responses built against
+# older schemas are not reused
+TOOL_SCHEMA_VERSION = hashlib.sha256(json.dumps(TOOLS, sort_keys=True).encode("utf-8")).hexdigest()[:16]
 
 # Map tool names to their functions
-TOOL_FUNCTIONS = {
-    "get_weather": get_weather,
-    "get_dealership_address": get_dealership_address,
-    "check_appointment_availability": check_appointment_availability,
-    "schedule_appointment": schedule_appointment
-}
-ARGUMENTS_NAMES = {
-    "dealership_id": "dealership ID",
-    "date": "date (YYYY-MM-DD)",
-    "user_id": "user ID",
-    "time": "time (HH:MM)",
-    "car_model": "car model",
-}
\ No newline at end of file
+TOOL_FUNCTIONS = registry.functions
+ARGUMENTS_NAMES = registry.argument_labels
+
+# Per-tool execution policy, declared with each @tool: timeout in seconds,
+# maximum concurrent calls, result cache lifetime in seconds and the cached
+# results a successful call makes stale (tool -> [(cached tool, matching arguments)])
+TOOL_TIMEOUTS = registry.timeouts
+TOOL_CONCURRENCY = registry.concurrency
+TOOL_CACHE_TTLS = registry.cache_ttls
+TOOL_CACHE_INVALIDATIONS = registry.cache_invalidations
+
+# Tools that may be started while the model is still streaming their
+# arguments; only tools without side effects qualify
+TOOL_PREFETCHABLE = registry.read_only
@@ -1,56 +1,114 @@
 from typing import Dict, Any, List
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
 
+from .inventory import InventoryError, get_inventory
+from .directory import get_directory
+from .registry import Param, tool
 
+
+def _unknown_dealership(dealership_id: str) -> Dict[str, Any]:
+    return {
+        "error": f"No dealership found with ID {dealership_id}.",
+        "suggestion": "Ask the user which dealership they mean, or look it up with get_dealership_address."
+    }
+
+
+@tool(
+    description="Check available appointment slots for a test drive",
+    parameters={
+        "dealership_id": Param("The ID of the dealership", label="dealership ID"),
+        "date": Param("The date to check in YYYY-MM-DD format", format="date")
+    },
+    timeout=5.0,
+    concurrency=16,
+    read_only=True,
+    cache_ttl=120.0
+)
 def check_appointment_availability(dealership_id: str, date: str) -> Dict[str, Any]:
     """
     Checks available appointment slots for a test drive at a specific dealership and date.
 
     Args:
-        dealership_id: The ID of the dealership
+        dealership_id: The ID of the dealership, or its city or name
         date: The date to check in YYYY-MM-DD format
 
     Returns:
         Dict containing available time slots
     """
-    # Validate date format
-    # try:
-    #     datetime.strptime(date, "%Y-%m-%d")
-    # except ValueError:
-    #     return {
-    #         "error": "Invalid date format. Please use YYYY-MM-DD format."
-    #     }
-
-    # Generate some random available slots (in a real implementation, this would query a database)
-    all_possible_slots = [
-        "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
-        "12:00", "12:30", "13:00", "13:30", "14:00", "14:30",
-        "15:00", "15:30", "16:00", "16:30", "17:00", "17:30"
-    ]
-
-    # Use dealership_id as a seed for reproducible randomness
-    seed = sum(ord(c) for c in f"{dealership_id}{date}")
-    random.seed(seed)
+    # The model may pass a city or dealership name instead of the ID
+    dealership = get_directory().resolve(dealership_id)
+    if dealership is None:
+        return _unknown_dealership(dealership_id)
 
-    # Randomly select some slots as "available"
-    num_available = random.randint(5, 10)
-    available_slots = random.sample(all_possible_slots, num_available)
-    available_slots.sort()
+    # Look up open slots in the appointment inventory
+    try:
+        return get_inventory().available_slots(dealership.id, date)
+    except InventoryError as e:
+        return {"error": str(e)}
+
+
+@tool(
+    description="Find the next open test drive slots at a dealership within a week of a date",
+    parameters={
+        "dealership_id": Param("The ID of the dealership", label="dealership ID"),
+        "start_date": Param("The first date to search in YYYY-MM-DD format", format="date")
+    },
+    timeout=5.0,
+    concurrency=16,
+    read_only=True,
+    cache_ttl=60.0
+)
+def find_next_available_slots(dealership_id: str, start_date: str) -> Any:
+    """
+    Finds the next open test drive slots at a dealership within a week.
 
-    return available_slots
+    Args:
+        dealership_id: The ID of the dealership, or its city or name
+        start_date: The first date to search in YYYY-MM-DD format
 
+    Returns:
+        List of up to 3 slots, each with a date and time
+    """
+    dealership = get_directory().resolve(dealership_id)
+    if dealership is None:
+        return _unknown_dealership(dealership_id)
 
-def schedule_appointment(user_id: str, dealership_id: str, date: str, time: str, car_model: str) -> Dict[str, Any]:
+    try:
+        return get_inventory().next_open_slots(dealership.id, start_date, days=7, limit=3)
+    except InventoryError as e:
+        return {"error": str(e)}
+
+
+@tool(
+    description="Schedule a test drive appointment",
+    parameters={
+        "user_id": Param("The ID of the user scheduling the appointment", label="user ID"),
+        "dealership_id": Param("The ID of the dealership", label="dealership ID"),
+        "date": Param("The date of the appointment in YYYY-MM-DD format", format="date"),
+        "time": Param("The time of the appointment in HH:MM format", format="time"),
+        "car_model": Param("The car model for the test drive")
+    },
+    timeout=10.0,
+    concurrency=8,
+    # The same dealership may be cached under its ID, city or name, so only
+    # the date narrows what a booking makes stale
+    invalidates=[
+        ("check_appointment_availability", ("date",)),
+        ("find_next_available_slots", ())
+    ]
+)
+def schedule_appointment(user_id: str, dealership_id: str, date: str, time: str, car_model: str,
+                         dry_run: bool = False) -> Dict[str, Any]:
     """
     Schedules a test drive appointment.
 
     Args:
         user_id: The ID of the user scheduling the appointment
-        dealership_id: The ID of the dealership
+        dealership_id: The ID of the dealership, or its city or name
         date: The date of the appointment in YYYY-MM-DD format
         time: The time of the appointment in HH:MM format
         car_model: The car model for the test drive
+        dry_run: Only check that the slot is open; nothing is reserved or journaled
 
     Returns:
         Dict containing confirmation details
@@ -64,18 +122,31 @@ def schedule_appointment(user_id: str, dealership_id: str, date: str, time: str,
             "error": "Invalid date or time format. Please use YYYY-MM-DD for date and HH:MM for time."
         }
 
+    # Resolve the dealership the same way get_dealership_address does, so
+    # "Miami" books the Miami dealership's calendar
+    dealership = get_directory().resolve(dealership_id)
+    if dealership is None:
+        return _unknown_dealership(dealership_id)
+
+    # Reserve the slot so no one else can book it; a dry run only checks that it is open
+    inventory = get_inventory()
+    try:
+        if dry_run:
+            reserved = inventory.is_available(dealership.id, date, time)
+        else:
+            reserved = inventory.reserve(dealership.id, date, time, user_id)
+    except InventoryError as e:
+        return {"error": str(e)}
+    if not reserved:
+        return {
+            "error": f"The {time} slot on {date} is not available. Please choose another time.",
+            "available_slots": inventory.available_slots(dealership.id, date)
+        }
+
     # Generate a confirmation number
-    confirmation_code = f"SC-{dealership_id}-{user_id[:4]}-{int(datetime.now().timestamp()) % 10000}"
-
-    # Get dealership name (would be from database in real implementation)
-    dealership_names = {
-        "NYC001": "SuperCar Manhattan",
-        "LA002": "SuperCar Beverly Hills",
-        "CHI003": "SuperCar Chicago",
-        "HOU004": "SuperCar Houston",
-        "MIA005": "SuperCar Miami"
-    }
-    dealership_name = dealership_names.get(dealership_id, "SuperCar Dealership")
+    confirmation_code = f"SC-{dealership.id}-{user_id[:4]}-{int(datetime.now().timestamp()) % 10000}"
+    if dry_run:
+        confirmation_code = f"DRYRUN-{confirmation_code}"
 
     # Format date and time for display
     formatted_date = appointment_date.strftime("%A, %B %d, %Y")
@@ -85,8 +156,8 @@ def schedule_appointment(user_id: str, dealership_id: str, date: str, time: str,
         "confirmation_code": confirmation_code,
         "user_id": user_id,
         "dealership": {
-            "id": dealership_id,
-            "name": dealership_name
+            "id": dealership.id,
+            "name": dealership.name
         },
         "appointment": {
             "date": formatted_date,
@@ -0,0 +1,166 @@
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Any, Awaitable, Callable, Optional, Tuple
+
+CacheKey = Tuple[str, str]
+
+_MISSING = object()
+
+
+class ToolResultCache:
+    """
+    TTL + LRU cache for tool results with single-flight request coalescing.
+
+    Only tools with a TTL are cached. Concurrent calls with identical
+    arguments share one execution, and results that carry an "error" key are
+    never stored.
+    """
+
+    def __init__(
+            self,
+            ttls: Dict[str, float],
+            invalidations: Optional[Dict[str, List[Tuple[str, Tuple[str, ...]]]]] = None,
+            max_entries: int = 1024
+    ):
+        self.ttls = ttls
+        self.invalidations = invalidations or {}
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any], Any]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._generation = 0
+        self.counters = {name: {"hits": 0, "misses": 0, "coalesced": 0} for name in ttls}
+
+    @staticmethod
+    def make_key(name: str, arguments: Dict[str, Any]) -> CacheKey:
+        """Build a cache key that does not depend on argument order."""
+        return name, json.dumps(arguments, sort_keys=True, default=str)
+
+    async def get_or_call(
+            self,
+            name: str,
+            arguments: Dict[str, Any],
+            call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return a cached result or run `call`, coalescing identical in-flight calls.
+
+        Args:
+            name: The tool name
+            arguments: The tool arguments
+            call: Executes the tool when there is no usable cached result
+
+        Returns:
+            The tool result
+        """
+        if name not in self.ttls:
+            result = await call()
+            self._apply_invalidations(name, arguments, result)
+            return result
+
+        key = self.make_key(name, arguments)
+        counters = self.counters[name]
+        while True:
+            cached = self._lookup(key)
+            if cached is not _MISSING:
+                counters["hits"] += 1
+                return cached
+
+            leader = self._inflight.get(key)
+            if leader is None:
+                break
+
+            counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                # The leading call was abandoned, so try again ourselves
+                if leader.cancelled():
+                    continue
+                raise
+
+        counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        # Followers may be gone by the time the call fails; don't warn about that
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            result = await call()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        # Skip storing results that may predate an invalidation that raced with the call
+        if generation == self._generation and not _is_error(result):
+            self._store(key, arguments, result, self.ttls[name])
+        future.set_result(result)
+        return result
+
+    def invalidate(self, name: str, **arguments: Any) -> int:
+        """
+        Drop cached results of a tool whose arguments match the given values.
+
+        Args:
+            name: The tool whose results to drop
+            arguments: Argument values to match; no arguments drops every result of the tool
+
+        Returns:
+            The number of entries removed
+        """
+        self._generation += 1
+        stale = [
+            key for key, (_, cached_arguments, _) in self._entries.items()
+            if key[0] == name and all(cached_arguments.get(k) == v for k, v in arguments.items())
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and per-tool hit/miss/coalesced counters."""
+        return {
+            "entries": len(self._entries),
+            "tools": {name: dict(counters) for name, counters in self.counters.items()}
+        }
+
+    def _lookup(self, key: CacheKey) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, _, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return result
+
+    def _store(self, key: CacheKey, arguments: Dict[str, Any], result: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, dict(arguments), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _apply_invalidations(self, name: str, arguments: Dict[str, Any], result: Any) -> None:
+        """Invalidate results that a successful call to `name` has made stale."""
+        if _is_error(result):
+            return
+        for cached_tool, shared_arguments in self.invalidations.get(name, []):
+            self.invalidate(cached_tool, **{
+                argument: arguments[argument] for argument in shared_arguments if argument in arguments
+            })
+
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and "error" in result
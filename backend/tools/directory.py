@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import math
+import difflib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "dealerships.json")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_STOP_WORDS = {"supercar", "dealership", "dealer", "showroom", "the", "in", "at", "of", "your", "location", "store"}
+EARTH_RADIUS_KM = 6371.0
+
+
+def normalize_id(value: str) -> str:
+    """Uppercase an ID and drop separators, so "mia-005" matches "MIA005"."""
+    return re.sub(r"[^A-Z0-9]", "", value.upper())
+
+
+def normalize_name(value: str) -> str:
+    """Lowercase a name and keep only meaningful words."""
+    words = _NON_ALNUM.sub(" ", value.lower()).split()
+    return " ".join(word for word in words if word not in _STOP_WORDS)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class Dealership:
+    __slots__ = ("id", "name", "address", "phone", "hours", "city", "aliases", "lat", "lon")
+
+    def __init__(self, id: str, name: str, address: str, phone: str, hours: str,
+                 city: str, lat: float, lon: float, aliases: Optional[List[str]] = None):
+        self.id = id
+        self.name = name
+        self.address = address
+        self.phone = phone
+        self.hours = hours
+        self.city = city
+        self.aliases = aliases or []
+        self.lat = lat
+        self.lon = lon
+
+    def describe(self) -> str:
+        return f"Name: {self.name}. Address: {self.address}. Phone: {self.phone}. Hours: {self.hours}."
+
+
+class DealershipDirectory:
+    """
+    In-memory dealership registry with precomputed lookup indexes.
+
+    - by ID, ignoring case and separators
+    - by normalized city, alias and name, with fuzzy matching for typos
+    - by location, bucketed into a latitude/longitude grid for nearest queries
+    """
+
+    def __init__(self, dealerships: List[Dealership], cities: Optional[Dict[str, Tuple[float, float]]] = None,
+                 grid_degrees: float = 5.0):
+        self.dealerships = dealerships
+        self.grid_degrees = grid_degrees
+        self._columns = round(360 / grid_degrees)
+        self._by_id: Dict[str, Dealership] = {}
+        self._by_name: Dict[str, Dealership] = {}
+        self._grid: Dict[Tuple[int, int], List[Dealership]] = {}
+        self._cities = {normalize_name(city): tuple(point) for city, point in (cities or {}).items()}
+        # Display names of every known city, by normalized name
+        self.city_names = {normalize_name(city): city for city in cities or {}}
+
+        for dealership in dealerships:
+            self._by_id[normalize_id(dealership.id)] = dealership
+            for label in [dealership.city, dealership.name] + dealership.aliases:
+                key = normalize_name(label)
+                if key:
+                    self._by_name.setdefault(key, dealership)
+            self._grid.setdefault(self._cell(dealership.lat, dealership.lon), []).append(dealership)
+            self._cities.setdefault(normalize_name(dealership.city), (dealership.lat, dealership.lon))
+            self.city_names.setdefault(normalize_name(dealership.city), dealership.city)
+        # Longest names first so "new york city" wins over "new york" in substring matches
+        self._name_keys = sorted(self._by_name, key=len, reverse=True)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_DATA_PATH) -> "DealershipDirectory":
+        """Build a directory from a JSON data file."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls([Dealership(**entry) for entry in data["dealerships"]], data.get("cities"))
+
+    def get(self, dealership_id: str) -> Optional[Dealership]:
+        """Return the dealership with exactly this ID (ignoring case and separators)."""
+        return self._by_id.get(normalize_id(dealership_id))
+
+    def resolve(self, text: str) -> Optional[Dealership]:
+        """
+        Find the dealership a user or model most likely means.
+
+        Tries, in order: ID, exact city/alias/name, a city/alias/name contained
+        in the text, and finally a fuzzy match on city/alias/name.
+
+        Args:
+            text: An ID, city or name, possibly misspelled
+
+        Returns:
+            The matching dealership, or None
+        """
+        dealership = self.get(text)
+        if dealership is not None:
+            return dealership
+
+        key = normalize_name(text)
+        if not key:
+            return None
+        dealership = self._by_name.get(key)
+        if dealership is not None:
+            return dealership
+
+        padded = f" {key} "
+        for name in self._name_keys:
+            if f" {name} " in padded:
+                return self._by_name[name]
+
+        close = difflib.get_close_matches(key, self._name_keys, n=1, cutoff=0.8)
+        return self._by_name[close[0]] if close else None
+
+    def locate(self, city: str) -> Optional[Tuple[float, float]]:
+        """Return known coordinates for a city name, if any."""
+        key = normalize_name(city)
+        point = self._cities.get(key)
+        if point is None:
+            close = difflib.get_close_matches(key, list(self._cities), n=1, cutoff=0.85)
+            point = self._cities[close[0]] if close else None
+        return point
+
+    def nearest(self, lat: float, lon: float, limit: int = 1) -> List[Tuple[Dealership, float]]:
+        """
+        Return the closest dealerships to a point.
+
+        Grid rings are searched outwards from the point's cell until enough
+        candidates are found; then every cell within the bounding box of the
+        current k-th distance is checked, so the result is exact.
+
+        Args:
+            lat: Latitude in degrees
+            lon: Longitude in degrees
+            limit: Maximum number of dealerships to return
+
+        Returns:
+            (dealership, distance in km) pairs, nearest first
+        """
+        wanted = min(limit, len(self.dealerships))
+        if wanted <= 0:
+            return []
+
+        origin = self._cell(lat, lon)
+        visited = set()
+        candidates = 0
+        ring = 0
+        while candidates < wanted:
+            for row, col in self._ring(origin, ring):
+                cell = (row, self._wrap(col))
+                if cell not in visited:
+                    visited.add(cell)
+                    candidates += len(self._grid.get(cell, ()))
+            ring += 1
+
+        found = [
+            (dealership, haversine_km(lat, lon, dealership.lat, dealership.lon))
+            for cell in visited for dealership in self._grid.get(cell, ())
+        ]
+        found.sort(key=lambda item: item[1])
+        radius_km = found[wanted - 1][1]
+
+        # One degree of latitude is at least 110 km; a degree of longitude
+        # shrinks with the cosine of the most poleward latitude in range
+        d_lat = radius_km / 110.0
+        pole_lat = min(abs(lat) + d_lat, 89.9)
+        d_lon = min(radius_km / (110.0 * math.cos(math.radians(pole_lat))), 180.0)
+        g = self.grid_degrees
+        first_col, last_col = math.floor((lon - d_lon) / g), math.floor((lon + d_lon) / g)
+        columns = {self._wrap(col) for col in range(first_col, min(last_col, first_col + self._columns - 1) + 1)}
+        for row in range(math.floor(max(lat - d_lat, -90.0) / g), math.floor(min(lat + d_lat, 90.0) / g) + 1):
+            for col in columns:
+                if (row, col) in visited:
+                    continue
+                for dealership in self._grid.get((row, col), ()):
+                    found.append((dealership, haversine_km(lat, lon, dealership.lat, dealership.lon)))
+
+        found.sort(key=lambda item: item[1])
+        return found[:limit]
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.grid_degrees), self._wrap(math.floor(lon / self.grid_degrees))
+
+    def _wrap(self, col: int) -> int:
+        """Map a longitude column onto [-180, 180) so searches cross the antimeridian."""
+        half = self._columns // 2
+        return (col + half) % self._columns - half
+
+    @staticmethod
+    def _ring(origin: Tuple[int, int], ring: int):
+        row, col = origin
+        if ring == 0:
+            yield origin
+            return
+        for d in range(-ring, ring + 1):
+            yield row - ring, col + d
+            yield row + ring, col + d
+        for d in range(-ring + 1, ring):
+            yield row + d, col - ring
+            yield row + d, col + ring
+
+
+_directory: Optional[DealershipDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_directory() -> DealershipDirectory:
+    """Return the process-wide directory, loaded once from DEALERSHIP_DATA_PATH."""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = DealershipDirectory.load(os.getenv("DEALERSHIP_DATA_PATH") or DEFAULT_DATA_PATH)
+    return _directory
@@ -0,0 +1,128 @@
+import time
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, AsyncGenerator, Callable, Optional, Tuple
+
+from .cache import ToolResultCache
+
+
+class ToolExecutor:
+    """
+    Runs tool functions without blocking the event loop.
+
+    Native `async def` tools are awaited directly, synchronous tools are
+    offloaded to a bounded thread pool. Every call is subject to a per-tool
+    timeout and a per-tool concurrency limit. With a `cache`, results are
+    served from and stored in a ToolResultCache. An `observer` is called
+    with (name, seconds, outcome) after every actual execution.
+    """
+
+    def __init__(
+            self,
+            functions: Dict[str, Callable[..., Any]],
+            timeouts: Optional[Dict[str, float]] = None,
+            concurrency: Optional[Dict[str, int]] = None,
+            max_workers: int = 8,
+            default_timeout: float = 10.0,
+            default_concurrency: int = 32,
+            cache: Optional[ToolResultCache] = None,
+            observer: Optional[Callable[[str, float, str], None]] = None
+    ):
+        self.functions = functions
+        self.cache = cache
+        self.observer = observer
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._semaphores = {
+            name: asyncio.Semaphore((concurrency or {}).get(name, default_concurrency))
+            for name in functions
+        }
+
+    async def run(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Execute a single tool call.
+
+        Args:
+            name: The tool name
+            arguments: Keyword arguments for the tool function
+
+        Returns:
+            The tool result, or a dict with an "error" key if the call failed
+        """
+        if self.cache is not None:
+            return await self.cache.get_or_call(name, arguments, lambda: self._execute(name, arguments))
+        return await self._execute(name, arguments)
+
+    async def run_many(
+            self,
+            calls: List[Tuple[str, Dict[str, Any]]],
+            started: Optional[Dict[int, "asyncio.Future[Any]"]] = None
+    ) -> AsyncGenerator[Tuple[int, Any], None]:
+        """
+        Execute independent tool calls concurrently.
+
+        Args:
+            calls: (name, arguments) pairs
+            started: Calls that are already running (e.g. prefetched), by
+                index; they are awaited instead of being run again
+
+        Yields:
+            (index, result) pairs in completion order, where index is the
+            position of the call in `calls`
+        """
+        started = started or {}
+
+        async def run_indexed(index: int, name: str, arguments: Dict[str, Any]) -> Tuple[int, Any]:
+            if index in started:
+                return index, await started[index]
+            return index, await self.run(name, arguments)
+
+        tasks = [
+            asyncio.ensure_future(run_indexed(index, name, arguments))
+            for index, (name, arguments) in enumerate(calls)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Abort whatever is still running if the consumer stops early
+            for task in tasks:
+                task.cancel()
+            for future in started.values():
+                future.cancel()
+
+    async def _execute(self, name: str, arguments: Dict[str, Any]) -> Any:
+        function = self.functions.get(name)
+        if function is None:
+            return {"error": f"Unknown tool: {name}"}
+
+        timeout = self.timeouts.get(name, self.default_timeout)
+        async with self._semaphores[name]:
+            started = time.perf_counter()
+            outcome = "cancelled"
+            try:
+                result = await asyncio.wait_for(self._invoke(function, arguments), timeout)
+                outcome = "ok"
+                return result
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                return {"error": f"Tool {name} timed out after {timeout} seconds"}
+            except Exception as e:
+                outcome = "error"
+                return {"error": f"Tool {name} failed: {str(e)}"}
+            finally:
+                if self.observer is not None:
+                    self.observer(name, time.perf_counter() - started, outcome)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once in-flight calls finish."""
+        self._pool.shutdown(wait=False)
+
+    def _invoke(self, function: Callable[..., Any], arguments: Dict[str, Any]):
+        if inspect.iscoroutinefunction(function):
+            return function(**arguments)
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._pool, functools.partial(function, **arguments))
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import random
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date as Date, timedelta
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from .directory import DealershipDirectory, get_directory
+
+try:
+    import fcntl
+except ImportError:  # Windows: the journal cannot be shared between processes
+    fcntl = None
+
+# Test drive slots start every 30 minutes from 09:00 to 17:30
+SLOT_TIMES = [f"{hour:02d}:{minute:02d}" for hour in range(9, 18) for minute in (0, 30)]
+SLOT_INDEX = {slot: index for index, slot in enumerate(SLOT_TIMES)}
+ALL_SLOTS_MASK = (1 << len(SLOT_TIMES)) - 1
+
+
+def _baseline_mask(dealership_id: str, date: str) -> int:
+    """
+    Return the slots that are open before any reservation made through us.
+
+    Stands in for a dealership's existing calendar: a reproducible pseudo-random
+    selection of 5 to 10 slots per dealership and day, drawn from a private
+    generator so the global `random` state is left alone.
+    """
+    rng = random.Random(sum(ord(c) for c in f"{dealership_id}{date}"))
+    available = rng.sample(SLOT_TIMES, rng.randint(5, 10))
+    mask = 0
+    for slot in available:
+        mask |= 1 << SLOT_INDEX[slot]
+    return mask
+
+
+def _slots_from_mask(mask: int) -> List[str]:
+    return [slot for index, slot in enumerate(SLOT_TIMES) if mask >> index & 1]
+
+
+class InventoryError(ValueError):
+    """Raised for a dealership or day the inventory keeps no calendar for; the message is shown to the model."""
+
+
+class SlotInventory:
+    """
+    Per-dealership, per-day bitmap index over the 30-minute test drive slots.
+
+    Each (dealership, date) pair is one integer with a bit per slot, set while
+    the slot is open. Days are materialized lazily on first access and kept
+    in an LRU of at most `max_cached_days`; an evicted day is rebuilt from its
+    baseline and reservations. Checks are O(1) bit tests; reserve/release are
+    atomic under a lock, which covers both coroutines and tool functions
+    running on the executor's thread pool. Reservations are persisted to an
+    append-only JSONL journal that is replayed on startup.
+
+    Dealership IDs are canonicalized through the dealership directory, so
+    "mia-005" and "MIA005" share one calendar. Unknown dealerships, past days
+    and days more than `horizon_days` ahead raise InventoryError.
+
+    The journal also lets worker processes on one host share reservations:
+    writes happen under an exclusive file lock after applying the records
+    other processes appended, and reads pick up new records first, so a slot
+    can never be taken twice.
+    """
+
+    def __init__(
+            self,
+            journal_path: Optional[str] = None,
+            directory: Optional[DealershipDirectory] = None,
+            horizon_days: int = 90,
+            max_cached_days: int = 4096
+    ):
+        self.journal_path = journal_path
+        self.directory = directory or get_directory()
+        self.horizon_days = horizon_days
+        self.max_cached_days = max(max_cached_days, 1)
+        self._open: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # (dealership, date) -> {time: user}
+        self._reservations: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._journal = None
+        self._reader = None
+        self._offset = 0
+        if journal_path:
+            self._journal = open(journal_path, "a", encoding="utf-8")
+            self._reader = open(journal_path, "rb")
+            with self._exclusive():
+                self._catch_up()
+                # Terminate a line torn by a crash so the next record starts cleanly
+                if os.fstat(self._reader.fileno()).st_size > self._offset:
+                    self._journal.write("\n")
+                    self._journal.flush()
+
+    def available_slots(self, dealership_id: str, date: str) -> List[str]:
+        """Return the open slots of a dealership on a date, in time order."""
+        key = self._key(dealership_id, date)
+        with self._lock:
+            self._catch_up()
+            return _slots_from_mask(self._mask(key))
+
+    def is_available(self, dealership_id: str, date: str, time: str) -> bool:
+        """Return whether a single slot is open."""
+        key = self._key(dealership_id, date)
+        index = SLOT_INDEX.get(time)
+        if index is None:
+            return False
+        with self._lock:
+            self._catch_up()
+            return bool(self._mask(key) >> index & 1)
+
+    def reserve(self, dealership_id: str, date: str, time: str, user_id: str = "") -> bool:
+        """
+        Atomically take an open slot.
+
+        Args:
+            dealership_id: The dealership
+            date: Day in YYYY-MM-DD format
+            time: Slot start in HH:MM format
+            user_id: Who the slot is reserved for
+
+        Returns:
+            True if the slot was reserved, False if it is not an open slot
+
+        Raises:
+            InventoryError: For an unknown dealership or a day outside the booking horizon
+        """
+        key = self._key(dealership_id, date)
+        index = SLOT_INDEX.get(time)
+        if index is None:
+            return False
+        with self._lock, self._exclusive():
+            self._catch_up()
+            if not self._mask(key) >> index & 1:
+                return False
+            self._set_reserved(key, time, user_id)
+            self._append({"op": "reserve", "dealership_id": key[0], "date": key[1], "time": time, "user_id": user_id})
+            return True
+
+    def release(self, dealership_id: str, date: str, time: str) -> bool:
+        """
+        Atomically give back a slot reserved through this inventory.
+
+        Returns:
+            True if a reservation was released
+        """
+        key = (self._canonical_id(dealership_id), date)
+        with self._lock, self._exclusive():
+            self._catch_up()
+            if time not in self._reservations.get(key, {}):
+                return False
+            self._set_reserved(key, time, None)
+            self._append({"op": "release", "dealership_id": key[0], "date": date, "time": time})
+            return True
+
+    def next_open_slots(
+            self,
+            dealership_id: str,
+            start_date: str,
+            days: int = 7,
+            limit: int = 3,
+            after_time: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Find the earliest open slots over a range of days.
+
+        Args:
+            dealership_id: The dealership
+            start_date: First day to search, in YYYY-MM-DD format
+            days: Number of days to search, starting with start_date
+            limit: Maximum number of slots to return
+            after_time: Only consider slots after this HH:MM time on start_date
+
+        Returns:
+            Up to `limit` {"date", "time"} dicts in chronological order; past
+            days and days beyond the booking horizon are not searched
+
+        Raises:
+            InventoryError: For an unknown dealership or a start date beyond the booking horizon
+        """
+        dealership_id = self._canonical_id(dealership_id)
+        requested = _parse_day(start_date)
+        today = Date.today()
+        # Past days cannot be booked, so the search starts today at the earliest
+        first_day = max(requested, today)
+        last_day = min(first_day + timedelta(days=days - 1), today + timedelta(days=self.horizon_days))
+        if first_day > last_day:
+            raise InventoryError(f"Appointments can only be booked up to {self.horizon_days} days ahead")
+        skip_mask = 0
+        if after_time is not None and first_day == requested:
+            for slot, index in SLOT_INDEX.items():
+                if slot <= after_time:
+                    skip_mask |= 1 << index
+
+        found: List[Dict[str, str]] = []
+        with self._lock:
+            self._catch_up()
+            for offset in range((last_day - first_day).days + 1):
+                day = (first_day + timedelta(days=offset)).isoformat()
+                mask = self._mask((dealership_id, day))
+                if offset == 0:
+                    mask &= ~skip_mask
+                while mask and len(found) < limit:
+                    lowest = mask & -mask
+                    found.append({"date": day, "time": SLOT_TIMES[lowest.bit_length() - 1]})
+                    mask ^= lowest
+                if len(found) >= limit:
+                    break
+        return found
+
+    def close(self) -> None:
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._reader.close()
+                self._journal = self._reader = None
+
+    def _canonical_id(self, dealership_id: str) -> str:
+        dealership = self.directory.get(dealership_id)
+        if dealership is None:
+            raise InventoryError(f"Unknown dealership ID: {dealership_id}")
+        return dealership.id
+
+    def _key(self, dealership_id: str, date: str) -> Tuple[str, str]:
+        """Canonical (dealership, date) key of a bookable day."""
+        dealership_id = self._canonical_id(dealership_id)
+        day = _parse_day(date)
+        today = Date.today()
+        if day < today:
+            raise InventoryError(f"{date} is in the past")
+        if day > today + timedelta(days=self.horizon_days):
+            raise InventoryError(f"Appointments can only be booked up to {self.horizon_days} days ahead")
+        return dealership_id, day.isoformat()
+
+    def _mask(self, key: Tuple[str, str]) -> int:
+        mask = self._open.get(key)
+        if mask is not None:
+            self._open.move_to_end(key)
+            return mask
+        mask = _baseline_mask(*key)
+        for slot in self._reservations.get(key, ()):
+            mask &= ~(1 << SLOT_INDEX[slot])
+        self._open[key] = mask
+        if len(self._open) > self.max_cached_days:
+            self._open.popitem(last=False)
+        return mask
+
+    def _set_reserved(self, key: Tuple[str, str], slot: str, user_id: Optional[str]) -> None:
+        """Reserve a slot for `user_id`, or release it if None, and update the cached day."""
+        mask = self._mask(key)
+        if user_id is None:
+            reserved = self._reservations.get(key, {})
+            reserved.pop(slot, None)
+            if not reserved:
+                self._reservations.pop(key, None)
+            self._open[key] = mask | (1 << SLOT_INDEX[slot])
+        else:
+            self._reservations.setdefault(key, {})[slot] = user_id
+            self._open[key] = mask & ~(1 << SLOT_INDEX[slot])
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        if self._journal is None:
+            return
+        record["ts"] = round(time.time(), 3)
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the journal's file lock, excluding writers in other processes."""
+        if self._journal is None or fcntl is None:
+            yield
+            return
+        fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._journal.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """
+        Apply the journal records appended since the last call, by any process.
+
+        Only complete lines are consumed, so a record being written is picked
+        up next time; malformed lines are skipped. Applying a record twice
+        (including this process's own) is harmless.
+        """
+        if self._reader is None or os.fstat(self._reader.fileno()).st_size == self._offset:
+            return
+        self._reader.seek(self._offset)
+        data = self._reader.read()
+        complete = data.rfind(b"\n") + 1
+        self._offset += complete
+        for line in data[:complete].splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            dealership = self.directory.get(record["dealership_id"])
+            if dealership is None or record["time"] not in SLOT_INDEX:
+                continue
+            key = (dealership.id, record["date"])
+            if record["op"] == "reserve":
+                self._set_reserved(key, record["time"], record.get("user_id", ""))
+            elif record["op"] == "release":
+                self._set_reserved(key, record["time"], None)
+
+
+def _parse_day(date: str) -> Date:
+    try:
+        return Date.fromisoformat(date)
+    except ValueError:
+        raise InventoryError(f"Invalid date: {date}. Please use YYYY-MM-DD format.")
+
+
+_inventory: Optional[SlotInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> SlotInventory:
+    """Return the process-wide inventory, journaled to APPOINTMENT_JOURNAL_PATH if set."""
+    global _inventory
+    if _inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                _inventory = SlotInventory(
+                    os.getenv("APPOINTMENT_JOURNAL_PATH") or None,
+                    horizon_days=int(os.getenv("APPOINTMENT_HORIZON_DAYS", "90")),
+                    max_cached_days=int(os.getenv("APPOINTMENT_CACHE_MAX_DAYS", "4096"))
+                )
+    return _inventory
+
+
+def close_inventory() -> None:
+    """Close the process-wide inventory; the next get_inventory() opens it again."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is not None:
+            _inventory.close()
+            _inventory = None
@@ -0,0 +1,166 @@
+import json
+import asyncio
+from typing import Dict, List, Any, Optional, Set
+
+from .executor import ToolExecutor
+from .registry import ToolRegistry, ToolValidationError
+
+
+class IncrementalJSONObject:
+    """
+    Parses a JSON object from streamed fragments.
+
+    Each top-level member is decoded as soon as its value is complete (for
+    strings, at the closing quote), so `fields` fills up while the rest of
+    the object is still arriving. Every character is scanned once.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self.failed = False
+        self._member: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._after_colon = False
+
+    def feed(self, fragment: str) -> bool:
+        """
+        Consume the next fragment.
+
+        Returns:
+            True if at least one more member was completed
+        """
+        completed = False
+        for char in fragment:
+            if self.done or self.failed:
+                break
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                elif not char.isspace():
+                    self.failed = True
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._after_colon:
+                        # A top-level string value is complete without waiting for , or }
+                        self._member.append(char)
+                        completed = self._finish_member() or completed
+                        continue
+            elif char == ":" and self._depth == 1:
+                self._after_colon = True
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed = self._finish_member() or completed
+                    self.done = not self.failed
+                    continue
+            elif char == "," and self._depth == 1:
+                completed = self._finish_member() or completed
+                continue
+            self._member.append(char)
+        return completed
+
+    def _finish_member(self) -> bool:
+        text = "".join(self._member).strip()
+        self._member = []
+        self._after_colon = False
+        if not text:
+            return False
+        try:
+            self.fields.update(json.loads("{" + text + "}"))
+        except ValueError:
+            self.failed = True
+            return False
+        return True
+
+
+class _Speculation:
+    __slots__ = ("name", "parser", "arguments", "task")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.parser = IncrementalJSONObject()
+        self.arguments: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Future] = None
+
+
+class ToolPrefetcher:
+    """
+    Starts tool calls while the model is still streaming their arguments.
+
+    Once the members received so far pass validation, the call is started in
+    the background. When the model has finished the call, `take` hands over
+    the running task if the final arguments are the same; otherwise the early
+    result is discarded. Only tools listed in `tools` are started early, which
+    must be free of side effects.
+    """
+
+    def __init__(self, executor: ToolExecutor, registry: ToolRegistry, tools: Set[str]):
+        self.executor = executor
+        self.registry = registry
+        self.tools = tools
+        self._calls: Dict[int, Optional[_Speculation]] = {}
+
+    def feed(self, index: int, name: str, fragment: str) -> None:
+        """
+        Add an argument fragment of the tool call at `index`.
+
+        Args:
+            index: Position of the tool call in the completion
+            name: The tool name, known from the call's first delta
+            fragment: The next piece of the JSON arguments
+        """
+        if index not in self._calls:
+            self._calls[index] = _Speculation(name) if name in self.tools else None
+        speculation = self._calls[index]
+        if speculation is None or not speculation.parser.feed(fragment):
+            return
+        try:
+            arguments = self.registry.validate(name, speculation.parser.fields)
+        except ToolValidationError:
+            return
+        if arguments == speculation.arguments:
+            return
+        if speculation.task is not None:
+            # A later member changed the arguments, e.g. an optional parameter
+            speculation.task.cancel()
+        speculation.arguments = arguments
+        speculation.task = asyncio.ensure_future(self.executor.run(name, arguments))
+
+    def take(self, index: int, name: str, arguments: Dict[str, Any]) -> Optional[asyncio.Future]:
+        """Return the early call for `index` if it ran with exactly these arguments."""
+        speculation = self._calls.get(index)
+        if speculation is None or speculation.task is None:
+            return None
+        if speculation.name != name or speculation.arguments != arguments:
+            return None
+        self._calls[index] = None
+        return speculation.task
+
+    def discard(self) -> int:
+        """
+        Cancel the early calls that were not taken.
+
+        Returns:
+            The number of discarded calls
+        """
+        discarded = 0
+        for speculation in self._calls.values():
+            if speculation is not None and speculation.task is not None:
+                speculation.task.cancel()
+                discarded += 1
+        self._calls.clear()
+        return discarded
@@ -0,0 +1,329 @@
+import re
+import json
+import inspect
+import functools
+from datetime import date as Date
+from typing import Annotated, Dict, List, Any, Callable, Optional, Set, Tuple
+
+from pydantic import AfterValidator, ConfigDict, ValidationError, create_model
+from pydantic_core import PydanticCustomError
+
+_TIME = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Placeholder values the model sends instead of leaving an argument out
+_MISSING_VALUES = {"", "required"}
+
+_PYTHON_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool}
+
+
+def _check_date(value: str) -> str:
+    try:
+        if _DATE.match(value):
+            Date.fromisoformat(value)
+            return value
+    except ValueError:
+        pass
+    raise PydanticCustomError("date_format", "must be a valid date in YYYY-MM-DD format")
+
+
+def _check_time(value: str) -> str:
+    match = _TIME.match(value)
+    if match is None:
+        raise PydanticCustomError("time_format", "must be a valid time in HH:MM format")
+    # Zero-pad the hour, so "9:30" matches the "09:30" slot
+    return f"{int(match.group(1)):02d}:{match.group(2)}"
+
+
+_FORMAT_VALIDATORS = {"date": _check_date, "time": _check_time}
+_FORMAT_LABELS = {"date": "YYYY-MM-DD", "time": "HH:MM"}
+
+
+class Param:
+    """
+    One tool parameter.
+
+    Args:
+        description: Shown to the model in the tool schema
+        type: JSON schema type
+        format: "date" (YYYY-MM-DD) or "time" (HH:MM), checked before the call
+        label: Human-readable name used in error messages
+        required: Whether the model must supply the argument
+    """
+
+    __slots__ = ("description", "type", "format", "label", "required")
+
+    def __init__(self, description: str, type: str = "string", format: Optional[str] = None,
+                 label: Optional[str] = None, required: bool = True):
+        if format is not None and format not in _FORMAT_VALIDATORS:
+            raise ValueError(f"Unknown parameter format: {format}")
+        self.description = description
+        self.type = type
+        self.format = format
+        self.label = label
+        self.required = required
+
+
+class ToolValidationError(Exception):
+    """Raised when a tool call cannot be run; `result` is fed back to the model."""
+
+    def __init__(self, tool: str, message: str, problems: Optional[List[Dict[str, str]]] = None,
+                 missing_only: bool = False):
+        super().__init__(message)
+        self.tool = tool
+        self.problems = problems or []
+        # Only missing values: the model has to ask the user rather than retry
+        self.missing_only = missing_only
+
+    @property
+    def result(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"error": str(self), "tool": self.tool}
+        if self.problems:
+            result["problems"] = self.problems
+        return result
+
+
+class _RegisteredTool:
+    __slots__ = ("name", "function", "schema", "parameters", "model", "timeout", "concurrency", "read_only",
+                 "cache_ttl", "invalidates")
+
+    def __init__(self, name: str, function: Callable[..., Any], schema: Dict[str, Any],
+                 parameters: Dict[str, Param], model: type, timeout: Optional[float], concurrency: Optional[int],
+                 read_only: bool, cache_ttl: Optional[float], invalidates: List[Tuple[str, Tuple[str, ...]]]):
+        self.name = name
+        self.function = function
+        self.schema = schema
+        self.parameters = parameters
+        self.model = model
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.read_only = read_only
+        self.cache_ttl = cache_ttl
+        self.invalidates = invalidates
+
+
+class ToolRegistry:
+    """
+    Single definition of every tool: schema, function, argument validator
+    and execution policy.
+
+    Tools register with the `tool` decorator. At registration each parameter
+    list is compiled into a pydantic model, so a call is validated by one
+    pass through pydantic-core instead of ad hoc checks at call time. The
+    per-tool maps the executor, prefetcher and caches take (timeouts,
+    concurrency, cache TTLs, ...) are derived from the same declarations.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, _RegisteredTool] = {}
+
+    def tool(
+            self,
+            description: str,
+            parameters: Dict[str, Param],
+            name: Optional[str] = None,
+            timeout: Optional[float] = None,
+            concurrency: Optional[int] = None,
+            read_only: bool = False,
+            cache_ttl: Optional[float] = None,
+            invalidates: Optional[List[Tuple[str, Tuple[str, ...]]]] = None
+    ):
+        """
+        Register a tool function.
+
+        Args:
+            description: Shown to the model in the tool schema
+            parameters: Parameter definitions, in schema order
+            name: Tool name, defaults to the function name
+            timeout: Seconds a call may take; the executor's default if None
+            concurrency: Maximum concurrent calls; the executor's default if None
+            read_only: The tool has no side effects, so it may be started
+                while its arguments are still streaming. Tools with side
+                effects must take a `dry_run` keyword that checks the call
+                without changing anything
+            cache_ttl: Seconds a result may be served from the tool result
+                cache; never cached if None
+            invalidates: Cached results made stale by a successful call, as
+                (cached tool, arguments that must match) pairs
+
+        Returns:
+            A decorator that registers the function and returns it unchanged
+        """
+        def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+            tool_name = name or function.__name__
+            if tool_name in self._tools:
+                raise ValueError(f"Tool {tool_name} is already registered")
+            if not read_only and "dry_run" not in inspect.signature(function).parameters:
+                raise ValueError(f"Tool {tool_name} has side effects but no dry_run keyword")
+            self._tools[tool_name] = _RegisteredTool(
+                tool_name,
+                function,
+                _schema(tool_name, description, parameters),
+                parameters,
+                _compile(tool_name, parameters),
+                timeout,
+                concurrency,
+                read_only,
+                cache_ttl,
+                list(invalidates or [])
+            )
+            return function
+
+        return decorator
+
+    @property
+    def schemas(self) -> List[Dict[str, Any]]:
+        """Tool schemas in the format of the chat completions `tools` parameter."""
+        return [registered.schema for registered in self._tools.values()]
+
+    @property
+    def functions(self) -> Dict[str, Callable[..., Any]]:
+        return {tool_name: registered.function for tool_name, registered in self._tools.items()}
+
+    @property
+    def dry_run_functions(self) -> Dict[str, Callable[..., Any]]:
+        """Tool functions with side effects replaced by their dry runs, e.g. for offline evaluation."""
+        return {
+            tool_name: registered.function if registered.read_only
+            else functools.partial(registered.function, dry_run=True)
+            for tool_name, registered in self._tools.items()
+        }
+
+    @property
+    def timeouts(self) -> Dict[str, float]:
+        return {tool_name: registered.timeout for tool_name, registered in self._tools.items()
+                if registered.timeout is not None}
+
+    @property
+    def concurrency(self) -> Dict[str, int]:
+        return {tool_name: registered.concurrency for tool_name, registered in self._tools.items()
+                if registered.concurrency is not None}
+
+    @property
+    def read_only(self) -> Set[str]:
+        """Tools without side effects."""
+        return {tool_name for tool_name, registered in self._tools.items() if registered.read_only}
+
+    @property
+    def cache_ttls(self) -> Dict[str, float]:
+        return {tool_name: registered.cache_ttl for tool_name, registered in self._tools.items()
+                if registered.cache_ttl is not None}
+
+    @property
+    def cache_invalidations(self) -> Dict[str, List[Tuple[str, Tuple[str, ...]]]]:
+        return {tool_name: registered.invalidates for tool_name, registered in self._tools.items()
+                if registered.invalidates}
+
+    @property
+    def argument_labels(self) -> Dict[str, str]:
+        """Human-readable argument names, for messages about missing arguments."""
+        labels: Dict[str, str] = {}
+        for registered in self._tools.values():
+            for param_name, param in registered.parameters.items():
+                labels.setdefault(param_name, _label(param_name, param))
+        return labels
+
+    def validate(self, name: str, arguments: Any) -> Dict[str, Any]:
+        """
+        Parse and validate the arguments of a tool call.
+
+        Args:
+            name: The tool name
+            arguments: The raw JSON arguments string, or an already decoded dict
+
+        Returns:
+            Keyword arguments for the tool function, with only declared
+            parameters and normalized values
+
+        Raises:
+            ToolValidationError: If the tool is unknown or the arguments are invalid
+        """
+        registered = self._tools.get(name)
+        if registered is None:
+            raise ToolValidationError(name, f"Unknown tool: {name}")
+
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments.strip() else {}
+            except json.JSONDecodeError:
+                raise ToolValidationError(name, "Arguments are not valid JSON")
+        if not isinstance(arguments, dict):
+            raise ToolValidationError(name, "Arguments must be a JSON object")
+
+        # Placeholders count as missing, so they are reported the same way
+        arguments = {
+            key: value for key, value in arguments.items()
+            if not (isinstance(value, str) and value.strip().lower() in _MISSING_VALUES)
+        }
+
+        try:
+            validated = registered.model.model_validate(arguments)
+        except ValidationError as e:
+            raise _validation_error(registered, e)
+        return validated.model_dump(exclude_none=True)
+
+
+def _label(param_name: str, param: Param) -> str:
+    label = param.label or param_name.replace("_", " ")
+    if param.format:
+        label = f"{label} ({_FORMAT_LABELS[param.format]})"
+    return label
+
+
+def _schema(name: str, description: str, parameters: Dict[str, Param]) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    param_name: {"type": param.type, "description": param.description}
+                    for param_name, param in parameters.items()
+                },
+                "required": [param_name for param_name, param in parameters.items() if param.required]
+            }
+        }
+    }
+
+
+def _compile(name: str, parameters: Dict[str, Param]) -> type:
+    fields: Dict[str, Tuple[Any, Any]] = {}
+    for param_name, param in parameters.items():
+        annotation: Any = _PYTHON_TYPES[param.type]
+        if param.format:
+            annotation = Annotated[annotation, AfterValidator(_FORMAT_VALIDATORS[param.format])]
+        fields[param_name] = (annotation, ...) if param.required else (Optional[annotation], None)
+
+    model_name = "".join(part.title() for part in name.split("_")) + "Arguments"
+    return create_model(
+        model_name,
+        __config__=ConfigDict(extra="ignore", str_strip_whitespace=True),
+        **fields
+    )
+
+
+def _validation_error(registered: _RegisteredTool, error: ValidationError) -> ToolValidationError:
+    missing: List[str] = []
+    problems: List[Dict[str, str]] = []
+    for detail in error.errors(include_url=False):
+        param_name = str(detail["loc"][0]) if detail["loc"] else ""
+        param = registered.parameters.get(param_name)
+        label = _label(param_name, param) if param is not None else param_name
+        if detail["type"] == "missing":
+            missing.append(label)
+            problems.append({"argument": param_name, "message": "is required"})
+        else:
+            problems.append({"argument": param_name, "message": detail["msg"]})
+
+    if missing and len(missing) == len(problems):
+        message = f"Missing required arguments: {', '.join(missing)}. Ask the user for them."
+        return ToolValidationError(registered.name, message, problems, missing_only=True)
+    details = "; ".join(f"{problem['argument']} {problem['message']}" for problem in problems)
+    return ToolValidationError(registered.name, f"Invalid arguments: {details}", problems)
+
+
+# Process-wide registry the tool modules register with
+registry = ToolRegistry()
+tool = registry.tool
@@ -1,3 +1,16 @@
+from .registry import Param, tool
+
+
+@tool(
+    description="Get the current weather information for a city",
+    parameters={
+        "city": Param("The city to get weather information for")
+    },
+    timeout=5.0,
+    concurrency=16,
+    read_only=True,
+    cache_ttl=600.0
+)
 def get_weather(city: str) -> str:
     """
     Simulates getting weather information for a city.
@@ -0,0 +1,275 @@
+"""
+Conversation transcript journal: one record per finished /query turn.
+
+Records are written in batches to rotating, compressed JSONL segments in
+TRANSCRIPT_DIR. Each batch is one complete gzip member or zstd frame, so
+a segment stays readable up to its last batch after a crash, and an index
+of (session, segment, offset, length) lets a session be read back without
+decompressing whole segments. The index is an SQLite table keyed on the
+session, shared by the workers writing to the directory:
+
+    python transcripts.py <session_id>
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import asyncio
+import sqlite3
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from metrics import TRANSCRIPT_RECORDS
+from utils import get_logger
+
+try:
+    import zstandard
+except ImportError:  # Optional: TRANSCRIPT_COMPRESSION=zstd falls back to gzip without it
+    zstandard = None
+
+_logger = get_logger("transcripts")
+
+INDEX_NAME = "index.db"
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_session ON frames (session_id, id);
+"""
+_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+
+def _decompress(data: bytes, segment: str) -> bytes:
+    if segment.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Reading zstd transcripts needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if segment.endswith(".gz"):
+        return gzip.decompress(data)
+    return data
+
+
+class TranscriptJournal:
+    """
+    Writes turn records from a bounded queue on a background task.
+
+    `record` never blocks the stream that calls it. Once the queue is
+    `pressure_fraction` full, records are kept with probability
+    `pressure_sample_rate`; when it is full they are dropped. The writer takes
+    up to `batch_size` records, or what arrived within `flush_interval`, and
+    compresses and appends them on a worker thread. A segment is rotated once
+    it holds `max_segment_bytes` of uncompressed records or is older than
+    `max_segment_seconds`.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            compression: str = "gzip",
+            queue_size: int = 1000,
+            batch_size: int = 64,
+            flush_interval: float = 1.0,
+            max_segment_bytes: int = 64 * 1024 * 1024,
+            max_segment_seconds: float = 3600.0,
+            pressure_fraction: float = 0.75,
+            pressure_sample_rate: float = 0.1
+    ):
+        if compression not in _SUFFIXES:
+            raise ValueError(f"Unknown transcript compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            _logger.warning("transcript_zstd_unavailable", fallback="gzip")
+            compression = "gzip"
+        self.directory = directory
+        self.compression = compression
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.pressure_size = max(int(queue_size * pressure_fraction), 1)
+        self.pressure_sample_rate = pressure_sample_rate
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._writer: Optional[asyncio.Task] = None
+        self._segment: Optional[str] = None
+        self._segment_fd: Optional[int] = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._segments_opened = 0
+        # Opened by the first write, on the writer's worker thread
+        self._index: Optional[sqlite3.Connection] = None
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "TranscriptJournal":
+        """Read the settings from TRANSCRIPT_* environment variables."""
+        return cls(
+            os.getenv("TRANSCRIPT_DIR", "transcripts"),
+            compression=os.getenv("TRANSCRIPT_COMPRESSION", "gzip").lower(),
+            queue_size=int(os.getenv("TRANSCRIPT_QUEUE_SIZE", "1000")),
+            batch_size=int(os.getenv("TRANSCRIPT_BATCH_SIZE", "64")),
+            flush_interval=float(os.getenv("TRANSCRIPT_FLUSH_SECONDS", "1")),
+            max_segment_bytes=int(os.getenv("TRANSCRIPT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024))),
+            max_segment_seconds=float(os.getenv("TRANSCRIPT_SEGMENT_MAX_SECONDS", "3600")),
+            pressure_sample_rate=float(os.getenv("TRANSCRIPT_PRESSURE_SAMPLE_RATE", "0.1"))
+        )
+
+    def start(self) -> None:
+        """Start the writer task; call from the event loop."""
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._drain())
+
+    def record(self, entry: Dict[str, Any]) -> bool:
+        """
+        Queue a turn record without waiting.
+
+        Args:
+            entry: The record; it must have a "session_id"
+
+        Returns:
+            True if the record was queued, False if it was sampled out or dropped
+        """
+        if self._queue.qsize() >= self.pressure_size and random.random() >= self.pressure_sample_rate:
+            TRANSCRIPT_RECORDS.inc(outcome="sampled_out")
+            return False
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            TRANSCRIPT_RECORDS.inc(outcome="dropped")
+            return False
+        return True
+
+    async def close(self) -> None:
+        """Write the records still queued, then stop the writer and close the segment."""
+        if self._writer is not None:
+            await self._queue.put(None)
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        self._close_segment()
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                TRANSCRIPT_RECORDS.inc(len(batch), outcome="failed")
+                _logger.error("transcript_write_failed", records=len(batch), error=f"{type(e).__name__}: {e}")
+            else:
+                TRANSCRIPT_RECORDS.inc(len(batch), outcome="written")
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Append one compressed batch to the current segment and index its records."""
+        lines = [json.dumps(entry, default=str).encode("utf-8") + b"\n" for entry in batch]
+        data = b"".join(lines)
+        self._rotate_if_needed(len(data))
+        frame = _compress(data, self.compression)
+        offset = os.lseek(self._segment_fd, 0, os.SEEK_END)
+        os.write(self._segment_fd, frame)
+        self._segment_bytes += len(data)
+
+        segment = os.path.basename(self._segment)
+        sessions = dict.fromkeys(str(entry.get("session_id")) for entry in batch)
+        if self._index is None:
+            self._index = _open_index(self.directory)
+        with self._index:
+            self._index.executemany(
+                "INSERT INTO frames (session_id, segment, offset, length) VALUES (?, ?, ?, ?)",
+                [(session_id, segment, offset, len(frame)) for session_id in sessions]
+            )
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        if self._segment_fd is not None:
+            too_big = self._segment_bytes and self._segment_bytes + incoming > self.max_segment_bytes
+            too_old = time.monotonic() - self._segment_opened >= self.max_segment_seconds
+            if not (too_big or too_old):
+                return
+            self._close_segment()
+        self._segments_opened += 1
+        name = f"transcripts-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._segments_opened}"
+        self._segment = os.path.join(self.directory, name + _SUFFIXES[self.compression])
+        self._segment_fd = os.open(self._segment, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment_bytes = 0
+        self._segment_opened = time.monotonic()
+
+    def _close_segment(self) -> None:
+        if self._segment_fd is not None:
+            os.close(self._segment_fd)
+            self._segment_fd = None
+
+
+def _open_index(directory: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(INDEX_SCHEMA)
+    return conn
+
+
+def session_frames(directory: str, session_id: str) -> List[Tuple[str, int, int]]:
+    """Return the (segment, offset, length) batches holding records of a session, in write order."""
+    if not os.path.exists(os.path.join(directory, INDEX_NAME)):
+        return []
+    conn = _open_index(directory)
+    try:
+        return conn.execute(
+            "SELECT segment, offset, length FROM frames WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def read_session(directory: str, session_id: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the transcript records of a session, oldest first.
+
+    Only the batches listed in the index are read and decompressed.
+
+    Args:
+        directory: The TRANSCRIPT_DIR
+        session_id: The session to look up
+    """
+    for segment, offset, length in session_frames(directory, session_id):
+        with open(os.path.join(directory, segment), "rb") as f:
+            f.seek(offset)
+            data = _decompress(f.read(length), segment)
+        for line in data.splitlines():
+            entry = json.loads(line)
+            if entry.get("session_id") == session_id:
+                yield entry
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python transcripts.py <session_id>")
+    for transcript in read_session(os.getenv("TRANSCRIPT_DIR", "transcripts"), sys.argv[1]):
+        print(json.dumps(transcript, ensure_ascii=False))
@@ -0,0 +1,358 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterator, Deque, Optional, Tuple
+
+import groq
+import httpx
+
+_END = object()
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when the circuit breaker rejects a request without trying it."""
+
+    # Reported like an upstream 503, so callers can treat it as backpressure
+    status_code = 503
+
+
+class UpstreamTimeoutError(asyncio.TimeoutError):
+    """Raised when a request exceeds its overall deadline."""
+
+
+@dataclass
+class UpstreamConfig:
+    """Connection pool, retry, deadline, hedging and circuit breaker settings."""
+
+    base_url: Optional[str] = None
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_retries: int = 2
+    retry_base_delay: float = 0.25
+    retry_max_delay: float = 4.0
+    deadline: float = 120.0
+    hedge_percentile: float = 0.0
+    hedge_min_samples: int = 20
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "UpstreamConfig":
+        """Read the configuration from UPSTREAM_* / GROQ_BASE_URL environment variables."""
+        return cls(
+            base_url=os.getenv("GROQ_BASE_URL") or None,
+            max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30")),
+            connect_timeout=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("UPSTREAM_READ_TIMEOUT", "30")),
+            max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+            retry_base_delay=float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25")),
+            retry_max_delay=float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "4")),
+            deadline=float(os.getenv("UPSTREAM_DEADLINE", "120")),
+            hedge_percentile=float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "0")),
+            hedge_min_samples=int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "20")),
+            failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
+        )
+
+
+def create_groq_client(api_key: str, config: UpstreamConfig) -> groq.AsyncGroq:
+    """
+    Build a Groq client on a tuned, reusable HTTP connection pool.
+
+    SDK retries are disabled because UpstreamTransport retries itself, only
+    before the first streamed byte.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry
+        ),
+        timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout)
+    )
+    return groq.AsyncGroq(
+        api_key=api_key,
+        base_url=config.base_url,
+        max_retries=0,
+        http_client=http_client
+    )
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds a single trial request is let through; its
+    outcome closes the breaker again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def acquire(self) -> bool:
+        """
+        Raise UpstreamUnavailableError unless a request may be sent now.
+
+        Returns:
+            True if the request is the half-open trial, whose outcome must be
+            recorded or which must be given back with `release_trial`
+        """
+        state = self.state
+        if state == "closed" or self.failure_threshold <= 0:
+            return False
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        raise UpstreamUnavailableError("Upstream LLM service is temporarily unavailable")
+
+    def release_trial(self) -> None:
+        """Give back the trial slot of a request that ended without an outcome, e.g. when cancelled."""
+        self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial_in_flight or (
+                self.failure_threshold > 0 and self.failures >= self.failure_threshold
+        ):
+            if self.opened_at is None or self.trial_in_flight:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class LatencyTracker:
+    """Sliding window of time-to-first-byte samples for hedging decisions."""
+
+    def __init__(self, size: int = 256):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.samples)
+        index = min(int(fraction * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+
+class UpstreamTransport:
+    """
+    Resilient streaming access to chat completions.
+
+    - Retries with jittered exponential backoff, only until the first chunk
+      has been received, so no partial output is ever duplicated
+    - One overall deadline per request, covering retries and streaming
+    - Optional hedging: a second identical request is started when the first
+      chunk takes longer than the configured latency percentile
+    - A circuit breaker that fails fast while the upstream is unhealthy
+    """
+
+    def __init__(self, client: Any, config: Optional[UpstreamConfig] = None):
+        self.client = client
+        self.config = config or UpstreamConfig()
+        self.breaker = CircuitBreaker(self.config.failure_threshold, self.config.reset_timeout)
+        self.latency = LatencyTracker()
+        self.counters = {"requests": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    async def stream_chat(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        """
+        Stream a chat completion.
+
+        Args:
+            request: Keyword arguments for `chat.completions.create`, with stream=True
+
+        Yields:
+            Completion chunks
+        """
+        trial = self.breaker.acquire()
+        self.counters["requests"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.deadline
+
+        stream, iterator, first = await self._open(request, deadline, trial)
+        try:
+            if first is _END:
+                return
+            yield first
+            while True:
+                # asyncio.timeout runs in this task, so unlike wait_for it cannot
+                # swallow a cancellation that arrives together with a chunk
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                except TimeoutError:
+                    raise UpstreamTimeoutError(f"Upstream deadline of {self.config.deadline}s exceeded")
+                yield chunk
+        finally:
+            await _close(stream)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "breaker": self.breaker.state}
+
+    async def _open(self, request: Dict[str, Any], deadline: float, trial: bool = False) -> Tuple[Any, Any, Any]:
+        """Open a stream and receive its first chunk, retrying transient failures."""
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                opened = await self._open_hedged(request, deadline)
+            except Exception as e:
+                if _is_upstream_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    # The upstream answered, it just rejected this request
+                    self.breaker.record_success()
+                trial = False
+                if attempt >= self.config.max_retries or not _is_retryable(e) or self.breaker.state == "open":
+                    raise
+                delay = self._backoff(attempt, e)
+                if loop.time() + delay >= deadline:
+                    raise
+                self.counters["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (e.g. the client disconnected) before the upstream answered:
+                # neither outcome is known, so let the next request be the trial
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return opened
+
+    async def _open_hedged(self, request: Dict[str, Any], deadline: float) -> Tuple[Any, Any, Any]:
+        config = self.config
+        if config.hedge_percentile <= 0 or len(self.latency.samples) < config.hedge_min_samples:
+            return await self._open_once(request, deadline)
+
+        primary = asyncio.ensure_future(self._open_once(request, deadline))
+        tasks = [primary]
+        winner = None
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.latency.percentile(config.hedge_percentile))
+            if done:
+                winner = primary
+                return primary.result()
+
+            self.counters["hedges"] += 1
+            hedge = asyncio.ensure_future(self._open_once(request, deadline))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = task.exception()
+            if winner is None:
+                raise error
+            if winner is hedge:
+                self.counters["hedge_wins"] += 1
+            return winner.result()
+        finally:
+            # Cancel the slower request (or every request, if we were cancelled
+            # ourselves, e.g. by a client disconnect) and close its stream; a
+            # cancelled request closes its own stream, so wait for that
+            cancelled = []
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                    cancelled.append(task)
+                elif not task.cancelled() and task.exception() is None:
+                    await _close(task.result()[0])
+            if cancelled:
+                await asyncio.gather(*cancelled, return_exceptions=True)
+
+    async def _open_once(self, request: Dict[str, Any], deadline: float) -> Tuple[Any, Any, Any]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.counters["attempts"] += 1
+        stream = None
+        try:
+            # Not wait_for: on Python 3.11 it can return a stream that opened just as
+            # this request was cancelled (e.g. as the losing hedge) and drop the cancellation
+            async with asyncio.timeout_at(deadline):
+                stream = await self.client.chat.completions.create(**request)
+                iterator = stream.__aiter__()
+                try:
+                    first = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first = _END
+        except BaseException as e:
+            if stream is not None:
+                await _close(stream)
+            if isinstance(e, TimeoutError) and not isinstance(e, UpstreamTimeoutError):
+                raise UpstreamTimeoutError(f"Upstream deadline of {self.config.deadline}s exceeded") from e
+            raise
+        self.latency.record(loop.time() - started)
+        return stream, iterator, first
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given."""
+        cap = min(self.config.retry_max_delay, self.config.retry_base_delay * (2 ** attempt))
+        delay = random.uniform(0, cap)
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Whether an error indicates an unhealthy upstream rather than a bad request."""
+    return isinstance(error, (UpstreamTimeoutError, asyncio.TimeoutError)) or _is_retryable(error)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, UpstreamTimeoutError):
+        # The deadline covers all attempts, so there is no time left to retry
+        return False
+    if isinstance(error, (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)):
+        return True
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+async def _close(stream: Any) -> None:
+    close = getattr(stream, "close", None)
+    if close is None:
+        return
+    try:
+        await close()
+    except Exception:
+        pass
@@ -2,12 +2,23 @@ from .stream import (
     format_chunk_event,
     format_tool_use_event,
     format_tool_output_event,
-    format_end_event
+    format_end_event,
+    with_tool_arguments,
+    batch_sse_events,
+    cancellable_stream
 )
+from .log import StructuredLogger, configure_logging, dropped_log_records, get_logger
 
 __all__ = [
     "format_chunk_event",
     "format_tool_use_event",
     "format_tool_output_event",
-    "format_end_event"
+    "format_end_event",
+    "with_tool_arguments",
+    "batch_sse_events",
+    "cancellable_stream",
+    "StructuredLogger",
+    "configure_logging",
+    "dropped_log_records",
+    "get_logger"
 ]
\ No newline at end of file
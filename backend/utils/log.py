@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+_ROOT_NAME = "supercar"
+
+_configure_lock = threading.Lock()
+_handler: Optional["_DroppingQueueHandler"] = None
+_listener: Optional[QueueListener] = None
+_sample_rate = 1.0
+_loggers: Dict[str, "StructuredLogger"] = {}
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        payload.update(getattr(record, "fields", {}))
+        return json.dumps(payload, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Hands records to the writer thread; drops them instead of blocking when it falls behind."""
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+        level: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        queue_size: Optional[int] = None
+) -> None:
+    """
+    Route application logs through a bounded queue to a background writer.
+
+    Callers only append to the queue, so logging never blocks the event loop
+    on stderr. Settings default to LOG_LEVEL, LOG_SAMPLE_RATE and
+    LOG_QUEUE_SIZE. Calling it again only updates the level and sample rate.
+    """
+    global _handler, _listener, _sample_rate
+    with _configure_lock:
+        root = logging.getLogger(_ROOT_NAME)
+        root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+        root.propagate = False
+        _sample_rate = sample_rate if sample_rate is not None else float(os.getenv("LOG_SAMPLE_RATE", "1"))
+        if _handler is not None:
+            return
+
+        records: queue.Queue = queue.Queue(queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        _handler = _DroppingQueueHandler(records)
+        writer = logging.StreamHandler(sys.stderr)
+        writer.setFormatter(_JsonFormatter())
+        _listener = QueueListener(records, writer)
+        _listener.start()
+        root.addHandler(_handler)
+        atexit.register(_listener.stop)
+
+
+def dropped_log_records() -> int:
+    """Number of records dropped because the writer could not keep up."""
+    return _handler.dropped if _handler is not None else 0
+
+
+class StructuredLogger:
+    """
+    Logs one JSON object per line: an event name plus keyword fields.
+
+    Records below WARNING are sampled at LOG_SAMPLE_RATE unless logged with
+    `always=True`; the level check and sampling happen before any record is
+    built, so suppressed calls are nearly free.
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{_ROOT_NAME}.{name}")
+
+    def log(self, event: str, level: int = logging.INFO, always: bool = False, **fields: Any) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        if not always and level < logging.WARNING and _sample_rate < 1 and random.random() >= _sample_rate:
+            return
+        self._logger.log(level, event, extra={"fields": fields})
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self.log(event, logging.DEBUG, **fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self.log(event, logging.WARNING, **fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self.log(event, logging.ERROR, **fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Return the structured logger for a component, configuring logging on first use."""
+    logger = _loggers.get(name)
+    if logger is None:
+        if _handler is None:
+            configure_logging()
+        logger = _loggers[name] = StructuredLogger(name)
+    return logger
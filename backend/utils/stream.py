@@ -1,5 +1,9 @@
 import json
-from typing import Dict
+import asyncio
+from contextlib import aclosing
+from typing import Dict, List, Any, AsyncIterator, Callable, Optional, Tuple
+
+from sse_starlette.sse import ServerSentEvent
 
 
 def format_chunk_event(text: str) -> Dict[str, str]:
@@ -30,9 +34,159 @@ def format_tool_output_event(tool_name: str, output: str) -> Dict[str, str]:
     }
 
 
+def with_tool_arguments(
+        outputs: List[Dict[str, Any]],
+        calls: List[Tuple[str, Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """
+    Add the arguments each tool was called with to its output, for records of a turn.
+
+    Args:
+        outputs: Parsed `tool_output` event data, in stream order
+        calls: The (name, arguments) of the calls that ran, in the same order, as
+            collected in the "tool_calls" of `LLMClient.process_query`'s outcome
+
+    Returns:
+        The outputs with an "arguments" key (None if unknown) after the name
+    """
+    records = []
+    for index, output in enumerate(outputs):
+        name, arguments = calls[index] if index < len(calls) else (None, None)
+        records.append({
+            "name": output["name"],
+            "arguments": arguments if name == output["name"] else None,
+            **{key: value for key, value in output.items() if key != "name"}
+        })
+    return records
+
+
 def format_end_event() -> Dict[str, str]:
     """Format an end event."""
     return {
         "event": "end",
         "data": ""
-    }
\ No newline at end of file
+    }
+
+
+async def batch_sse_events(
+        events: AsyncIterator[Dict[str, str]],
+        max_bytes: int = 4096,
+        max_delay: float = 0.02
+) -> AsyncIterator[bytes]:
+    """
+    Encode SSE events and coalesce them into larger frames.
+
+    A frame is flushed once it reaches `max_bytes`, once its oldest event has
+    waited `max_delay` seconds, or when the end event arrives.
+
+    Args:
+        events: Event dicts as produced by the format_* helpers
+        max_bytes: Flush threshold in bytes
+        max_delay: Maximum time in seconds an event may be held back
+
+    Yields:
+        Encoded SSE frames, each containing one or more events
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    buffer = bytearray()
+    deadline = 0.0
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(deadline - loop.time(), 0) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # The oldest buffered event has waited long enough
+                yield bytes(buffer)
+                buffer.clear()
+                continue
+
+            finished, pending = pending, None
+            try:
+                event = finished.result()
+            except StopAsyncIteration:
+                break
+
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer += ServerSentEvent(**event).encode()
+            if len(buffer) >= max_bytes or event.get("event") == "end":
+                yield bytes(buffer)
+                buffer.clear()
+
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+_DONE = object()
+
+
+async def cancellable_stream(
+        events: AsyncIterator[Dict[str, str]],
+        max_duration: float = 0.0,
+        on_timeout: Optional[Callable[[], None]] = None
+) -> AsyncIterator[Dict[str, str]]:
+    """
+    Produce events in a separate task that dies with the stream.
+
+    Closing or cancelling this generator (e.g. when the client disconnects)
+    cancels the producer wherever it is waiting, which closes the upstream
+    stream and aborts in-flight tool calls. After `max_duration` seconds the
+    producer is cancelled as well and the stream ends with a notice.
+
+    Args:
+        events: Event dicts to relay, typically from LLMClient.process_query
+        max_duration: Maximum stream duration in seconds (0 disables the limit)
+        on_timeout: Called once if the stream is cut off by `max_duration`
+
+    Yields:
+        The relayed events
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        async with aclosing(events) as source:
+            async for event in source:
+                queue.put_nowait(event)
+
+    loop = asyncio.get_running_loop()
+    producer = asyncio.ensure_future(produce())
+    producer.add_done_callback(lambda _: queue.put_nowait(_DONE))
+    timed_out = False
+
+    def expire() -> None:
+        nonlocal timed_out
+        timed_out = True
+        producer.cancel()
+
+    deadline = loop.call_later(max_duration, expire) if max_duration > 0 else None
+    try:
+        while True:
+            event = await queue.get()
+            if event is _DONE:
+                break
+            yield event
+
+        if timed_out:
+            if on_timeout is not None:
+                on_timeout()
+            yield format_chunk_event("\n\nSorry, this response took too long and was stopped. Please try again.")
+            yield format_end_event()
+        elif not producer.cancelled() and producer.exception() is not None:
+            raise producer.exception()
+    finally:
+        if deadline is not None:
+            deadline.cancel()
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
@@ -118,6 +118,9 @@ export function useAIResponse() {
             
             // Reset for next message
             currentData = '';
+          } else if (line.startsWith('id: ') || line.startsWith(':')) {
+            // Event IDs (for resuming with Last-Event-ID) and heartbeat comments
+            // Do nothing
           } else if (line === '') {
             // Empty line can be a separator between messages
             // Do nothing